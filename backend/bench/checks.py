@@ -0,0 +1,730 @@
+"""Проверки обработчика /game/ws без сервера, сети и Postgres.
+
+Обработчик ws() запускается как есть, на сокетах-заглушках. Сессии базы
+берут соединения из настоящего MeteredQueuePool, только вместо asyncpg -
+соединения-заглушки, поэтому pool_metrics считает checkout как в проде.
+Код выхода 1, если проверка не прошла.
+
+pool: N вебсокетов онлайн держат не больше соединений, чем подключается
+одновременно, а после подключения - ни одного. Загрузка игрока стоит
+BEGIN, SELECT и один ROLLBACK: транзакцию SQLAlchemy открывает и на чтении.
+    python bench/checks.py pool -n 500 --concurrency 20
+
+backplane: две ноды RedisBackplane на общем Redis-заглушке в памяти.
+События доходят до подписанных нод, но не до отправителя; одновременные
+claim одной сессии с двух нод не теряют друг друга, release не снимает
+сессию, которую успела забрать другая нода.
+    python bench/checks.py backplane
+
+soak: тысячи циклов подключение - обрыв через настоящий обработчик, как
+bench/ws_load.py --mode soak, но без сервера. Клиенты закрываются чисто,
+рвут соединение без close, шлют мусор, рвут до init или замолкают, пока
+их не уберет SessionReaper. После каждого круга сессий не остается.
+Прогон после прогрева делится на два равных окна: память Python
+(tracemalloc) во втором окне не растет больше шума.
+    python bench/checks.py soak --cycles 4000 --concurrency 50
+
+pathfinding: PathFinder на случайном мире 64x48 (четверть тайлов твердые,
+плюс стена с одним проходом) против BFS по тем же тайлам: путь есть тогда
+же, когда его находит BFS, и не длиннее. Повторные запросы берутся из кэша,
+а после set_block, unload_chunk и повторной загрузки чанка кэш не отдает
+устаревший ответ.
+    python bench/checks.py pathfinding --queries 400 --seed 1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter, deque
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi import WebSocketDisconnect
+from redis.exceptions import WatchError
+
+sys.path.append(str(Path(__file__).parent.parent))
+# src/repos импортирует модели как models.*
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from src.api import ws as ws_api
+from src.config import settings
+from src.database import MeteredQueuePool
+from src.engine import persistence
+from src.engine.backplane import Backplane, BackplaneEvent, RedisBackplane
+from src.engine.blocks import Block
+from src.engine.collision import CollisionGrid
+from src.engine.GameProtocol import PROTOCOL_VERSION, GameProtocol, Hello
+from src.engine.GameSessionManager import SERVER_CAPABILITIES, gameSessionsManager
+from src.engine.pathfinding import PathFinder
+from src.engine.reaper import SessionReaper
+from src.engine.regions import CHUNK_SIZE, chunk_of
+from src.utils.pool_metrics import pool_metrics
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition: bool, message: str) -> None:
+    if not condition:
+        raise CheckFailed(message)
+
+
+# Запросы к базе по типам: BEGIN, execute, COMMIT, ROLLBACK
+roundtrips: Counter[str] = Counter()
+
+
+class FakeConnection:
+    """DBAPI-соединение, которое только считает запросы. Как у адаптера
+    asyncpg, COMMIT и ROLLBACK без начатой транзакции в базу не уходят"""
+
+    def __init__(self) -> None:
+        self.started = False
+
+    def begin(self) -> None:
+        self.started = True
+        roundtrips['BEGIN'] += 1
+
+    def commit(self) -> None:
+        if self.started:
+            self.started = False
+            roundtrips['COMMIT'] += 1
+
+    def rollback(self) -> None:
+        if self.started:
+            self.started = False
+            roundtrips['ROLLBACK'] += 1
+
+    def close(self) -> None:
+        pass
+
+
+class FakeResult:
+    def __init__(self, row) -> None:
+        self.row = row
+
+    def scalars(self) -> 'FakeResult':
+        return self
+
+    def one(self):
+        return self.row
+
+    def one_or_none(self):
+        return self.row
+
+
+class FakeSession:
+    """AsyncSession в миниатюре: соединение из пула берется на первом запросе
+    и возвращается на commit, rollback или close, как у SQLAlchemy.
+
+    Транзакция тоже начинается на первом запросе, даже на SELECT (autobegin),
+    и close() ее откатывает. Пул при возврате соединения делает еще один
+    rollback (reset-on-return), но после закрытой транзакции он пустой.
+    """
+
+    def __init__(self, pool: MeteredQueuePool) -> None:
+        self.pool = pool
+        self.connection = None
+
+    async def execute(self, statement) -> FakeResult:
+        if self.connection is None:
+            # Пул исчерпан: ждем, как ждал бы asyncpg, а не падаем в sync-ожидании
+            capacity = self.pool.size() + max(self.pool._max_overflow, 0)
+            while self.pool.checkedout() >= capacity:
+                await asyncio.sleep(0.001)
+            self.connection = self.pool.connect()
+            self.connection.begin()
+        roundtrips['execute'] += 1
+        # Ответ базы приходит не сразу: другие обработчики успевают вклиниться
+        await asyncio.sleep(0)
+        user_id = statement.compile().params['id_1']
+        return FakeResult(SimpleNamespace(id=user_id, name=f'check{user_id}', x=0, y=0))
+
+    def in_transaction(self) -> bool:
+        return self.connection is not None
+
+    def _release(self) -> None:
+        self.connection.close()
+        self.connection = None
+
+    async def commit(self) -> None:
+        if self.connection is not None:
+            self.connection.commit()
+            self._release()
+
+    async def rollback(self) -> None:
+        if self.connection is not None:
+            self.connection.rollback()
+            self._release()
+
+    async def close(self) -> None:
+        await self.rollback()
+
+
+def fake_database() -> MeteredQueuePool:
+    """Пул с настройками из Settings; обработчики берут сессии из него"""
+    pool = MeteredQueuePool(
+        FakeConnection,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+    def session_maker() -> FakeSession:
+        return FakeSession(pool)
+
+    ws_api.async_session_maker = session_maker
+    persistence.async_session_maker = session_maker
+    return pool
+
+
+class FakeWebSocket:
+    """Сокет без сети: кадры клиента идут через очередь, ответы сервера
+    только считаются. Число в очереди - соединение закрыто с этим кодом"""
+
+    def __init__(self) -> None:
+        self.inbox: asyncio.Queue[bytes | int] = asyncio.Queue()
+        self.received = 0
+        self.closed = False
+
+    async def accept(self) -> None:
+        pass
+
+    async def receive_bytes(self) -> bytes:
+        message = await self.inbox.get()
+        if isinstance(message, int):
+            raise WebSocketDisconnect(message)
+        return message
+
+    async def send_bytes(self, data: bytes) -> None:
+        if self.closed:
+            raise RuntimeError('websocket is closed')
+        self.received += 1
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+        self.inbox.put_nowait(code)
+
+    def send(self, message: bytes) -> None:
+        self.inbox.put_nowait(message)
+
+    def disconnect(self) -> None:
+        self.inbox.put_nowait(1000)
+
+    def abort(self) -> None:
+        """TCP оборван без close: отправка падает, чтение - 1006"""
+        self.closed = True
+        self.inbox.put_nowait(1006)
+
+
+class FakeRedis:
+    """Redis в памяти: hash-и, pub/sub и MULTI/WATCH в объеме RedisBackplane.
+
+    Каждая команда - отдельный await, как запрос к серверу, поэтому команды
+    разных нод перемежаются. Атомарен только EXEC: его команды выполняются
+    подряд, без await между ними.
+    """
+
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[str, bytes]] = {}
+        # Версия ключа растет с каждой записью; по ней WATCH видит изменения
+        self.versions: dict[str, int] = {}
+        self.subscribers: list['FakePubSub'] = []
+
+    def apply(self, command: str, key: str, *args):
+        values = self.hashes.setdefault(key, {})
+        if command == 'hget':
+            return values.get(args[0])
+        self.versions[key] = self.versions.get(key, 0) + 1
+        if command == 'hset':
+            created = args[0] not in values
+            values[args[0]] = args[1].encode('utf-8')
+            return int(created)
+        return int(values.pop(args[0], None) is not None)
+
+    async def hget(self, key: str, field: str):
+        await asyncio.sleep(0)
+        return self.apply('hget', key, field)
+
+    async def hset(self, key: str, field: str, value: str):
+        await asyncio.sleep(0)
+        return self.apply('hset', key, field, value)
+
+    async def hdel(self, key: str, field: str):
+        await asyncio.sleep(0)
+        return self.apply('hdel', key, field)
+
+    async def publish(self, channel: str, data: bytes) -> int:
+        await asyncio.sleep(0)
+        receivers = [sub for sub in self.subscribers if channel in sub.channels]
+        for sub in receivers:
+            sub.messages.put_nowait(
+                {'type': 'message', 'channel': channel.encode('utf-8'), 'data': data}
+            )
+        return len(receivers)
+
+    def pubsub(self) -> 'FakePubSub':
+        sub = FakePubSub()
+        self.subscribers.append(sub)
+        return sub
+
+    def pipeline(self, transaction: bool = True) -> 'FakePipeline':
+        return FakePipeline(self)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FakePubSub:
+    def __init__(self) -> None:
+        self.channels: set[str] = set()
+        self.messages: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def subscribe(self, *channels: str) -> None:
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages: bool, timeout: float):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FakePipeline:
+    """Как redis.asyncio Pipeline: после watch() и до multi() команды идут
+    сразу, иначе копятся до execute()"""
+
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.commands: list[tuple[str, tuple]] = []
+        self.watched: dict[str, int] | None = None
+        self.explicit = False
+
+    async def __aenter__(self) -> 'FakePipeline':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.reset()
+
+    async def reset(self) -> None:
+        self.commands.clear()
+        self.watched = None
+        self.explicit = False
+
+    async def watch(self, *keys: str) -> None:
+        await asyncio.sleep(0)
+        self.watched = {key: self.redis.versions.get(key, 0) for key in keys}
+
+    def multi(self) -> None:
+        self.explicit = True
+
+    def _command(self, command: str, *args):
+        if self.watched is not None and not self.explicit:
+            return getattr(self.redis, command)(*args)
+        self.commands.append((command, args))
+        return self
+
+    def hget(self, *args):
+        return self._command('hget', *args)
+
+    def hset(self, *args):
+        return self._command('hset', *args)
+
+    def hdel(self, *args):
+        return self._command('hdel', *args)
+
+    async def execute(self) -> list:
+        await asyncio.sleep(0)
+        try:
+            for key, version in (self.watched or {}).items():
+                if self.redis.versions.get(key, 0) != version:
+                    raise WatchError('Watched variable changed.')
+            return [self.redis.apply(command, *args) for command, args in self.commands]
+        finally:
+            await self.reset()
+
+
+HELLO = GameProtocol.pack_hello(Hello(PROTOCOL_VERSION, SERVER_CAPABILITIES))
+
+
+def open_session(user_id: int) -> tuple[FakeWebSocket, asyncio.Task]:
+    socket = FakeWebSocket()
+    socket.send(HELLO)
+    return socket, asyncio.create_task(ws_api.ws(socket, {'user_id': user_id}))
+
+
+async def wait_until(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def check_pool(clients: int, concurrency: int) -> None:
+    pool = fake_database()
+    gate = asyncio.Semaphore(concurrency)
+    sessions: list[tuple[FakeWebSocket, asyncio.Task]] = []
+
+    async def connect(user_id: int) -> None:
+        async with gate:
+            socket, task = open_session(user_id)
+            sessions.append((socket, task))
+            # Ответ на HELLO уходит после загрузки игрока из базы
+            await wait_until(lambda: socket.received or task.done())
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(connect(user_id) for user_id in range(1, clients + 1)))
+        online = await wait_until(lambda: len(gameSessionsManager.players) == clients)
+        held = pool_metrics.snapshot(pool)
+        loads = dict(roundtrips)
+        for socket, _ in sessions:
+            socket.disconnect()
+        await asyncio.gather(*(task for _, task in sessions))
+
+    print(
+        f'{clients} online: checked_out {held["checked_out"]}, '
+        f'max_checked_out {held["max_checked_out"]}, checkouts {held["checkouts"]}'
+    )
+    print(f'round-trips for {clients} player loads: {loads}')
+    expect(held['checked_out'] == 0, 'websockets hold pool connections')
+    # Чтение игрока: транзакция из autobegin и ровно один ROLLBACK на выходе
+    expect(
+        loads.get('BEGIN') == loads.get('ROLLBACK') == clients
+        and not loads.get('COMMIT'),
+        f'player loads should end with one ROLLBACK each: {loads}',
+    )
+    expect(online, f'online {len(gameSessionsManager.players)} of {clients}')
+    expect(
+        held['max_checked_out'] <= concurrency,
+        f'max_checked_out {held["max_checked_out"]} > concurrency {concurrency}',
+    )
+    expect(not gameSessionsManager.players, 'sessions left after disconnect')
+    expect(pool.checkedout() == 0, 'connections left after disconnect')
+
+
+async def check_backplane(users: int) -> None:
+    try:
+        Backplane()
+    except TypeError:
+        pass
+    else:
+        raise CheckFailed('Backplane without transport is constructible')
+
+    redis = FakeRedis()
+    nodes = [RedisBackplane(redis, 'a'), RedisBackplane(redis, 'b')]
+    received: dict[str, list] = {node.node_id: [] for node in nodes}
+    for node in nodes:
+
+        async def handler(region, event, payload, node_id=node.node_id):
+            received[node_id].append((region, event, payload))
+
+        node.set_handler(handler)
+        await node.start()
+    a, b = nodes
+    region = (0, 0)
+
+    await a.subscribe({region})
+    await b.subscribe({region})
+    await a.publish(region, BackplaneEvent.CHAT, b'hi')
+    delivered = await wait_until(lambda: received['b'], timeout=2.0)
+    await asyncio.sleep(0.05)
+    expect(delivered, 'subscribed node did not get the event')
+    expect(received['b'] == [(region, BackplaneEvent.CHAT, b'hi')], 'wrong event')
+    expect(not received['a'], 'node received its own event')
+
+    await b.unsubscribe({region})
+    await a.publish(region, BackplaneEvent.CHAT, b'again')
+    await asyncio.sleep(0.05)
+    expect(len(received['b']) == 1, 'unsubscribed node got an event')
+
+    # Обе ноды забирают одну сессию одновременно: ровно одна видит ее свободной
+    for user_id in range(users):
+        previous = await asyncio.gather(
+            a.claim_session(user_id), b.claim_session(user_id)
+        )
+        owner = await a.get_session_owner(user_id)
+        first = 'b' if owner == 'a' else 'a'
+        expect(
+            set(previous) == {None, first},
+            f'claim race on user {user_id}: previous owners {previous}, owner {owner}',
+        )
+
+    # b забирает сессию, пока a ее снимает: claim b не должен пропасть
+    for user_id in range(users, 2 * users):
+        await a.claim_session(user_id)
+        await asyncio.gather(a.release_session(user_id), b.claim_session(user_id))
+        owner = await a.get_session_owner(user_id)
+        expect(owner == 'b', f'release dropped the claim of user {user_id}: {owner}')
+
+    await a.release_session(0)
+    await b.release_session(0)
+    expect(await a.get_session_owner(0) is None, 'owner left after release')
+    for node in nodes:
+        await node.close()
+    print(f'backplane: pub/sub ok, {users} claim races, {users} release races')
+
+
+SOAK_ENDINGS = ('close', 'abort', 'garbage', 'early', 'silent')
+# Рост памяти за окно, который еще считается шумом
+SOAK_SLACK = 16 * 1024
+
+
+async def soak_cycle(user_id: int, ending: str) -> None:
+    """Одно подключение, которое заканчивается так, как сказано в ending"""
+    socket, task = open_session(user_id)
+    if ending == 'early':
+        socket.abort()
+    else:
+        # HELLO и init
+        await wait_until(lambda: socket.received >= 2 or task.done())
+        if ending == 'close':
+            socket.disconnect()
+        elif ending == 'garbage':
+            socket.send(b'\xff\x00\x01')
+            socket.abort()
+        elif ending == 'abort':
+            socket.abort()
+        # silent: клиент молчит, сессию убирает reaper по idle_timeout
+    await task
+    if ending != 'silent':
+        # Оборванную сессию убирает finally обработчика, а не reaper
+        players = gameSessionsManager.players.values()
+        expect(
+            all(player.websocket is not socket for player in players),
+            f'{ending}: handler left session of user {user_id}',
+        )
+
+
+async def check_soak(cycles: int, concurrency: int, warmup: int) -> None:
+    fake_database()
+    reaper = SessionReaper(
+        gameSessionsManager, persistence.positionPersister, idle_timeout=0.05
+    )
+
+    async def reap_until_done(round_task: asyncio.Task) -> None:
+        while not round_task.done():
+            await asyncio.sleep(0.02)
+            await reaper.reap()
+
+    window = (cycles - warmup) // 2
+    expect(window >= concurrency, 'need at least two rounds after warmup')
+    # Сэмплы памяти: конец прогрева, первого и второго окна
+    marks = [warmup, warmup + window, warmup + 2 * window]
+    samples: list[int] = []
+    tracemalloc.start()
+    # Окно pool_metrics растет до maxlen и без утечки: заполняем его сразу,
+    # отдельными числами под tracemalloc, как их заполнил бы checkout
+    wait_times = pool_metrics.wait_times
+    wait_times.extend(float(i) for i in range(wait_times.maxlen))
+    done = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        while len(samples) < len(marks):
+            round_task = asyncio.ensure_future(
+                asyncio.gather(
+                    *(
+                        soak_cycle(slot + 1, SOAK_ENDINGS[(done + slot) % 5])
+                        for slot in range(concurrency)
+                    )
+                )
+            )
+            await asyncio.wait_for(
+                asyncio.gather(round_task, reap_until_done(round_task)), 30.0
+            )
+            done += concurrency
+            # Фоновые kick reaper-а тоже должны закончиться
+            await wait_until(lambda: not reaper.kicks, timeout=2.0)
+            expect(
+                not gameSessionsManager.players,
+                f'{len(gameSessionsManager.players)} sessions left '
+                f'after {done} cycles',
+            )
+            if done >= marks[len(samples)]:
+                # Буфер вывода в devnull тоже растет до сброса
+                devnull.flush()
+                gc.collect()
+                samples.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+
+    first, second = samples[1] - samples[0], samples[2] - samples[1]
+    print(
+        f'soak: {done} cycles, reaped {dict(reaper.reaped)}, traced memory '
+        f'growth per {window} cycles: {first / 1024:.1f} KiB, then '
+        f'{second / 1024:.1f} KiB'
+    )
+    expect(reaper.reaped['idle'] > 0, 'reaper did not collect silent sessions')
+    # Кэши дорастают до предела в первом окне, утечка растет и во втором.
+    # Порог не зависит от длины прогона: это шум аллокатора и кэшей SQLAlchemy
+    expect(
+        second < SOAK_SLACK,
+        f'traced memory kept growing: {first} then {second} bytes '
+        f'per {window} cycles',
+    )
+
+
+PATH_WIDTH = 64
+PATH_HEIGHT = 48
+
+
+def bfs_distance(grid: CollisionGrid, start, goal) -> int | None:
+    """Шагов от start до goal по свободным тайлам загруженных чанков"""
+    if grid.rows(chunk_of(*start)) is None or grid.is_solid(*start):
+        return None
+    distance = {start: 0}
+    queue = deque([start])
+    while queue:
+        tile = queue.popleft()
+        if tile == goal:
+            return distance[tile]
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            x, y = tile[0] + dx, tile[1] + dy
+            if (x, y) in distance or grid.rows(chunk_of(x, y)) is None:
+                continue
+            if grid.is_solid(x, y):
+                continue
+            distance[(x, y)] = distance[tile] + 1
+            queue.append((x, y))
+    return None
+
+
+def expect_path(grid: CollisionGrid, finder: PathFinder, start, goal) -> list:
+    """Ответ find_path совпадает с BFS: есть ли путь и его длина"""
+    path = finder.find_path(start, goal)
+    distance = bfs_distance(grid, start, goal)
+    query = f'{start} -> {goal}'
+    if distance is None:
+        expect(path is None, f'{query}: path through walls {path}')
+        return path
+    expect(path is not None, f'{query}: no path, BFS found {distance} steps')
+    expect(path[0] == start and path[-1] == goal, f'{query}: wrong ends')
+    for a, b in zip(path, path[1:]):
+        expect(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1, f'{query}: jump {a}->{b}')
+        expect(
+            grid.rows(chunk_of(*b)) is not None and not grid.is_solid(*b),
+            f'{query}: step into {b}',
+        )
+    expect(
+        len(path) - 1 == distance,
+        f'{query}: {len(path) - 1} steps, BFS found {distance}',
+    )
+    return path
+
+
+def _path_length(finder: PathFinder, start, goal) -> int:
+    path = finder.find_path(start, goal)
+    return 0 if path is None else len(path)
+
+
+def check_pathfinding(queries: int, seed: int) -> None:
+    rng = random.Random(seed)
+    wall_x = PATH_WIDTH // 2 + 3
+    gap_y = rng.randrange(PATH_HEIGHT)
+    blocks = {}
+    for chunk_x in range(PATH_WIDTH // CHUNK_SIZE):
+        for chunk_y in range(PATH_HEIGHT // CHUNK_SIZE):
+            data = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+            for local_y in range(CHUNK_SIZE):
+                for local_x in range(CHUNK_SIZE):
+                    x = chunk_x * CHUNK_SIZE + local_x
+                    y = chunk_y * CHUNK_SIZE + local_y
+                    solid = rng.random() < 0.25
+                    if abs(x - wall_x) <= 1 and y == gap_y:
+                        # Проход в стене открыт с обеих сторон
+                        solid = False
+                    elif x == wall_x:
+                        solid = True
+                    if solid:
+                        data[local_y * CHUNK_SIZE + local_x] = Block.STONE
+            blocks[(chunk_x, chunk_y)] = bytes(data)
+    grid = CollisionGrid()
+    for (chunk_x, chunk_y), data in blocks.items():
+        grid.load_chunk(chunk_x, chunk_y, data)
+    finder = PathFinder(grid)
+    free = [
+        (x, y)
+        for x in range(PATH_WIDTH)
+        for y in range(PATH_HEIGHT)
+        if not grid.is_solid(x, y)
+    ]
+    pairs = [(rng.choice(free), rng.choice(free)) for _ in range(queries)]
+
+    found = sum(expect_path(grid, finder, *pair) is not None for pair in pairs)
+    for pair in pairs:
+        expect_path(grid, finder, *pair)
+    expect(finder.hits >= queries, f'cache hits {finder.hits} of {queries} repeats')
+
+    # Блок посреди закэшированного пути: запрос пересчитывается в обход
+    start, goal = next(
+        pair for pair in pairs if _path_length(finder, *pair) > CHUNK_SIZE
+    )
+    middle = finder.find_path(start, goal)[CHUNK_SIZE // 2]
+    grid.set_block(*middle, Block.STONE)
+    path = expect_path(grid, finder, start, goal)
+    expect(path is None or middle not in path, f'cached path through {middle}')
+    grid.set_block(*middle, Block.NONE)
+    expect_path(grid, finder, start, goal)
+
+    # Выгруженный чанк непроходим, а после загрузки пути через него
+    # возвращаются, в том числе в запросах, где раньше пути не было
+    chunk = chunk_of(*middle)
+    grid.unload_chunk(*chunk)
+    for pair in pairs:
+        if chunk_of(*pair[0]) != chunk and chunk_of(*pair[1]) != chunk:
+            expect_path(grid, finder, *pair)
+    grid.load_chunk(*chunk, blocks[chunk])
+    for pair in pairs:
+        expect_path(grid, finder, *pair)
+    print(
+        f'pathfinding: {queries} queries, {found} with path, '
+        f'{finder.snapshot()}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    checks = parser.add_subparsers(dest='check', required=True)
+    pool = checks.add_parser('pool')
+    pool.add_argument('-n', type=int, default=500)
+    pool.add_argument('--concurrency', type=int, default=20)
+    backplane = checks.add_parser('backplane')
+    backplane.add_argument('--users', type=int, default=100)
+    soak = checks.add_parser('soak')
+    soak.add_argument('--cycles', type=int, default=4000)
+    soak.add_argument('--concurrency', type=int, default=50)
+    soak.add_argument('--warmup', type=int, default=1000)
+    pathfinding = checks.add_parser('pathfinding')
+    pathfinding.add_argument('--queries', type=int, default=400)
+    pathfinding.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        if args.check == 'pool':
+            asyncio.run(check_pool(args.n, args.concurrency))
+        elif args.check == 'backplane':
+            asyncio.run(check_backplane(args.users))
+        elif args.check == 'soak':
+            asyncio.run(check_soak(args.cycles, args.concurrency, args.warmup))
+        elif args.check == 'pathfinding':
+            check_pathfinding(args.queries, args.seed)
+    except CheckFailed as ex:
+        print(f'FAIL: {ex}')
+        sys.exit(1)
+    print('ok')
+
+
+if __name__ == '__main__':
+    main()
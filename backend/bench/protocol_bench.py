@@ -0,0 +1,275 @@
+"""Размер кадров протокола на типичной сессии, без сервера.
+
+    python bench/protocol_bench.py --players 50 --updates 200
+
+Сессия: игроки по очереди подключаются (init, снимок мира, join остальным),
+потом каждый шлет --updates обновлений позиции, которые получают все
+остальные. Печатается средний размер кадра и суммарный трафик сервера
+для старого формата (имя в каждом кадре полем 20s) и для текущего.
+
+Сжатие: CPU против сэкономленных байт по классам кадров и уровням zlib.
+    python bench/protocol_bench.py --compression
+    python bench/protocol_bench.py --train-dict compression.dict
+
+Словарь для COMPRESSION_DICT_PATH собирается из тех же образцов кадров.
+
+Рассылка: память (tracemalloc) на одну рассылку --recipients получателям,
+через fan-out сервера и с кодированием и сжатием на каждого получателя.
+    python bench/protocol_bench.py --fanout --recipients 1000
+"""
+
+import argparse
+import random
+import struct
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.engine.compression import CompressionPolicy, compressionPolicy
+from src.engine.GameProtocol import (PROTOCOL_VERSION, Capability, ChatMessage,
+                                     GameProtocol, MessageType, PlayerInit,
+                                     PlayerJoin, PlayerUpdate)
+from src.engine.GameSessionManager import GameSessionsManager, PlayerSession
+from src.engine.legacy_protocol import LegacyProtocol
+
+# Прежний формат init/join/update: '!BI20sii'
+LEGACY_FRAME_SIZE = struct.calcsize('!BI20sii')
+
+NAMES = ['Akeka', 'Bob', 'xXx_sniper_xXx', 'Вася', 'Алёна_2007', 'kekw', 'Ёжик']
+
+
+def session_frames(players: int, updates: int) -> tuple[list[int], list[int]]:
+    """Размеры кадров сервер -> клиенты: (старый формат, текущий)"""
+    rng = random.Random(0)
+    joins = [
+        PlayerJoin(i, f'{rng.choice(NAMES)}{i}', rng.randint(-50, 50), 0)
+        for i in range(players)
+    ]
+    legacy: list[int] = []
+    current: list[int] = []
+
+    for i, join in enumerate(joins):
+        init = PlayerInit(join.player_id, join.name, join.x, join.y)
+        current.append(len(GameProtocol.pack_player_init(init)))
+        current.append(len(GameProtocol.pack_world_state(joins[:i])))
+        legacy.append(LEGACY_FRAME_SIZE)
+        # Раньше каждый существующий игрок приходил отдельным join
+        legacy.extend([LEGACY_FRAME_SIZE] * i)
+
+        join_size = len(GameProtocol.pack_player_join(join))
+        current.extend([join_size] * i)
+        legacy.extend([LEGACY_FRAME_SIZE] * i)
+
+    update_size = len(GameProtocol.pack_player_update(PlayerUpdate(0, 0, 0)))
+    relayed = players * updates * (players - 1)
+    current.extend([update_size] * relayed)
+    legacy.extend([LEGACY_FRAME_SIZE] * relayed)
+    return legacy, current
+
+
+def report(title: str, sizes: list[int]) -> None:
+    total = sum(sizes)
+    print(
+        f'{title}: {len(sizes)} frames, {total / 1024:.1f} KiB, '
+        f'avg {total / len(sizes):.1f} B/frame'
+    )
+
+
+CHUNK_SIZE = 16
+CHAT_WORDS = ['привет', 'го', 'в', 'шахту', 'кто', 'тут', 'lol', 'ok', 'нашел', 'алмаз']
+
+
+def chunk_frame(rng: random.Random, chunks: int = 16) -> bytes:
+    """Пачка чанков как в будущем CHUNK_STREAMING: x, y, версия и 256 блоков"""
+    parts = [struct.pack('!B H', 11, chunks)]
+    for index in range(chunks):
+        surface = rng.randint(4, 10)
+        blocks = bytearray()
+        for y in range(CHUNK_SIZE):
+            for _ in range(CHUNK_SIZE):
+                if y < surface:
+                    blocks.append(0)
+                elif y == surface:
+                    blocks.append(1)
+                elif y < surface + 3:
+                    blocks.append(2)
+                else:
+                    blocks.append(0 if rng.random() < 0.08 else 3)
+        parts.append(struct.pack('!i i I', index, 0, 1) + bytes(blocks))
+    return b''.join(parts)
+
+
+def sample_frames(rng: random.Random) -> dict[str, list[bytes]]:
+    """Образцы крупных кадров по классам"""
+    snapshots = []
+    histories = []
+    chunks = []
+    for _ in range(20):
+        players = [
+            PlayerJoin(
+                rng.randint(1, 10**6),
+                f'{rng.choice(NAMES)}{i}',
+                rng.randint(-100, 100),
+                rng.randint(0, 40),
+            )
+            for i in range(rng.randint(20, 80))
+        ]
+        snapshots.append(GameProtocol.pack_world_state(players))
+        history = [
+            ChatMessage(
+                rng.randint(1, 10**6),
+                ' '.join(rng.choice(CHAT_WORDS) for _ in range(rng.randint(1, 8))),
+                1_700_000_000_000 + i * 1500,
+            )
+            for i in range(50)
+        ]
+        histories.append(GameProtocol.pack_chat_history(history))
+        chunks.append(chunk_frame(rng))
+    return {'snapshot': snapshots, 'chat history': histories, 'chunks': chunks}
+
+
+def train_dictionary(samples: dict[str, list[bytes]], size: int = 16 * 1024) -> bytes:
+    """Словарь zlib: конец словаря zlib использует охотнее, поэтому частые
+    куски (начала кадров каждого класса) идут последними"""
+    pieces = [frame[1:513] for frames in samples.values() for frame in frames]
+    return b''.join(pieces)[-size:]
+
+
+def run_compression(rounds: int) -> None:
+    samples = sample_frames(random.Random(1))
+    # Словарь учится на одних образцах, меряется на других
+    zdict = train_dictionary(sample_frames(random.Random(2)))
+    policies = {
+        'level 1': CompressionPolicy(0, 1),
+        'level 6': CompressionPolicy(0, 6),
+        'level 9': CompressionPolicy(0, 9),
+        'level 6 + dict': CompressionPolicy(0, 6, zdict),
+    }
+    for name, frames in samples.items():
+        raw = sum(len(frame) for frame in frames)
+        print(f'{name}: avg {raw / len(frames):.0f} B')
+        for title, policy in policies.items():
+            started = time.perf_counter()
+            for _ in range(rounds):
+                packed = [policy.compress(frame) for frame in frames]
+            elapsed = (time.perf_counter() - started) / (rounds * len(frames))
+            size = sum(len(frame) for frame in packed)
+            print(
+                f'  {title:>15}: {size / raw:6.1%} of raw, '
+                f'{elapsed * 1e6:7.1f} us/frame'
+            )
+
+
+def fanout_sessions(recipients: int) -> GameSessionsManager:
+    """Получатели без сокетов и задач отправки: кадры копятся в очередях.
+
+    Каждый десятый - клиент версии 1, половина остальных умеет сжатие.
+    """
+    sessions = GameSessionsManager()
+    for i in range(recipients):
+        if i % 10 == 0:
+            player = PlayerSession(None, i, f'p{i}', 0, 0)
+        else:
+            capabilities = Capability.COMPRESSION if i % 2 else Capability(0)
+            player = PlayerSession(
+                None, i, f'p{i}', 0, 0, PROTOCOL_VERSION, capabilities
+            )
+        sessions.players[player.name] = player
+    return sessions
+
+
+def measure(title: str, recipients: list[PlayerSession], send) -> None:
+    """Память и число разных кадров в очередях после одной рассылки"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    send()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    frames = set()
+    for player in recipients:
+        while not player.send_queue.empty():
+            frames.add(id(player.send_queue.get_nowait()))
+    print(
+        f'{title:>14}: {blocks} blocks, {size / 1024:.1f} KiB, '
+        f'{len(frames)} distinct frames for {len(recipients)} recipients'
+    )
+
+
+def run_fanout(recipients: int) -> None:
+    sessions = fanout_sessions(recipients)
+    players = list(sessions.players.values())
+    text = ' '.join(random.Random(0).choice(CHAT_WORDS) for _ in range(100))
+    chat = ChatMessage(1, text, 1_700_000_000_000)
+    update = PlayerJoin(1, 'mover', 5, 7)
+    messages = {
+        'update': (
+            MessageType.PLAYER_UPDATE,
+            lambda codec: (
+                LegacyProtocol.pack_player_update(update)
+                if codec is LegacyProtocol
+                else GameProtocol.pack_player_update(PlayerUpdate(1, 5, 7))
+            ),
+        ),
+        'chat': (
+            MessageType.CHAT_MESSAGE,
+            # Чат клиентам версии 1 не уходит
+            lambda codec: (
+                None
+                if codec is LegacyProtocol
+                else GameProtocol.pack_chat_message(chat)
+            ),
+        ),
+    }
+    for name, (msg_type, encode) in messages.items():
+        print(f'{name}:')
+
+        def per_recipient():
+            for player in players:
+                frame = encode(player.codec)
+                if frame is not None:
+                    player.enqueue(frame)
+
+        measure('per recipient', players, per_recipient)
+        measure(
+            'fan-out', players, lambda: sessions.fan_out(msg_type, encode, players)
+        )
+    print(f'compression: {compressionPolicy.snapshot()}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=50)
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--compression', action='store_true')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--train-dict', metavar='PATH')
+    parser.add_argument('--fanout', action='store_true')
+    parser.add_argument('--recipients', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.fanout:
+        run_fanout(args.recipients)
+        return
+    if args.train_dict:
+        zdict = train_dictionary(sample_frames(random.Random(2)))
+        Path(args.train_dict).write_bytes(zdict)
+        print(f'dictionary: {len(zdict)} B -> {args.train_dict}')
+        return
+    if args.compression:
+        run_compression(args.rounds)
+        return
+
+    legacy, current = session_frames(args.players, args.updates)
+    report('legacy (20s names)', legacy)
+    report('current (id + names in join)', current)
+    print(f'bytes saved: {1 - sum(current) / sum(legacy):.1%}')
+
+
+if __name__ == '__main__':
+    main()
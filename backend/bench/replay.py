@@ -0,0 +1,303 @@
+"""Проигрывание записанного трафика /game/ws на локальном сервере.
+
+Запись включается на сервере: RECORD_DIR=recordings (см. src/engine/recorder.py).
+Проигрывание входящих кадров каждой записанной сессии:
+    python bench/replay.py recordings --speed 1     # в реальном времени
+    python bench/replay.py recordings --copies 10   # в 10 раз больше игроков
+
+Каждая записанная сессия (одно соединение) становится игроком
+replay_<pid>_<номер>_<копия>. Абсолютные позиции (PLAYER_UPDATE) сдвигаются
+на разницу между точкой появления в записи и у нового игрока, иначе guard
+отбросил бы их как 'speed'. Ввод (PLAYER_INPUT) и чат идут как есть.
+
+Нагрузку умножает --copies: у каждого соединения остается темп записи.
+--speed сжимает время каждого соединения; выше MOVE_RATE кадров в секунду
+guard отбрасывает лишнее как 'rate', и нагрузка уже не та, что в записи.
+
+Печатается поток отправленных и полученных кадров, p50/p99 задержки от
+кадра движения или чата до ответа сервера этому же игроку (своя позиция
+после тика, свое сообщение в рассылке), RTT ping-pong вебсокета, отставание
+от расписания и отброшенные guard кадры по причинам (/status/throttled).
+Клиенту версии 1 своя позиция приходит только из физики, поэтому его
+кадры вне загруженных чанков остаются в unanswered.
+"""
+
+import argparse
+import asyncio
+import struct
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import websockets
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.engine.compression import compressionPolicy
+from src.engine.GameProtocol import (GameProtocol, MessageType, PlayerJoin,
+                                     PlayerUpdate)
+from src.engine.legacy_protocol import PLAYER_FORMAT, LegacyProtocol
+from src.engine.recorder import (FILE_PREFIX, FILE_SUFFIX, Direction,
+                                 read_records, record_source)
+from ws_load import get_json, get_token, percentile
+
+MOVE_TYPES = (MessageType.PLAYER_UPDATE, MessageType.PLAYER_INPUT)
+
+
+@dataclass
+class RecordedSession:
+    # Входящие кадры, время - смещение от начала записи
+    frames: list[tuple[float, bytes]] = field(default_factory=list)
+    # Где игрок появился в записи (PLAYER_INIT сервера)
+    spawn: tuple[int, int] | None = None
+
+    @property
+    def legacy(self) -> bool:
+        """Клиент версии 1 не начинает с HELLO"""
+        return not self.frames or self.frames[0][1][0] != MessageType.HELLO
+
+
+class ReplayStats:
+    def __init__(self) -> None:
+        self.sent = 0
+        self.received = 0
+        self.received_bytes = 0
+        self.rebased = 0
+        self.rtts: list[float] = []
+        self.lags: list[float] = []
+        # От кадра движения или чата до ответа сервера этому игроку
+        self.latencies: list[float] = []
+        self.unanswered = 0
+
+
+def unpack_init(frame: bytes, legacy: bool) -> tuple[int, str, int, int]:
+    """id, имя и позиция из PLAYER_INIT любой версии протокола"""
+    if legacy:
+        _, player_id, name, x, y = struct.unpack(PLAYER_FORMAT, frame)
+        return player_id, name.rstrip(b'\0').decode('utf-8'), x, y
+    init = GameProtocol.unpack_player_init(frame)
+    return init.player_id, init.name, init.x, init.y
+
+
+def load_sessions(target: Path) -> dict[str, RecordedSession]:
+    """Записанные сессии: входящие кадры и точка появления игрока.
+
+    Сессия - pid процесса из имени файла и номер соединения в нем; monotonic
+    общий для процессов одной машины, поэтому записи воркеров сводятся по нему.
+    """
+    if target.is_dir():
+        paths = sorted(target.glob(f'{FILE_PREFIX}*{FILE_SUFFIX}'))
+    else:
+        paths = [target]
+    sessions: dict[str, RecordedSession] = defaultdict(RecordedSession)
+    inits: dict[str, bytes] = {}
+    started = None
+    for path in paths:
+        source = record_source(path)
+        for timestamp, session_id, direction, frame in read_records([path]):
+            if started is None or timestamp < started:
+                started = timestamp
+            key = f'{source}_{session_id}'
+            if direction == Direction.INBOUND:
+                sessions[key].frames.append((timestamp, frame))
+                continue
+            if key not in inits and frame:
+                # Исходящие кадры записаны уже сжатыми
+                frame = GameProtocol.decompress_frame(frame, compressionPolicy.zdict)
+                if frame[0] == MessageType.PLAYER_INIT:
+                    inits[key] = frame
+    for key, session in sessions.items():
+        session.frames = [
+            (timestamp - started, frame) for timestamp, frame in session.frames
+        ]
+        if key in inits:
+            session.spawn = unpack_init(inits[key], session.legacy)[2:]
+    return sessions
+
+
+class ReplayPlayer:
+    """Одно соединение: шлет кадры по расписанию записи и ждет ответов на них"""
+
+    def __init__(self, args, session: RecordedSession, stats: ReplayStats) -> None:
+        self.args = args
+        self.session = session
+        self.stats = stats
+        self.player_id = None
+        self.name = ''
+        self.offset = (0, 0)
+        self.ready = asyncio.Event()
+        self.moves: deque[float] = deque()
+        self.chats: deque[float] = deque()
+
+    def on_message(self, message: bytes) -> None:
+        self.stats.received += 1
+        self.stats.received_bytes += len(message)
+        message = GameProtocol.decompress_frame(message, compressionPolicy.zdict)
+        msg_type = message[0]
+        if msg_type == MessageType.PLAYER_INIT and self.player_id is None:
+            self.player_id, self.name, x, y = unpack_init(
+                message, self.session.legacy
+            )
+            if self.session.spawn is not None:
+                spawn_x, spawn_y = self.session.spawn
+                self.offset = (x - spawn_x, y - spawn_y)
+            self.ready.set()
+        elif msg_type == MessageType.PLAYER_UPDATE:
+            codec = LegacyProtocol if self.session.legacy else GameProtocol
+            if codec.unpack_player_update(message).player_id == self.player_id:
+                # Тик съел весь накопленный ввод разом
+                self.answer(self.moves, len(self.moves))
+        elif msg_type == MessageType.CHAT_MESSAGE:
+            if GameProtocol.unpack_chat_message(message).player_id == self.player_id:
+                self.answer(self.chats, 1)
+
+    def answer(self, pending: deque[float], count: int) -> None:
+        now = time.perf_counter()
+        for _ in range(min(count, len(pending))):
+            self.stats.latencies.append(now - pending.popleft())
+
+    def rebase(self, frame: bytes) -> bytes:
+        """Позиция из записи относительно точки появления нового игрока"""
+        codec = LegacyProtocol if self.session.legacy else GameProtocol
+        update = codec.unpack_player_update(frame)
+        x, y = update.x + self.offset[0], update.y + self.offset[1]
+        self.stats.rebased += 1
+        if self.session.legacy:
+            return codec.pack_player_update(PlayerJoin(self.player_id, self.name, x, y))
+        return codec.pack_player_update(PlayerUpdate(self.player_id, x, y))
+
+    async def run(self, token: str, started: float) -> None:
+        args = self.args
+        if args.speed > 0 and self.session.frames:
+            # Подключение - к первому кадру сессии: HELLO ждут недолго, и
+            # опоздавший клиент стал бы версией 1
+            delay = started + self.session.frames[0][0] / args.speed
+            await asyncio.sleep(delay - time.perf_counter())
+        url = f'ws://{args.host}:{args.port}/game/ws?token={token}'
+        async with websockets.connect(url) as ws:
+
+            async def receiver():
+                async for message in ws:
+                    self.on_message(message)
+
+            async def pinger():
+                while True:
+                    await asyncio.sleep(args.ping_interval)
+                    sent_at = time.perf_counter()
+                    await (await ws.ping())
+                    self.stats.rtts.append(time.perf_counter() - sent_at)
+
+            tasks = [asyncio.create_task(receiver()), asyncio.create_task(pinger())]
+            if args.speed > 0 and self.session.frames:
+                # Расписание - от подключения: рукопожатие не копится в отставание
+                started = time.perf_counter() - self.session.frames[0][0] / args.speed
+            for offset, frame in self.session.frames:
+                if args.speed > 0:
+                    delay = started + offset / args.speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        self.stats.lags.append(-delay)
+                if frame[0] == MessageType.PLAYER_UPDATE:
+                    if not self.ready.is_set():
+                        # Сдвиг известен только после PLAYER_INIT; вход в игру
+                        # сдвигает расписание, а не копится в отставание
+                        waited_from = time.perf_counter()
+                        await self.ready.wait()
+                        started += time.perf_counter() - waited_from
+                    frame = self.rebase(frame)
+                await ws.send(frame)
+                self.stats.sent += 1
+                if frame[0] in MOVE_TYPES:
+                    self.moves.append(time.perf_counter())
+                elif frame[0] == MessageType.CHAT_MESSAGE:
+                    self.chats.append(time.perf_counter())
+
+            await asyncio.sleep(args.drain)
+            self.stats.unanswered += len(self.moves) + len(self.chats)
+            for task in tasks:
+                task.cancel()
+
+
+async def run(args):
+    sessions = load_sessions(Path(args.recording))
+    if args.sessions:
+        sessions = dict(list(sessions.items())[: args.sessions])
+    players = [
+        (f'replay_{session_id}_{copy}', session)
+        for session_id, session in sessions.items()
+        for copy in range(args.copies)
+    ]
+    loop = asyncio.get_running_loop()
+    tokens = await asyncio.gather(
+        *(
+            loop.run_in_executor(None, get_token, args.host, args.port, name)
+            for name, _ in players
+        )
+    )
+
+    def drops() -> Counter:
+        status = get_json(args.host, args.port, '/status/throttled')
+        return Counter(status['drops'])
+
+    drops_before = await loop.run_in_executor(None, drops)
+    stats = ReplayStats()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            ReplayPlayer(args, session, stats).run(token, started)
+            for token, (_, session) in zip(tokens, players)
+        ),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started - args.drain
+    dropped = await loop.run_in_executor(None, drops)
+    dropped.subtract(drops_before)
+
+    print(
+        f'sessions: {len(sessions)} x {args.copies}, '
+        f'speed: {args.speed or "max"}'
+    )
+    print(
+        f'sent: {stats.sent} frames, {stats.sent / elapsed:.0f} frames/s, '
+        f'rebased positions: {stats.rebased}'
+    )
+    print(
+        f'received: {stats.received} frames, {stats.received / elapsed:.0f} frames/s, '
+        f'{stats.received_bytes / elapsed / 1024:.1f} KiB/s'
+    )
+    print(
+        f'message latency p50: {percentile(stats.latencies, 0.5) * 1000:.1f} ms, '
+        f'p99: {percentile(stats.latencies, 0.99) * 1000:.1f} ms, '
+        f'unanswered: {stats.unanswered}'
+    )
+    print(
+        f'rtt p50: {percentile(stats.rtts, 0.5) * 1000:.1f} ms, '
+        f'p99: {percentile(stats.rtts, 0.99) * 1000:.1f} ms'
+    )
+    if args.speed > 0:
+        print(f'schedule lag p99: {percentile(stats.lags, 0.99) * 1000:.1f} ms')
+    # Запись проиграна честно, только если guard ничего не отбросил
+    print(f'guard drops: {dict(+dropped) or "none"}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'recording', help='файл traffic-PID-NNNN.bin или папка RECORD_DIR'
+    )
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--speed', type=float, default=1.0, help='0 - без пауз')
+    parser.add_argument('--copies', type=int, default=1)
+    parser.add_argument('--sessions', type=int, default=0)
+    parser.add_argument('--ping-interval', type=float, default=0.5)
+    parser.add_argument('--drain', type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+"""Нагрузка на /game/ws.
+
+Режим hold: держит N вебсокетов открытыми и смотрит на пул базы.
+    python bench/ws_load.py --host localhost --port 8000 -n 500
+
+После подключения всех клиентов печатает /status/db: max_checked_out
+должен оставаться в пределах нескольких соединений, а не расти с N.
+Без сервера и Postgres то же проверяет bench/checks.py pool.
+
+Режим capacity: N игроков, разложенных по W воркерам (src/cluster.py),
+идут вводом PLAYER_INPUT с частотой --rate в свои полосы и ходят там;
+печатается доставленный поток обновлений и p99 задержки от ввода до
+получения новой позиции другим игроком. Замер начинается, когда все дошли
+(не дольше --warmup секунд). Код выхода 1, если кто-то не дошел или guard
+отбросил ввод как 'speed' или 'rate': такой замер ничего не меряет.
+    python bench/ws_load.py --mode capacity --workers 4 -n 2000 --rate 10
+
+Емкость = наибольшее N, при котором p99 укладывается в бюджет тика;
+сравнивайте ее при --workers 1, 2, 4 на одной машине.
+
+Сравнение запусков (src/main.py против src/cluster.py): connect rate
+из режима hold и p50/p99 задержки сообщения из режима capacity с --workers 1.
+
+Режим soak: тысячи циклов подключение - обрыв. Клиенты закрываются чисто,
+рвут TCP без close, шлют мусор или рвут соединение до init. Печатается
+/status/sessions по ходу: players и rss_bytes должны оставаться ровными.
+    python bench/ws_load.py --mode soak --cycles 5000 --concurrency 50
+Без сервера, с проверкой и кодом выхода 1 при утечке: bench/checks.py soak.
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import websockets
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.engine.compression import compressionPolicy
+from src.engine.GameProtocol import (PROTOCOL_VERSION, Capability,
+                                     GameProtocol, Hello, InputDirection,
+                                     MessageType, PlayerInput)
+from src.engine.regions import CHUNK_SIZE
+
+
+def get_token(host: str, port: int, name: str) -> str:
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.request(
+        'POST',
+        '/auth/login',
+        body=json.dumps({'name': name, 'password': 'bench'}),
+        headers={'Content-Type': 'application/json'},
+    )
+    return json.loads(connection.getresponse().read())['access_token']
+
+
+def get_json(host: str, port: int, path: str) -> dict:
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    connection.request('GET', path)
+    return json.loads(connection.getresponse().read())
+
+
+HELLO = GameProtocol.pack_hello(Hello(PROTOCOL_VERSION, Capability.BATCHED_SNAPSHOTS))
+
+
+async def hold_connection(url: str, ready: asyncio.Event, done: asyncio.Event):
+    async with websockets.connect(url) as ws:
+        await ws.send(HELLO)
+        await ws.recv()
+        ready.set()
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class CapacityStats:
+    def __init__(self) -> None:
+        # (player_id, x) -> время отправки ввода, который ведет игрока в x
+        self.sent: dict[tuple[int, int], float] = {}
+        self.latencies: list[float] = []
+        self.received = 0
+        self.handoffs = 0
+        # Сколько игроков дошло до своей полосы
+        self.arrived = 0
+
+
+# Размах хождения по полосе в тайлах: каждый x повторяется раз в 2 * SWING
+# шагов, и ответ успевает прийти до следующего шага в тот же x
+SWING = 20
+# Сколько вводов подряд без сдвига считается упором в стену
+STUCK_INPUTS = 3
+
+
+async def capacity_player(
+    args, token: str, worker: int, stats: CapacityStats, done: asyncio.Event
+):
+    """Игрок идет вводом PLAYER_INPUT в середину полосы своего воркера и ходит
+    там туда-обратно. Ввод - шаг в тайл, как у настоящего клиента: guard
+    не отбрасывает его ни как 'speed', ни как 'rate' при --rate < MOVE_RATE.
+    """
+    strip_width = CHUNK_SIZE * args.region_chunks * args.strip_regions
+    target_x = worker * strip_width + strip_width // 2
+    port = args.port + worker
+    arrived = False
+    heading = 1
+    seq = 0
+    last_x = None
+    stuck = 0
+
+    while not done.is_set():
+        url = f'ws://{args.host}:{port}/game/ws?token={token}'
+        async with websockets.connect(url) as ws:
+            await ws.send(HELLO)
+            first = await ws.recv()
+            if first[0] == MessageType.HELLO:
+                first = await ws.recv()
+            if first[0] == MessageType.PLAYER_HANDOFF:
+                stats.handoffs += 1
+                port = GameProtocol.unpack_player_handoff(first).port
+                continue
+            init = GameProtocol.unpack_player_init(first)
+            # Позиция по серверу: поправка приходит на каждый съеденный ввод
+            position = [init.x]
+
+            async def receiver():
+                async for message in ws:
+                    message = GameProtocol.decompress_frame(
+                        message, compressionPolicy.zdict
+                    )
+                    if message[0] == MessageType.PLAYER_HANDOFF:
+                        return GameProtocol.unpack_player_handoff(message).port
+                    if message[0] != MessageType.PLAYER_UPDATE:
+                        continue
+                    update = GameProtocol.unpack_player_update(message)
+                    if update.player_id == init.player_id:
+                        position[0] = update.x
+                        continue
+                    stats.received += 1
+                    sent_at = stats.sent.pop((update.player_id, update.x), None)
+                    if sent_at is not None:
+                        stats.latencies.append(time.perf_counter() - sent_at)
+                return None
+
+            receive_task = asyncio.create_task(receiver())
+            while not done.is_set() and not receive_task.done():
+                x = position[0]
+                if not arrived and abs(x - target_x) <= 1:
+                    arrived = True
+                    stats.arrived += 1
+                if arrived:
+                    if x - target_x >= SWING:
+                        heading = -1
+                    elif target_x - x >= SWING:
+                        heading = 1
+                else:
+                    heading = 1 if target_x > x else -1
+                direction = (
+                    InputDirection.RIGHT if heading > 0 else InputDirection.LEFT
+                )
+                # Физика уперла в стену: прыгаем, пока стоим
+                stuck = stuck + 1 if x == last_x else 0
+                last_x = x
+                if stuck >= STUCK_INPUTS:
+                    direction |= InputDirection.UP
+                seq += 1
+                stats.sent[(init.player_id, x + heading)] = time.perf_counter()
+                await ws.send(
+                    GameProtocol.pack_player_input(PlayerInput(seq, direction))
+                )
+                await asyncio.sleep(1 / args.rate)
+
+            if not receive_task.done():
+                receive_task.cancel()
+                return
+            new_port = receive_task.result()
+            if new_port is None:
+                return
+            stats.handoffs += 1
+            port = new_port
+
+
+def guard_drops(args) -> Counter:
+    """Отброшенные guard кадры по причинам, сумма по всем воркерам"""
+    drops = Counter()
+    for worker in range(args.workers):
+        status = get_json(args.host, args.port + worker, '/status/throttled')
+        drops.update(status['drops'])
+    return drops
+
+
+async def run_capacity(args):
+    loop = asyncio.get_running_loop()
+    tokens = await asyncio.gather(
+        *(
+            loop.run_in_executor(None, get_token, args.host, args.port, f'cap_{i}')
+            for i in range(args.connections)
+        )
+    )
+    drops_before = await loop.run_in_executor(None, guard_drops, args)
+    stats = CapacityStats()
+    done = asyncio.Event()
+    tasks = [
+        asyncio.create_task(
+            capacity_player(args, token, i % args.workers, stats, done)
+        )
+        for i, token in enumerate(tokens)
+    ]
+
+    # Замер - только когда все дошли до своих полос
+    deadline = time.perf_counter() + args.warmup
+    while stats.arrived < len(tasks) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.5)
+    stats.latencies.clear()
+    stats.received = 0
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    dropped = await loop.run_in_executor(None, guard_drops, args)
+    dropped.subtract(drops_before)
+
+    print(f'players: {args.connections}, workers: {args.workers}, rate: {args.rate}')
+    print(f'arrived: {stats.arrived}/{len(tasks)}, handoffs: {stats.handoffs}')
+    print(f'delivered updates: {stats.received / elapsed:.0f}/s')
+    print(f'p50: {percentile(stats.latencies, 0.5) * 1000:.1f} ms')
+    print(f'p99: {percentile(stats.latencies, 0.99) * 1000:.1f} ms')
+    print(f'guard drops: {dict(+dropped) or "none"}')
+    # Отброшенный ввод - это игроки, которые стоят, а не нагрузка
+    throttled = dropped['speed'] + dropped['rate']
+    if throttled or stats.arrived < len(tasks):
+        print(f'FAIL: {throttled} moves dropped, {stats.arrived} arrived')
+        sys.exit(1)
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    tokens = await asyncio.gather(
+        *(
+            loop.run_in_executor(None, get_token, args.host, args.port, f'ws_{i}')
+            for i in range(args.connections)
+        )
+    )
+
+    done = asyncio.Event()
+    ready_events = [asyncio.Event() for _ in tokens]
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(
+            hold_connection(
+                f'ws://{args.host}:{args.port}/game/ws?token={token}', ready, done
+            )
+        )
+        for token, ready in zip(tokens, ready_events)
+    ]
+    await asyncio.gather(*(ready.wait() for ready in ready_events))
+    elapsed = time.perf_counter() - started
+    print(f'connected: {len(tasks)} in {elapsed:.2f}s')
+    print(f'connect rate: {len(tasks) / elapsed:.1f} conn/s')
+
+    await asyncio.sleep(args.hold)
+    pool = await loop.run_in_executor(
+        None, get_json, args.host, args.port, '/status/db'
+    )
+    print('pool:', pool)
+
+    done.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+SOAK_ENDINGS = ('close', 'abort', 'garbage', 'early')
+
+
+async def soak_cycle(url: str, ending: str) -> bool:
+    """Одно подключение, которое заканчивается так, как сказано в ending"""
+    try:
+        ws = await websockets.connect(url)
+    except Exception:
+        return False
+    try:
+        await ws.send(HELLO)
+        if ending == 'early':
+            ws.transport.abort()
+            return True
+        await ws.recv()  # HELLO
+        await ws.recv()  # init
+        if ending == 'close':
+            await ws.close()
+            return True
+        if ending == 'garbage':
+            await ws.send(b'\xff\x00\x01')
+        ws.transport.abort()
+        return True
+    except Exception:
+        ws.transport.abort()
+        return False
+
+
+def print_sessions(cycles: int, status: dict) -> None:
+    rss = status['rss_bytes']
+    rss_text = f'{rss / 1024 / 1024:.1f} MiB' if rss is not None else '-'
+    print(
+        f'cycles: {cycles:6d}  players: {status["players"]:4d}  '
+        f'rss: {rss_text}  reaped: {status["reaped"]}'
+    )
+
+
+async def run_soak(args):
+    loop = asyncio.get_running_loop()
+    tokens = await asyncio.gather(
+        *(
+            loop.run_in_executor(None, get_token, args.host, args.port, f'soak_{i}')
+            for i in range(args.concurrency)
+        )
+    )
+    urls = [f'ws://{args.host}:{args.port}/game/ws?token={token}' for token in tokens]
+
+    def sessions() -> dict:
+        return get_json(args.host, args.port, '/status/sessions')
+
+    first = await loop.run_in_executor(None, sessions)
+    print_sessions(0, first)
+    cycles = 0
+    failed = 0
+    while cycles < args.cycles:
+        # Каждый слот - свой игрок: повторный вход того же имени идет
+        # только после того, как прошлое соединение этого слота оборвалось
+        results = await asyncio.gather(
+            *(
+                soak_cycle(url, SOAK_ENDINGS[(cycles + i) % len(SOAK_ENDINGS)])
+                for i, url in enumerate(urls)
+            )
+        )
+        cycles += len(results)
+        failed += results.count(False)
+        if cycles % args.sample_every < len(results):
+            print_sessions(cycles, await loop.run_in_executor(None, sessions))
+
+    # Даем серверу дочистить оборванные соединения
+    await asyncio.sleep(args.settle)
+    last = await loop.run_in_executor(None, sessions)
+    print_sessions(cycles, last)
+    print(f'failed cycles: {failed}')
+    print(f'players: {first["players"]} -> {last["players"]}')
+    if first['rss_bytes'] is not None and last['rss_bytes'] is not None:
+        growth = (last['rss_bytes'] - first['rss_bytes']) / 1024 / 1024
+        print(f'rss growth: {growth:.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-n', '--connections', type=int, default=500)
+    parser.add_argument('--hold', type=float, default=5.0)
+    parser.add_argument(
+        '--mode', choices=('hold', 'capacity', 'soak'), default='hold'
+    )
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=120.0)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--region-chunks', type=int, default=4)
+    parser.add_argument('--strip-regions', type=int, default=2)
+    parser.add_argument('--cycles', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--sample-every', type=int, default=500)
+    parser.add_argument('--settle', type=float, default=10.0)
+    args = parser.parse_args()
+    modes = {'hold': run, 'capacity': run_capacity, 'soak': run_soak}
+    asyncio.run(modes[args.mode](args))
+
+
+if __name__ == '__main__':
+    main()
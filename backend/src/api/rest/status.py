@@ -1,8 +1,67 @@
+import os
+
 from fastapi import APIRouter
 
+from src.database import engine
+from src.engine.compression import compressionPolicy
+from src.engine.GameSessionManager import gameSessionsManager
+from src.engine.guard import inboundGuard
+from src.engine.mobs import mobStore
+from src.engine.reaper import sessionReaper
+from src.utils.pool_metrics import pool_metrics
+from src.utils.tick_profiler import tickProfiler
+
 router = APIRouter(prefix='/status', tags=['Status'])
 
 
 @router.get('')
 async def get_status():
     return {'status': 'ok'}
+
+
+@router.get('/db')
+async def get_db_pool_status():
+    return pool_metrics.snapshot(engine.sync_engine.pool)
+
+
+@router.get('/compression')
+async def get_compression_status():
+    return compressionPolicy.snapshot()
+
+
+@router.get('/ticks')
+async def get_tick_status():
+    """Время фаз тика (avg/p99/max) и профиль последнего медленного тика"""
+    return tickProfiler.snapshot()
+
+
+@router.get('/mobs')
+async def get_mob_status():
+    return mobStore.snapshot()
+
+
+def _rss_bytes() -> int | None:
+    """Текущий RSS процесса; есть только на Linux"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+@router.get('/sessions')
+async def get_sessions_status():
+    """Число сессий и сколько убрал reaper: для soak-теста bench/ws_load.py"""
+    return {**sessionReaper.snapshot(), 'rss_bytes': _rss_bytes()}
+
+
+@router.get('/fanout')
+async def get_fanout_status():
+    """Рассылки по типам сообщений: вызовы, кодирования, кадры, отброшенные"""
+    return gameSessionsManager.fanout_snapshot()
+
+
+@router.get('/throttled')
+async def get_throttled_status():
+    """Отброшенные входящие кадры по причинам и самые ограничиваемые клиенты"""
+    return inboundGuard.snapshot()
@@ -1,106 +1,164 @@
+import asyncio
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from src.api.dependencies import UserDep
-from src.api.rest.auth import DbDep
-from src.engine.GameProtocol import (GameProtocol, PlayerInit, PlayerJoin,
-                                     PlayerUpdate)
-from src.engine.GameSessionManager import gameSessionsManager
+from src.config import settings
+from src.database import async_session_maker
+from src.engine.backplane import BackplaneEvent
+from src.engine.GameProtocol import (ChatMessage, GameProtocol, Hello,
+                                     MessageType, PlayerHandoff, PlayerInit,
+                                     PlayerInput, PlayerJoin, PlayerUpdate)
+from src.engine.GameSessionManager import gameSessionsManager, negotiate
+from src.engine.guard import inboundGuard
+from src.engine.persistence import positionPersister
+from src.engine.recorder import Direction, trafficRecorder
+from src.engine.regions import region_of
+from src.engine.sharding import shardMap
+from src.utils.db_manager import DbManager
 
 router = APIRouter(prefix='/game', tags=['ws'])
 
 
+async def handshake(
+    websocket: WebSocket, session_id: int
+) -> tuple[Hello | None, bytes | None]:
+    """Ждет HELLO от клиента и отвечает выбранной версией и возможностями.
+
+    Клиенты версии 1 рукопожатие не шлют: через HANDSHAKE_TIMEOUT или по первому
+    другому кадру они остаются на старом протоколе. Такой кадр возвращается,
+    чтобы его обработал основной цикл.
+    """
+    try:
+        first = await asyncio.wait_for(
+            websocket.receive_bytes(), settings.HANDSHAKE_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        return None, None
+    trafficRecorder.record(session_id, Direction.INBOUND, first)
+    if not first or first[0] != MessageType.HELLO:
+        return None, first
+
+    hello = negotiate(GameProtocol.unpack_hello(first))
+    reply = GameProtocol.pack_hello(hello)
+    trafficRecorder.record(session_id, Direction.OUTBOUND, reply)
+    await websocket.send_bytes(reply)
+    return hello, None
+
+
+async def send_handoff(websocket: WebSocket, x: int, y: int):
+    """Отправляет клиента к воркеру, которому принадлежит регион (x, y)"""
+    host, port = shardMap.worker_address(shardMap.owner_of(region_of(x, y)))
+    await websocket.send_bytes(
+        GameProtocol.pack_player_handoff(PlayerHandoff(host, port))
+    )
+    await websocket.close()
+
+
 @router.websocket('/ws')
-async def ws(db: DbDep, websocket: WebSocket, user: UserDep):
+async def ws(websocket: WebSocket, user: UserDep):
+    player = None
+    record_id = trafficRecorder.new_session()
     try:
         await websocket.accept()
 
-        user_data = await db.users.get_uesr_with_hashedPwd(id=user['user_id'])
+        # Сессия нужна только на загрузку игрока: держать ее открытой все время
+        # жизни вебсокета значит занять соединение из пула на часы.
+        async with DbManager(session_factory=async_session_maker) as db:
+            user_data = await db.users.get_uesr_with_hashedPwd(id=user['user_id'])
 
         if user_data.x is None:
             user_data.x = 0
         if user_data.y is None:
             user_data.y = 0
 
-        gameSessionsManager.add_player(
-            websocket, user['user_id'], user_data.name, user_data.x, user_data.y
+        if not shardMap.is_local(region_of(user_data.x, user_data.y)):
+            await send_handoff(websocket, user_data.x, user_data.y)
+            return
+
+        hello, pending_message = await handshake(websocket, record_id)
+
+        # С этого момента сессию убирает finally, как бы ни закончилось соединение
+        player = gameSessionsManager.add_player(
+            websocket,
+            user['user_id'],
+            user_data.name,
+            user_data.x,
+            user_data.y,
+            hello,
+            record_id,
         )
+        codec = player.codec
 
-        player = gameSessionsManager.players[user_data.name]
+        # Init и снимок мира ставятся в очередь сразу, до первого await:
+        # так они гарантированно уйдут раньше рассылок, попавших в очередь игрока.
         init_player_data = PlayerInit(
             player.id,
             player.name,
             player.position['x'],
             player.position['y'],
         )
-        data = GameProtocol.pack_player_init(init_player_data)
-        await websocket.send_bytes(data)
-
-        for (
-            existing_player_name,
-            existing_player,
-        ) in gameSessionsManager.players.items():
-            if existing_player.id == user['user_id']:
-                continue
+        player.enqueue(codec.pack_player_init(init_player_data))
+        for frame in gameSessionsManager.world_snapshot(player):
+            player.enqueue(frame)
+        chat_history = gameSessionsManager.chat_history_frame(player.region)
+        if chat_history is not None and not player.is_legacy:
+            player.enqueue(chat_history)
+
+        join = PlayerJoin(user['user_id'], user_data.name, user_data.x, user_data.y)
+        gameSessionsManager.announce_join(join)
+
+        previous_owner = await gameSessionsManager.backplane.claim_session(
+            user['user_id']
+        )
+        if previous_owner not in (None, gameSessionsManager.backplane.node_id):
+            print(f'{user_data.name} уже в игре на ноде {previous_owner}')
+        await gameSessionsManager.sync_regions()
 
-            existing_player_data = PlayerJoin(
-                existing_player.id,
-                existing_player.name,
-                existing_player.position['x'],
-                existing_player.position['y'],
-            )
-            await websocket.send_bytes(
-                GameProtocol.pack_player_join(existing_player_data)
-            )
-
-        for _, player in gameSessionsManager.players.items():
-            if player.id == user['user_id']:
-                continue
+        await gameSessionsManager.publish(
+            player, BackplaneEvent.PLAYER_JOIN, GameProtocol.pack_player_join(join)
+        )
 
-            data = PlayerJoin(
-                user['user_id'],
-                user_data.name,
-                user_data.x,
-                user_data.y,
-            )
-            print(f'player join send: {user_data.name}')
-            print(data)
-            await player.websocket.send_bytes(GameProtocol.pack_player_join(data))
-
-        while True:
-            message = await websocket.receive_bytes()
+        # Сессию мог убрать reaper: тогда читать дальше незачем
+        while not player.closed:
+            if pending_message is not None:
+                message, pending_message = pending_message, None
+            else:
+                message = await websocket.receive_bytes()
+                trafficRecorder.record(record_id, Direction.INBOUND, message)
+            player.touch()
+            # Лишние и неверные по длине кадры отбрасываются до распаковки
+            if not inboundGuard.admit(player, message):
+                continue
             try:
-                if message:
-                    data = GameProtocol.unpack_message(message)
+                data = codec.unpack_message(message)
+
+                if data is None:
+                    # Битый кадр пропускаем, соединение остается
+                    inboundGuard.drop(player, 'decode')
+                    continue
 
-                    if data is None:
-                        print('Не удалось распаковать сообщение')
-                        return
+                if isinstance(data, ChatMessage):
+                    await gameSessionsManager.send_chat(player, data)
 
-                    print(f'{data=}')
-                    print('name =', data.name)
+                # Движение применяет тик (src/engine/tick.py), здесь только ввод
+                if isinstance(data, PlayerInput):
+                    if player.accept_input(data):
+                        player.queue_input(data)
 
                 if isinstance(data, PlayerUpdate):
-                    if data.name in gameSessionsManager.players:
-                        gameSessionsManager.players[data.name].position['x'] = data.x
-                        gameSessionsManager.players[data.name].position['y'] = data.y
-                        print('player pos updated')
-
-                        for _, player in gameSessionsManager.players.items():
-                            if player.id == user['user_id']:
-                                continue
-                            await player.websocket.send_bytes(message)
-                    else:
-                        print(f'Игрок {data.name} не найден')
+                    # Двигать можно только себя: id из кадра не используется
+                    if inboundGuard.admit_move(player, data):
+                        player.queue_move(data.x, data.y)
             except Exception as ex:
                 print(f'ex 2: {ex}')
 
     except WebSocketDisconnect:
-        print(f'{user_data.name} disconnected')
-        message = GameProtocol.pack_player_leave(user['user_id'])
-        del gameSessionsManager.players[user_data.name]
-
-        for _, player in gameSessionsManager.players.items():
-            await player.websocket.send_bytes(message)
+        print(f'{user["user_id"]} disconnected')
 
     except Exception as ex:
         print('ex: ', ex)
+
+    finally:
+        if player is not None and await gameSessionsManager.remove_player(player):
+            await positionPersister.save([player])
@@ -0,0 +1,98 @@
+"""Продакшен-запуск: несколько воркеров, каждый владеет своими регионами мира.
+
+    python src/cluster.py --workers 4
+
+Воркер i слушает порт WORKER_BASE_PORT + i. Игроки переходят между воркерами
+через PLAYER_HANDOFF, а видят друг друга у границ через Redis backplane,
+поэтому для нескольких воркеров нужен BACKPLANE=redis.
+
+В отличие от src/main.py здесь нет reload, а uvloop и httptools используются,
+если установлены. Для разработки по-прежнему запускайте src/main.py.
+"""
+
+import argparse
+import importlib.util
+import multiprocessing
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import uvicorn
+
+from src.config import settings
+
+
+def uvicorn_options() -> dict:
+    """Параметры uvicorn для продакшена из Settings"""
+    has_uvloop = importlib.util.find_spec('uvloop') is not None
+    has_httptools = importlib.util.find_spec('httptools') is not None
+    return {
+        'loop': 'uvloop' if has_uvloop else 'asyncio',
+        'http': 'httptools' if has_httptools else 'h11',
+        'ws': 'websockets',
+        'ws_ping_interval': settings.WS_PING_INTERVAL,
+        'ws_ping_timeout': settings.WS_PING_TIMEOUT,
+        'ws_max_size': settings.WS_MAX_SIZE,
+        'ws_max_queue': settings.WS_MAX_QUEUE,
+        'ws_per_message_deflate': settings.WS_PER_MESSAGE_DEFLATE,
+        'backlog': settings.SERVER_BACKLOG,
+        'access_log': settings.SERVER_ACCESS_LOG,
+    }
+
+
+def run_worker(index: int, count: int, host: str) -> None:
+    # settings уже загружены при импорте этого модуля, поэтому номер воркера
+    # проставляется в них напрямую, до импорта app и ShardMap
+    settings.WORKER_INDEX = index
+    settings.WORKER_COUNT = count
+    uvicorn.run(
+        'main:app',
+        host=host,
+        port=settings.WORKER_BASE_PORT + index,
+        **uvicorn_options(),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=settings.WORKER_COUNT)
+    parser.add_argument('--host', default=settings.SERVER_HOST)
+    args = parser.parse_args()
+
+    if args.workers > 1 and settings.BACKPLANE != 'redis':
+        sys.exit('Для нескольких воркеров нужен BACKPLANE=redis')
+
+    options = uvicorn_options()
+    print(f'loop: {options["loop"]}, http: {options["http"]}')
+
+    if args.workers == 1:
+        # Один воркер запускаем в этом же процессе, без лишнего fork
+        run_worker(0, 1, args.host)
+        return
+
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(index, args.workers, args.host),
+            name=f'game-worker-{index}',
+        )
+        for index in range(args.workers)
+    ]
+    for index, process in enumerate(processes):
+        process.start()
+        print(f'{process.name}: порт {settings.WORKER_BASE_PORT + index}')
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,84 @@ class Settings(BaseSettings):
     REDIS_HOST: str
     REDIS_PORT: int
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    PLAYER_PERSIST_INTERVAL: float = 10.0
+    # Частота пакетов ввода от клиента
+    INPUT_RATE: int = 20
+    # Лимит кадров движения (ввод и позиция) на соединение, с запасом на джиттер
+    MOVE_RATE: float = 30.0
+    MOVE_BURST: int = 10
+    # Насколько тайлов может сдвинуть одно обновление позиции
+    MAX_MOVE_DELTA: int = 2
+    # Частота игрового тика; бюджет тика - 1 / TICK_RATE
+    TICK_RATE: int = 20
+    TICK_HISTORY: int = 600
+    # Период сэмплирования стека во время тика; 0 - без сэмплирования
+    TICK_SAMPLE_INTERVAL: float = 0.005
+    # Куда сохранять профили медленных тиков; пусто - только в памяти
+    TICK_PROFILE_DIR: str = ''
+    # Сколько ждать HELLO после подключения; без него клиент считается версией 1
+    HANDSHAKE_TIMEOUT: float = 0.5
+
+    # Исходящие кадры на игрока; при переполнении новые кадры отбрасываются
+    SEND_QUEUE_SIZE: int = 256
+    # Сессия без кадров от клиента дольше этого убирается; 0 - не убирать.
+    # Мертвые TCP-соединения раньше находит ping/pong uvicorn (WS_PING_*)
+    SESSION_IDLE_TIMEOUT: float = 600.0
+    REAPER_INTERVAL: float = 5.0
+
+    CHAT_RATE: float = 1.0  # сообщений в секунду
+    CHAT_BURST: int = 5
+    CHAT_MAX_LENGTH: int = 256
+    CHAT_HISTORY_SIZE: int = 50
+
+    # world.json из WorldGenerator.generate_world; пусто - мир без коллизий
+    WORLD_PATH: str = ''
+    # Сколько мобов расселить по пещерам при старте (нужен WORLD_PATH)
+    MOB_SPAWN_COUNT: int = 0
+    # Подшаги физики: на тело за тик и на всю пачку тел за вызов
+    PHYSICS_MAX_SUBSTEPS: int = 4
+    PHYSICS_SUBSTEP_BUDGET: int = 20000
+
+    BACKPLANE: str = 'memory'  # memory | redis
+    REGION_CHUNKS: int = 4
+
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_BACKLOG: int = 2048
+    SERVER_ACCESS_LOG: bool = False
+    WS_PING_INTERVAL: float = 20.0
+    WS_PING_TIMEOUT: float = 20.0
+    # Кадры игры маленькие: большой лимит только раздувает буферы на соединение
+    WS_MAX_SIZE: int = 64 * 1024
+    WS_MAX_QUEUE: int = 32
+    # permessage-deflate сжимает каждый кадр, даже 13-байтные обновления позиции;
+    # обычно выгоднее сжатие крупных кадров в игровом протоколе (COMPRESSION_*)
+    WS_PER_MESSAGE_DEFLATE: bool = False
+
+    # Кадры не короче порога сжимаются zlib для клиентов с Capability.COMPRESSION
+    COMPRESSION_THRESHOLD: int = 256
+    COMPRESSION_LEVEL: int = 6
+    # Предустановленный словарь zlib (bench/protocol_bench.py --train-dict);
+    # тот же файл должен быть у клиентов
+    COMPRESSION_DICT_PATH: str = ''
+
+    # Запись трафика /game/ws для bench/replay.py; пустая строка - выключено
+    RECORD_DIR: str = ''
+    RECORD_MAX_BYTES: int = 64 * 1024 * 1024
+
+    WORKER_COUNT: int = 1
+    WORKER_INDEX: int = 0
+    WORKER_BASE_PORT: int = 8000
+    WORKER_PUBLIC_HOST: str = 'localhost'
+    SHARD_STRIP_REGIONS: int = 2
+    GHOST_MARGIN: int = 8
+
     @property
     def db_url(self):
         return f'postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
@@ -1,9 +1,41 @@
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.config import settings
+from src.utils.pool_metrics import pool_metrics
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который замеряет время ожидания checkout"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.observe_timeout()
+            raise
+        pool_metrics.observe_wait(time.perf_counter() - start)
+        pool_metrics.observe_checked_out(self.checkedout())
+        return connection
+
 
-engine = create_async_engine(settings.db_url)
+engine = create_async_engine(
+    settings.db_url,
+    poolclass=MeteredQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+    },
+)
 
 async_session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
 
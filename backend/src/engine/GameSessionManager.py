@@ -1,41 +1,557 @@
-from typing import Dict
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator
 
 from fastapi import WebSocket
 
+from src.config import settings
+from src.engine.backplane import Backplane, BackplaneEvent, create_backplane
+from src.engine.chat import ChatHistory
+from src.engine.compression import compressionPolicy
+from src.engine.GameProtocol import (LEGACY_PROTOCOL_VERSION, PROTOCOL_VERSION,
+                                     Capability, ChatMessage, GameProtocol,
+                                     Hello, InputDirection, MessageType,
+                                     PlayerHandoff, PlayerInput, PlayerJoin,
+                                     PlayerUpdate)
+from src.engine.legacy_protocol import LegacyProtocol
+from src.engine.recorder import Direction, trafficRecorder
+from src.engine.regions import Region, neighbour_regions, region_of
+from src.engine.sharding import ShardMap, shardMap
+from src.utils.rate_limit import TokenBucket
+
+# Возможности, которые сервер уже умеет
+SERVER_CAPABILITIES = Capability.BATCHED_SNAPSHOTS | Capability.COMPRESSION
+
+
+def negotiate(hello: Hello) -> Hello:
+    """Ответ на HELLO: наибольшая общая версия и общие возможности"""
+    return Hello(
+        min(hello.version, PROTOCOL_VERSION), hello.capabilities & SERVER_CAPABILITIES
+    )
+
 
 class PlayerSession:
     def __init__(
-        self, websocket: WebSocket, id: int, name: str, x: int, y: int
+        self,
+        websocket: WebSocket,
+        id: int,
+        name: str,
+        x: int,
+        y: int,
+        protocol: int = LEGACY_PROTOCOL_VERSION,
+        capabilities: Capability = Capability(0),
+        record_id: int = 0,
     ) -> None:
         self.websocket = websocket
         self.id = id
         self.name = name
+        # Номер соединения в записи трафика (src/engine/recorder.py)
+        self.record_id = record_id
+        # Версия протокола и возможности, о которых договорились в HELLO
+        self.protocol = protocol
+        self.capabilities = capabilities
         if x is None:
             x = 0
         if y is None:
             y = 0
         self.position = {'x': x, 'y': y}
+        # Позиция изменилась с момента последнего сохранения в базу
+        self.dirty = False
+        # Игрок виден соседним воркерам как ghost-сущность
+        self.ghosted = False
+        self.last_input_seq: int | None = None
+        # Лимиты входящих кадров, проверяются до распаковки (src/engine/guard.py)
+        self.move_bucket = TokenBucket(settings.MOVE_RATE, settings.MOVE_BURST)
+        self.chat_bucket = TokenBucket(settings.CHAT_RATE, settings.CHAT_BURST)
+        # Отброшенные входящие кадры по причинам
+        self.drops: Counter[str] = Counter()
+        # Кадры уходят в сокет отдельной задачей, рассылка не ждет медленных
+        self.send_queue: asyncio.Queue[bytes] = asyncio.Queue(
+            maxsize=settings.SEND_QUEUE_SIZE
+        )
+        self.dropped_messages = 0
+        # id игроков, о которых клиенту уже пришел join с именем:
+        # остальные кадры ссылаются на игрока только по id. Себя клиент знает из init
+        self.known_ids: set[int] = {id}
+        # Куда игрок просит сдвинуться; применяется в следующем тике
+        self.pending_position: tuple[int, int] | None = None
+        # Там, где загружен мир, вместо позиции тик берет направления для физики
+        self.pending_directions = InputDirection(0)
+        # Тело в физике: центр в тайлах и скорость
+        self.center = (x + 0.5, y + 0.5)
+        self.velocity = (0.0, 0.0)
+        self.on_ground = False
+        self.handing_off = False
+        self.writer_task: asyncio.Task | None = None
+        # Время последнего кадра от клиента, для таймаута бездействия
+        self.last_seen = time.monotonic()
+        # Сокет не принял кадр: слать дальше бессмысленно, сессию уберет reaper
+        self.send_failed = False
+        self.closed = False
+
+    @property
+    def is_legacy(self) -> bool:
+        return self.protocol < PROTOCOL_VERSION
+
+    @property
+    def codec(self) -> type[GameProtocol] | type[LegacyProtocol]:
+        return LegacyProtocol if self.is_legacy else GameProtocol
+
+    @property
+    def region(self) -> Region:
+        return region_of(self.position['x'], self.position['y'])
 
     def update_position(self, x: int, y: int):
         self.position = {'x': x, 'y': y}
+        self.center = (x + 0.5, y + 0.5)
+        self.velocity = (0.0, 0.0)
+        self.dirty = True
+
+    def move_body(self, center_x: float, center_y: float) -> bool:
+        """Позиция после шага физики; True, если игрок перешел в другой тайл"""
+        self.center = (center_x, center_y)
+        x, y = math.floor(center_x), math.floor(center_y)
+        if (x, y) == (self.position['x'], self.position['y']):
+            return False
+        self.position = {'x': x, 'y': y}
+        self.dirty = True
+        return True
+
+    def accept_input(self, data: PlayerInput) -> bool:
+        """Пропускает пакет ввода, если он новее прошлого.
+
+        Частоту ввода ограничивает move_bucket еще до распаковки (src/engine/guard.py).
+        """
+        if self.last_input_seq is not None:
+            # seq - uint16 с переполнением: новее, если впереди меньше чем на половину
+            ahead = (data.seq - self.last_input_seq) & 0xFFFF
+            if ahead == 0 or ahead >= 0x8000:
+                return False
+        self.last_input_seq = data.seq
+        return True
+
+    def queue_move(self, x: int, y: int):
+        self.pending_position = (x, y)
+        # Для физики абсолютная позиция клиента - только желаемое направление
+        dx = x - self.position['x']
+        dy = y - self.position['y']
+        if dx:
+            self.pending_directions |= (
+                InputDirection.RIGHT if dx > 0 else InputDirection.LEFT
+            )
+        if dy < 0:
+            self.pending_directions |= InputDirection.UP
+
+    def queue_input(self, data: PlayerInput):
+        """Сдвиг от пакета ввода поверх уже ожидающего тика"""
+        x, y = self.pending_position or (self.position['x'], self.position['y'])
+        dx, dy = data.delta()
+        self.pending_position = (x + dx, y + dy)
+        self.pending_directions |= data.directions
+
+    async def handoff(self, host: str, port: int):
+        """Отправляет клиента к другому воркеру и закрывает соединение"""
+        await self.websocket.send_bytes(
+            GameProtocol.pack_player_handoff(PlayerHandoff(host, port))
+        )
+        await self.websocket.close()
 
     async def send_message(self, message: bytes):
+        trafficRecorder.record(self.record_id, Direction.OUTBOUND, message)
         try:
             await self.websocket.send_bytes(message)
         except Exception as ex:
             print(f'error: {ex}')
+            self.send_failed = True
 
+    def touch(self):
+        self.last_seen = time.monotonic()
 
-class GameSessionsManager:
+    @property
+    def frame_key(self) -> tuple[int, bool]:
+        return self.protocol, Capability.COMPRESSION in self.capabilities
+
+    def enqueue(self, message: bytes) -> bool:
+        """Ставит кадр в очередь отправки, сжав его, если клиент это умеет"""
+        if Capability.COMPRESSION in self.capabilities:
+            message = compressionPolicy.compress(message)
+        return self.enqueue_frame(message)
+
+    def enqueue_frame(self, message: bytes) -> bool:
+        """Ставит готовый кадр в очередь как есть, не дожидаясь сокета"""
+        if self.send_failed or self.closed:
+            return False
+        try:
+            self.send_queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped_messages += 1
+            return False
+        return True
+
+    async def _writer(self):
+        while not self.send_failed:
+            message = await self.send_queue.get()
+            await self.send_message(message)
+
+    def start(self):
+        self.writer_task = asyncio.create_task(self._writer())
+
+    def close(self):
+        self.closed = True
+        if self.writer_task is not None:
+            self.writer_task.cancel()
+            self.writer_task = None
+        # Кадры в очереди больше никому не нужны, память освобождается сразу
+        self.send_queue = asyncio.Queue(maxsize=1)
+
+    async def kick(self, code: int = 1001):
+        """Закрывает сокет; ошибки неважны - соединение и так считается мертвым"""
+        try:
+            await self.websocket.close(code)
+        except Exception:
+            pass
+
+
+Codec = type[GameProtocol] | type[LegacyProtocol]
+# Кодирует сообщение для версии протокола; None - версия такого кадра не знает
+Encoder = Callable[[Codec], bytes | None]
+
+
+# Вариант кадра у получателя: версия протокола и сжатие
+FrameKey = tuple[int, bool]
+
+
+@dataclass
+class Outgoing:
+    """Сообщение, закодированное для рассылки: кадр на вариант получателя.
+
+    Кадры - неизменяемые bytes: все получатели одного варианта ставят
+    в очередь один и тот же объект, без копий на получателя.
+    """
+
+    msg_type: MessageType
+    frames: dict[FrameKey, bytes | None]
+    recipients: list[PlayerSession]
+
+
+class FanOutStats:
     def __init__(self) -> None:
+        self.broadcasts = 0
+        self.encoded = 0
+        self.frames = 0
+        self.dropped = 0
+
+    def snapshot(self) -> dict:
+        return {
+            'broadcasts': self.broadcasts,
+            'encoded': self.encoded,
+            'frames': self.frames,
+            'dropped': self.dropped,
+        }
+
+
+def _join_encoder(join: PlayerJoin) -> Encoder:
+    return lambda codec: codec.pack_player_join(join)
+
+
+def _update_encoder(join: PlayerJoin) -> Encoder:
+    def encode(codec: Codec) -> bytes:
+        # В версии 1 обновление несет имя, в версии 2 - только id
+        if codec is LegacyProtocol:
+            return LegacyProtocol.pack_player_update(join)
+        return GameProtocol.pack_player_update(
+            PlayerUpdate(join.player_id, join.x, join.y)
+        )
+
+    return encode
+
+
+class GameSessionsManager:
+    def __init__(
+        self, backplane: Backplane | None = None, shards: ShardMap = shardMap
+    ) -> None:
         self.players: Dict[str, PlayerSession] = {}
+        # Игроки других нод, о которых мы узнали через backplane: id -> PlayerJoin
+        self.remote_players: Dict[int, PlayerJoin] = {}
+        self.backplane = backplane or create_backplane()
+        self.backplane.set_handler(self.handle_remote_event)
+        self.shards = shards
+        self.chat_history = ChatHistory(settings.CHAT_HISTORY_SIZE)
+        self.fanout_stats: defaultdict[MessageType, FanOutStats] = defaultdict(
+            FanOutStats
+        )
+
+    def add_player(
+        self,
+        websocket: WebSocket,
+        id: int,
+        name: str,
+        x: int,
+        y: int,
+        hello: Hello | None = None,
+        record_id: int = 0,
+    ) -> PlayerSession:
+        if hello is None:
+            player = PlayerSession(websocket, id, name, x, y, record_id=record_id)
+        else:
+            player = PlayerSession(
+                websocket,
+                id,
+                name,
+                x,
+                y,
+                hello.version,
+                hello.capabilities,
+                record_id,
+            )
+        self.players[name] = player
+        player.start()
+        return player
+
+    async def remove_player(self, player: PlayerSession) -> bool:
+        """Убирает сессию и сообщает об уходе игрока; повторный вызов ничего не делает.
+
+        False, если сессию уже убрали или ее место занял новый вход того же игрока.
+        """
+        if player.closed:
+            return False
+        player.close()
+        if self.players.get(player.name) is not player:
+            return False
+        # Из словаря - до первого await: что бы ни случилось дальше, сессия не утечет
+        del self.players[player.name]
+        message = GameProtocol.pack_player_leave(player.id)
+        self.announce_leave(player.id, message)
+        await self.publish(player, BackplaneEvent.PLAYER_LEAVE, message)
+        await self.backplane.release_session(player.id)
+        await self.sync_regions()
+        return True
+
+    # Получатели рассылок
+
+    def everyone(self, exclude: int | None = None) -> Iterator[PlayerSession]:
+        """Все локальные игроки, кроме exclude"""
+        return (player for player in self.players.values() if player.id != exclude)
+
+    def interest_set(
+        self, region: Region, exclude: int | None = None
+    ) -> Iterator[PlayerSession]:
+        """Игроки, которым виден регион: в нем и в соседних"""
+        regions = set(neighbour_regions(region))
+        return (
+            player
+            for player in self.players.values()
+            if player.id != exclude and player.region in regions
+        )
+
+    def knowing(self, player_id: int) -> Iterator[PlayerSession]:
+        """Игроки, которым уже пришел join этого игрока"""
+        return (
+            player for player in self.players.values() if player_id in player.known_ids
+        )
+
+    # Рассылка
+
+    def prepare(
+        self,
+        msg_type: MessageType,
+        encode: Encoder,
+        recipients: Iterable[PlayerSession],
+    ) -> Outgoing:
+        """Кодирует и сжимает сообщение один раз на вариант кадра среди получателей"""
+        recipients = list(recipients)
+        encoded: dict[int, bytes | None] = {}
+        frames: dict[FrameKey, bytes | None] = {}
+        for player in recipients:
+            key = player.frame_key
+            if key in frames:
+                continue
+            protocol, compressed = key
+            if protocol not in encoded:
+                encoded[protocol] = encode(player.codec)
+            frame = encoded[protocol]
+            if compressed and frame is not None:
+                frame = compressionPolicy.compress(frame)
+            frames[key] = frame
+        self.fanout_stats[msg_type].encoded += len(encoded)
+        return Outgoing(msg_type, frames, recipients)
+
+    def deliver(self, outgoing: Outgoing) -> int:
+        """Ставит готовые кадры в очереди получателей; возвращает, скольким ушло"""
+        stats = self.fanout_stats[outgoing.msg_type]
+        stats.broadcasts += 1
+        sent = 0
+        for player in outgoing.recipients:
+            frame = outgoing.frames[player.frame_key]
+            if frame is None:
+                continue
+            if player.enqueue_frame(frame):
+                sent += 1
+            else:
+                stats.dropped += 1
+        stats.frames += sent
+        return sent
 
-    def add_player(self, websocket: WebSocket, id: int, name: str, x: int, y: int):
-        self.players[name] = PlayerSession(websocket, id, name, x, y)
+    def fan_out(
+        self,
+        msg_type: MessageType,
+        encode: Encoder,
+        recipients: Iterable[PlayerSession],
+    ) -> int:
+        """Единая точка рассылки: все кадры игрокам уходят через нее"""
+        return self.deliver(self.prepare(msg_type, encode, recipients))
 
-    async def broadcast(self, message: str):
-        for _, player in self.players.items():
-            await player.send_message(message)
+    def fanout_snapshot(self) -> dict:
+        return {
+            msg_type.name: stats.snapshot()
+            for msg_type, stats in self.fanout_stats.items()
+        }
+
+    async def send_chat(self, player: PlayerSession, chat: ChatMessage) -> bool:
+        """Чат от игрока: лимиты, история, рассылка по региону и соседним нодам"""
+        text = chat.message.strip()
+        if not text or len(text) > settings.CHAT_MAX_LENGTH:
+            return False
+
+        # id и время ставит сервер, клиенту тут не доверяем
+        chat = ChatMessage(player.id, text)
+        self.chat_history.append(player.region, chat)
+        message = GameProtocol.pack_chat_message(chat)
+        self.send_region_chat(player.region, message)
+        await self.backplane.publish(player.region, BackplaneEvent.CHAT, message)
+        return True
+
+    def world_snapshot(self, player: PlayerSession) -> list[bytes]:
+        """Снимок мира для подключившегося: игроки в его и соседних регионах.
+
+        Одним кадром, если клиент умеет BATCHED_SNAPSHOTS, иначе по join на игрока.
+        """
+        regions = set(neighbour_regions(player.region))
+        visible = [
+            PlayerJoin(other.id, other.name, other.position['x'], other.position['y'])
+            for other in self.players.values()
+            if other.id != player.id and other.region in regions
+        ]
+        visible.extend(
+            remote
+            for remote in self.remote_players.values()
+            if region_of(remote.x, remote.y) in regions
+        )
+        player.known_ids.update(join.player_id for join in visible)
+        if Capability.BATCHED_SNAPSHOTS in player.capabilities:
+            return [GameProtocol.pack_world_state(visible)]
+        return [player.codec.pack_player_join(join) for join in visible]
+
+    def send_region_chat(self, region: Region, message: bytes):
+        """Чат региона тем, кому он слышен; в протоколе версии 1 чата нет"""
+        self.fan_out(
+            MessageType.CHAT_MESSAGE,
+            lambda codec: None if codec is LegacyProtocol else message,
+            self.interest_set(region),
+        )
+
+    def announce_join(self, join: PlayerJoin):
+        """Рассылка join всем, кроме самого игрока"""
+        recipients = list(self.everyone(exclude=join.player_id))
+        for other in recipients:
+            other.known_ids.add(join.player_id)
+        self.fan_out(MessageType.PLAYER_JOIN, _join_encoder(join), recipients)
+
+    def announce_leave(self, player_id: int, message: bytes):
+        """Рассылка leave тем, кто знал об игроке"""
+        recipients = list(self.knowing(player_id))
+        for other in recipients:
+            other.known_ids.discard(player_id)
+        self.fan_out(MessageType.PLAYER_LEAVE, lambda codec: message, recipients)
+
+    def interested(self, join: PlayerJoin) -> list[PlayerSession]:
+        """Кому нужна позиция игрока: локальные игроки в его и соседних регионах"""
+        return list(self.interest_set(region_of(join.x, join.y), join.player_id))
+
+    def prepare_update(
+        self, join: PlayerJoin, recipients: list[PlayerSession]
+    ) -> list[Outgoing]:
+        """Позиция игрока по id; кто его еще не знает, сначала получает join"""
+        unknown = [
+            other for other in recipients if join.player_id not in other.known_ids
+        ]
+        for other in unknown:
+            other.known_ids.add(join.player_id)
+        return [
+            self.prepare(MessageType.PLAYER_JOIN, _join_encoder(join), unknown),
+            self.prepare(MessageType.PLAYER_UPDATE, _update_encoder(join), recipients),
+        ]
+
+    def send_update(self, join: PlayerJoin):
+        for outgoing in self.prepare_update(join, self.interested(join)):
+            self.deliver(outgoing)
+
+    def chat_history_frame(self, region: Region) -> bytes | None:
+        """История чата для подключившегося игрока одним кадром"""
+        messages = self.chat_history.near(region)
+        if not messages:
+            return None
+        return GameProtocol.pack_chat_history(messages)
+
+    async def sync_regions(self) -> None:
+        """Подписывает ноду на регионы локальных игроков и их соседей"""
+        needed = set()
+        for player in self.players.values():
+            needed.update(neighbour_regions(player.region))
+        await self.backplane.unsubscribe(self.backplane.regions - needed)
+        await self.backplane.subscribe(needed)
+
+    async def publish(self, player: PlayerSession, event: BackplaneEvent, data: bytes):
+        if not self.shards.enabled:
+            await self.backplane.publish(player.region, event, data)
+            return
+
+        # При шардировании соседям нужны только игроки у границы их регионов
+        near_border = bool(
+            self.shards.foreign_regions_near(player.position['x'], player.position['y'])
+        )
+        if event == BackplaneEvent.PLAYER_LEAVE:
+            if player.ghosted:
+                player.ghosted = False
+                await self.backplane.publish(player.region, event, data)
+            return
+
+        if near_border:
+            player.ghosted = True
+            await self.backplane.publish(player.region, event, data)
+        elif player.ghosted:
+            player.ghosted = False
+            await self.backplane.publish(
+                player.region,
+                BackplaneEvent.PLAYER_LEAVE,
+                GameProtocol.pack_player_leave(player.id),
+            )
+
+    async def handle_remote_event(
+        self, region: Region, event: BackplaneEvent, data: bytes
+    ) -> None:
+        """Событие другой ноды: обновляем кэш удаленных игроков и рассылаем своим"""
+        if event == BackplaneEvent.CHAT:
+            self.chat_history.append(region, GameProtocol.unpack_chat_message(data))
+            self.send_region_chat(region, data)
+            return
+        if event == BackplaneEvent.PLAYER_JOIN:
+            join = GameProtocol.unpack_player_join(data)
+            self.remote_players[join.player_id] = join
+            self.announce_join(join)
+        elif event == BackplaneEvent.WORLD_STATE:
+            # Между нодами позиция ходит вместе с именем (формат join): игрок мог
+            # прийти из региона, на который мы не были подписаны
+            join = GameProtocol.unpack_player_join(data)
+            self.remote_players[join.player_id] = join
+            self.send_update(join)
+        elif event == BackplaneEvent.PLAYER_LEAVE:
+            player_id = GameProtocol.unpack_player_leave(data)
+            if self.remote_players.pop(player_id, None) is not None:
+                self.announce_leave(player_id, data)
 
 
 gameSessionsManager = GameSessionsManager()
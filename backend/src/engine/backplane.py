@@ -0,0 +1,249 @@
+import asyncio
+import struct
+import uuid
+from abc import ABC, abstractmethod
+from enum import IntEnum
+from typing import Awaitable, Callable
+
+from src.config import settings
+from src.engine.regions import Region
+
+
+class BackplaneEvent(IntEnum):
+    PLAYER_JOIN = 1
+    PLAYER_LEAVE = 2
+    WORLD_STATE = 3
+    CHAT = 4
+
+
+EventHandler = Callable[[Region, BackplaneEvent, bytes], Awaitable[None]]
+
+
+class Backplane(ABC):
+    """Шина между процессами/нодами сервера.
+
+    События публикуются по регионам; нода получает события только тех регионов,
+    на которые подписана, и никогда не получает собственные события.
+    Плюс реестр сессий: какой ноде принадлежит игрок с данным user id.
+    """
+
+    def __init__(self, node_id: str | None = None) -> None:
+        self.node_id = node_id or uuid.uuid4().hex
+        self.handler: EventHandler | None = None
+        self.regions: set[Region] = set()
+
+    def set_handler(self, handler: EventHandler) -> None:
+        self.handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(
+        self, region: Region, event: BackplaneEvent, payload: bytes
+    ) -> None: ...
+
+    async def subscribe(self, regions: set[Region]) -> None:
+        self.regions |= regions
+
+    async def unsubscribe(self, regions: set[Region]) -> None:
+        self.regions -= regions
+
+    @abstractmethod
+    async def claim_session(self, user_id: int) -> str | None:
+        """Записывает сессию за этой нодой и возвращает прежнего владельца"""
+
+    @abstractmethod
+    async def release_session(self, user_id: int) -> None:
+        """Снимает сессию, если она все еще принадлежит этой ноде"""
+
+    @abstractmethod
+    async def get_session_owner(self, user_id: int) -> str | None: ...
+
+    async def _dispatch(self, region: Region, event: BackplaneEvent, payload: bytes):
+        if self.handler is None:
+            return
+        try:
+            await self.handler(region, event, payload)
+        except Exception as ex:
+            print(f'backplane handler error: {ex}')
+
+
+class InProcessHub:
+    """Общая точка для нескольких InProcessBackplane в одном процессе"""
+
+    def __init__(self) -> None:
+        self.nodes: list['InProcessBackplane'] = []
+        self.sessions: dict[int, str] = {}
+
+
+class InProcessBackplane(Backplane):
+    """Реализация без внешних зависимостей: для одного процесса и для тестов"""
+
+    def __init__(self, hub: InProcessHub | None = None, node_id: str | None = None):
+        super().__init__(node_id)
+        self.hub = hub or InProcessHub()
+        self.hub.nodes.append(self)
+
+    async def close(self) -> None:
+        if self in self.hub.nodes:
+            self.hub.nodes.remove(self)
+
+    async def publish(self, region: Region, event: BackplaneEvent, payload: bytes):
+        for node in list(self.hub.nodes):
+            if node is not self and region in node.regions:
+                await node._dispatch(region, event, payload)
+
+    async def claim_session(self, user_id: int) -> str | None:
+        previous = self.hub.sessions.get(user_id)
+        self.hub.sessions[user_id] = self.node_id
+        return previous
+
+    async def release_session(self, user_id: int) -> None:
+        if self.hub.sessions.get(user_id) == self.node_id:
+            del self.hub.sessions[user_id]
+
+    async def get_session_owner(self, user_id: int) -> str | None:
+        return self.hub.sessions.get(user_id)
+
+
+class RedisBackplane(Backplane):
+    """Redis pub/sub: канал на регион, hash user_id -> node_id для сессий.
+
+    Формат сообщения в канале: длина node_id (B), node_id, тип события (B),
+    дальше payload без изменений (обычный кадр GameProtocol).
+    """
+
+    CHANNEL_PREFIX = 'game:region:'
+    SESSIONS_KEY = 'game:sessions'
+    HEADER = struct.Struct('!B')
+
+    def __init__(self, client, node_id: str | None = None) -> None:
+        super().__init__(node_id)
+        self.client = client
+        self.pubsub = None
+        self.listener: asyncio.Task | None = None
+        self._node_bytes = self.node_id.encode('utf-8')
+
+    @classmethod
+    def from_url(cls, url: str, node_id: str | None = None) -> 'RedisBackplane':
+        # redis нужен только при BACKPLANE=redis
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url), node_id)
+
+    @classmethod
+    def channel(cls, region: Region) -> str:
+        return f'{cls.CHANNEL_PREFIX}{region[0]}:{region[1]}'
+
+    @classmethod
+    def parse_channel(cls, channel: bytes | str) -> Region:
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        rx, ry = channel[len(cls.CHANNEL_PREFIX) :].split(':')
+        return int(rx), int(ry)
+
+    def encode(self, event: BackplaneEvent, payload: bytes) -> bytes:
+        return b''.join(
+            (
+                self.HEADER.pack(len(self._node_bytes)),
+                self._node_bytes,
+                self.HEADER.pack(event),
+                payload,
+            )
+        )
+
+    @staticmethod
+    def decode(data: bytes) -> tuple[bytes, BackplaneEvent, bytes]:
+        node_length = data[0]
+        node = data[1 : 1 + node_length]
+        event = BackplaneEvent(data[1 + node_length])
+        return node, event, data[2 + node_length :]
+
+    async def start(self) -> None:
+        self.pubsub = self.client.pubsub()
+        self.listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self.listener is not None:
+            self.listener.cancel()
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        await self.client.aclose()
+
+    async def publish(self, region: Region, event: BackplaneEvent, payload: bytes):
+        await self.client.publish(self.channel(region), self.encode(event, payload))
+
+    async def subscribe(self, regions: set[Region]) -> None:
+        new_regions = regions - self.regions
+        await super().subscribe(regions)
+        if new_regions:
+            await self.pubsub.subscribe(*(self.channel(r) for r in new_regions))
+
+    async def unsubscribe(self, regions: set[Region]) -> None:
+        old_regions = regions & self.regions
+        await super().unsubscribe(regions)
+        if old_regions:
+            await self.pubsub.unsubscribe(*(self.channel(r) for r in old_regions))
+
+    async def _listen(self) -> None:
+        while True:
+            if not self.regions:
+                # pubsub без подписок сразу возвращает None, не крутим цикл впустую
+                await asyncio.sleep(0.1)
+                continue
+            message = await self.pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=1.0
+            )
+            if message is None or message['type'] != 'message':
+                continue
+            try:
+                node, event, payload = self.decode(message['data'])
+            except (IndexError, ValueError) as ex:
+                print(f'backplane: битое сообщение: {ex}')
+                continue
+            if node == self._node_bytes:
+                continue
+            await self._dispatch(self.parse_channel(message['channel']), event, payload)
+
+    async def claim_session(self, user_id: int) -> str | None:
+        # HGET и HSET в одном MULTI: между ними не вклинится claim другой ноды
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hget(self.SESSIONS_KEY, str(user_id))
+            pipe.hset(self.SESSIONS_KEY, str(user_id), self.node_id)
+            previous, _ = await pipe.execute()
+        return previous.decode('utf-8') if isinstance(previous, bytes) else previous
+
+    async def release_session(self, user_id: int) -> None:
+        from redis.exceptions import WatchError
+
+        # Удаляем, только если сессию не забрала другая нода: WATCH отменит
+        # HDEL, если ключ поменялся после чтения владельца
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(self.SESSIONS_KEY)
+                    owner = await pipe.hget(self.SESSIONS_KEY, str(user_id))
+                    if isinstance(owner, bytes):
+                        owner = owner.decode('utf-8')
+                    if owner != self.node_id:
+                        return
+                    pipe.multi()
+                    pipe.hdel(self.SESSIONS_KEY, str(user_id))
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    async def get_session_owner(self, user_id: int) -> str | None:
+        owner = await self.client.hget(self.SESSIONS_KEY, str(user_id))
+        return owner.decode('utf-8') if isinstance(owner, bytes) else owner
+
+
+def create_backplane() -> Backplane:
+    if settings.BACKPLANE == 'redis':
+        return RedisBackplane.from_url(settings.redis_url)
+    return InProcessBackplane()
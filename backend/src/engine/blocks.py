@@ -0,0 +1,38 @@
+from enum import IntEnum
+
+
+class Block(IntEnum):
+    """Идентификаторы блоков в чанках мира (совпадают с клиентским Blocks)"""
+
+    NONE = 0
+    GRASS = 1
+    DIRT = 2
+    STONE = 3
+    BEDROCK = 4
+
+
+# Сквозь эти блоки нельзя пройти
+SOLID_BLOCKS = frozenset({Block.GRASS, Block.DIRT, Block.STONE, Block.BEDROCK})
+
+_BLOCK_BY_TYPE = {block.name.lower(): block for block in Block}
+
+
+def block_id(block: dict | None) -> Block:
+    """id блока из записи WorldGenerator ({'type': 'stone', ...} или None)"""
+    if not block:
+        return Block.NONE
+    return _BLOCK_BY_TYPE.get(block.get('type'), Block.NONE)
+
+
+def chunk_block_ids(
+    world: list[list[dict | None]], chunk_x: int, chunk_y: int, chunk_size: int
+) -> bytes:
+    """id блоков чанка построчно, по байту на тайл; за краем мира - NONE"""
+    blocks = bytearray(chunk_size * chunk_size)
+    start_x = chunk_x * chunk_size
+    start_y = chunk_y * chunk_size
+    for local_y, row in enumerate(world[start_y : start_y + chunk_size]):
+        offset = local_y * chunk_size
+        for local_x, block in enumerate(row[start_x : start_x + chunk_size]):
+            blocks[offset + local_x] = block_id(block)
+    return bytes(blocks)
@@ -0,0 +1,19 @@
+from collections import deque
+
+from src.engine.GameProtocol import ChatMessage
+from src.engine.regions import Region, neighbour_regions
+
+
+class ChatHistory:
+    """Последние сообщения чата вместе с регионом, где их отправили."""
+
+    def __init__(self, size: int) -> None:
+        self.entries: deque[tuple[Region, ChatMessage]] = deque(maxlen=size)
+
+    def append(self, region: Region, chat: ChatMessage) -> None:
+        self.entries.append((region, chat))
+
+    def near(self, region: Region) -> list[ChatMessage]:
+        """Сообщения, которые слышно из региона (он и его соседи)"""
+        regions = set(neighbour_regions(region))
+        return [chat for chat_region, chat in self.entries if chat_region in regions]
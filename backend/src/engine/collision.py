@@ -0,0 +1,115 @@
+from array import array
+
+import numpy as np
+
+from src.engine.blocks import SOLID_BLOCKS, chunk_block_ids
+from src.engine.regions import CHUNK_SIZE, chunk_of
+
+ChunkKey = tuple[int, int]
+
+FULL_ROW = (1 << CHUNK_SIZE) - 1
+
+
+def _empty_rows() -> array:
+    return array('H', [0] * CHUNK_SIZE)
+
+
+class CollisionGrid:
+    """Твердость тайлов мира, по биту на тайл.
+
+    Строка чанка - одно 16-битное число, бит x - тайл (x, y) чанка. Слой
+    строится из id блоков чанков и обновляется через set_block при правке
+    блоков. У чанка есть версия, которая растет при каждом изменении: по ней
+    кэш путей понимает, что маршрут устарел. Поколение сетки растет при
+    изменении любого чанка. Незагруженные чанки - воздух.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: dict[ChunkKey, array] = {}
+        self.versions: dict[ChunkKey, int] = {}
+        self.generation = 0
+
+    def load_chunk(self, chunk_x: int, chunk_y: int, blocks: bytes) -> None:
+        """blocks - CHUNK_SIZE * CHUNK_SIZE id блоков построчно"""
+        rows = _empty_rows()
+        for local_y in range(CHUNK_SIZE):
+            offset = local_y * CHUNK_SIZE
+            row = 0
+            for local_x, block in enumerate(blocks[offset : offset + CHUNK_SIZE]):
+                if block in SOLID_BLOCKS:
+                    row |= 1 << local_x
+            rows[local_y] = row
+        key = (chunk_x, chunk_y)
+        self.chunks[key] = rows
+        self._touch(key)
+
+    def load_world(self, world: list[list[dict | None]]) -> None:
+        """Весь мир в формате WorldGenerator (строки записей блоков)"""
+        height = len(world)
+        width = len(world[0]) if height else 0
+        for chunk_y in range((height + CHUNK_SIZE - 1) // CHUNK_SIZE):
+            for chunk_x in range((width + CHUNK_SIZE - 1) // CHUNK_SIZE):
+                self.load_chunk(
+                    chunk_x,
+                    chunk_y,
+                    chunk_block_ids(world, chunk_x, chunk_y, CHUNK_SIZE),
+                )
+
+    def unload_chunk(self, chunk_x: int, chunk_y: int) -> None:
+        key = (chunk_x, chunk_y)
+        if self.chunks.pop(key, None) is not None:
+            self._touch(key)
+
+    def _touch(self, key: ChunkKey) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self.generation += 1
+
+    def version(self, key: ChunkKey) -> int:
+        return self.versions.get(key, 0)
+
+    def rows(self, key: ChunkKey) -> array | None:
+        """Битовые строки чанка или None, если чанк не загружен"""
+        return self.chunks.get(key)
+
+    def is_solid(self, x: int, y: int) -> bool:
+        rows = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if rows is None:
+            return False
+        return bool(rows[y % CHUNK_SIZE] >> (x % CHUNK_SIZE) & 1)
+
+    def solid_many(
+        self, xs: np.ndarray, ys: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """is_solid для массивов целых координат: (твердость, чанк загружен)"""
+        chunk_keys = np.stack([xs // CHUNK_SIZE, ys // CHUNK_SIZE], axis=1)
+        keys, inverse = np.unique(chunk_keys, axis=0, return_inverse=True)
+        table = np.zeros((len(keys), CHUNK_SIZE), dtype=np.uint16)
+        loaded = np.zeros(len(keys), dtype=bool)
+        for index, (chunk_x, chunk_y) in enumerate(keys.tolist()):
+            rows = self.chunks.get((chunk_x, chunk_y))
+            if rows is not None:
+                table[index] = rows
+                loaded[index] = True
+        inverse = inverse.reshape(-1)
+        bits = table[inverse, ys % CHUNK_SIZE] >> (xs % CHUNK_SIZE).astype(np.uint16)
+        return (bits & 1).astype(bool), loaded[inverse]
+
+    def set_block(self, x: int, y: int, block: int) -> None:
+        """Правка блока: меняет бит и версию чанка, если твердость изменилась"""
+        key = chunk_of(x, y)
+        rows = self.chunks.get(key)
+        if rows is None:
+            rows = self.chunks[key] = _empty_rows()
+        local_y = y % CHUNK_SIZE
+        bit = 1 << (x % CHUNK_SIZE)
+        solid = block in SOLID_BLOCKS
+        if bool(rows[local_y] & bit) == solid:
+            return
+        if solid:
+            rows[local_y] |= bit
+        else:
+            rows[local_y] &= FULL_ROW ^ bit
+        self._touch(key)
+
+
+collisionGrid = CollisionGrid()
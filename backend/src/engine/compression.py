@@ -0,0 +1,68 @@
+import zlib
+from pathlib import Path
+
+from src.config import settings
+from src.engine.GameProtocol import COMPRESSED_FLAG
+
+
+class CompressionPolicy:
+    """Решает, сжимать ли кадр: мелкие кадры идут как есть, крупные - через zlib.
+
+    Сжатый кадр помечается COMPRESSED_FLAG в байте типа, тело после него -
+    поток zlib (с предустановленным словарем, если он задан).
+    """
+
+    def __init__(
+        self, threshold: int, level: int = 6, zdict: bytes | None = None
+    ) -> None:
+        self.threshold = threshold
+        self.level = level
+        self.zdict = zdict or None
+        self.frames = 0
+        self.compressed_frames = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _compressor(self):
+        if self.zdict is None:
+            return zlib.compressobj(self.level)
+        return zlib.compressobj(
+            self.level, zlib.DEFLATED, zlib.MAX_WBITS, zdict=self.zdict
+        )
+
+    def compress(self, frame: bytes) -> bytes:
+        self.frames += 1
+        self.bytes_in += len(frame)
+        if len(frame) >= self.threshold:
+            compressor = self._compressor()
+            # memoryview - тело без копии кадра
+            body = compressor.compress(memoryview(frame)[1:]) + compressor.flush()
+            # Несжимаемые данные (уже сжатые, случайные) отправляем как есть
+            if len(body) + 1 < len(frame):
+                self.compressed_frames += 1
+                self.bytes_out += len(body) + 1
+                return bytes([frame[0] | COMPRESSED_FLAG]) + body
+        self.bytes_out += len(frame)
+        return frame
+
+    def snapshot(self) -> dict:
+        return {
+            'frames': self.frames,
+            'compressed_frames': self.compressed_frames,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': self.bytes_out / self.bytes_in if self.bytes_in else 1.0,
+        }
+
+
+def load_dictionary(path: str) -> bytes | None:
+    if not path:
+        return None
+    return Path(path).read_bytes()
+
+
+compressionPolicy = CompressionPolicy(
+    settings.COMPRESSION_THRESHOLD,
+    settings.COMPRESSION_LEVEL,
+    load_dictionary(settings.COMPRESSION_DICT_PATH),
+)
@@ -0,0 +1,90 @@
+import struct
+from collections import Counter
+
+from src.config import settings
+from src.engine.GameProtocol import MessageType, PlayerUpdate
+from src.engine.GameSessionManager import (GameSessionsManager, PlayerSession,
+                                           gameSessionsManager)
+from src.engine.legacy_protocol import PLAYER_FORMAT
+
+# Заголовок чата без текста: тип, id, длина текста, время
+CHAT_HEADER_SIZE = struct.calcsize('!B I H q')
+
+# Что клиент может прислать серверу: тип -> (мин. длина, макс. длина)
+CLIENT_FRAME_LIMITS = {
+    MessageType.PLAYER_UPDATE: (struct.calcsize('!B I i i'),) * 2,
+    MessageType.PLAYER_INPUT: (struct.calcsize('!B H B'),) * 2,
+    # CHAT_MAX_LENGTH - в символах, в UTF-8 символ до 4 байт
+    MessageType.CHAT_MESSAGE: (
+        CHAT_HEADER_SIZE + 1,
+        CHAT_HEADER_SIZE + 4 * settings.CHAT_MAX_LENGTH,
+    ),
+}
+# Клиенты версии 1 шлют только обновления позиции
+LEGACY_FRAME_LIMITS = {
+    MessageType.PLAYER_UPDATE: (struct.calcsize(PLAYER_FORMAT),) * 2,
+}
+
+
+class InboundGuard:
+    """Проверка входящих кадров на границе декодирования.
+
+    admit смотрит только на длину и первый байт кадра и списывает токен
+    из лимита соединения: лишний кадр отбрасывается до распаковки, без
+    срезов и новых объектов. Отброшенные кадры считаются по причинам,
+    всего и по каждой сессии.
+    """
+
+    def __init__(self, sessions: GameSessionsManager) -> None:
+        self.sessions = sessions
+        self.drops: Counter[str] = Counter()
+
+    def drop(self, player: PlayerSession, reason: str) -> bool:
+        self.drops[reason] += 1
+        player.drops[reason] += 1
+        return False
+
+    def admit(self, player: PlayerSession, message: bytes) -> bool:
+        """Пропускает кадр к распаковке или отбрасывает его"""
+        if not message:
+            return self.drop(player, 'size')
+        msg_type = message[0]
+        limits = LEGACY_FRAME_LIMITS if player.is_legacy else CLIENT_FRAME_LIMITS
+        bounds = limits.get(msg_type)
+        if bounds is None:
+            return self.drop(player, 'type')
+        if not bounds[0] <= len(message) <= bounds[1]:
+            return self.drop(player, 'size')
+        bucket = (
+            player.chat_bucket
+            if msg_type == MessageType.CHAT_MESSAGE
+            else player.move_bucket
+        )
+        if not bucket.consume():
+            return self.drop(player, 'rate')
+        return True
+
+    def admit_move(self, player: PlayerSession, update: PlayerUpdate) -> bool:
+        """Абсолютная позиция от клиента не дальше MAX_MOVE_DELTA от прошлой"""
+        x, y = player.pending_position or (player.position['x'], player.position['y'])
+        if max(abs(update.x - x), abs(update.y - y)) > settings.MAX_MOVE_DELTA:
+            return self.drop(player, 'speed')
+        return True
+
+    def throttled(self, limit: int = 20) -> list[dict]:
+        """Сессии с отброшенными кадрами, больше всего отброшенных - первыми"""
+        players = sorted(
+            (p for p in self.sessions.players.values() if p.drops),
+            key=lambda p: p.drops.total(),
+            reverse=True,
+        )
+        return [
+            {'id': p.id, 'name': p.name, 'drops': dict(p.drops)}
+            for p in players[:limit]
+        ]
+
+    def snapshot(self) -> dict:
+        return {'drops': dict(self.drops), 'throttled': self.throttled()}
+
+
+inboundGuard = InboundGuard(gameSessionsManager)
@@ -0,0 +1,56 @@
+import struct
+from typing import Any
+
+from src.engine.GameProtocol import (MessageType, PlayerInit, PlayerJoin,
+                                     PlayerUpdate)
+
+# Версия 1: клиенты без рукопожатия. Имя идет полем 20s в каждом кадре.
+PLAYER_FORMAT = '!BI20sii'
+
+
+class LegacyProtocol:
+    """Кодек протокола версии 1 для клиентов, которые не шлют HELLO"""
+
+    @staticmethod
+    def _pack_player(msg_type: MessageType, player: PlayerJoin | PlayerInit) -> bytes:
+        return struct.pack(
+            PLAYER_FORMAT,
+            msg_type,
+            player.player_id,
+            player.name.encode('utf-8'),
+            player.x,
+            player.y,
+        )
+
+    @staticmethod
+    def pack_player_init(init: PlayerInit) -> bytes:
+        """Упаковка инициализации игрока"""
+        return LegacyProtocol._pack_player(MessageType.PLAYER_INIT, init)
+
+    @staticmethod
+    def pack_player_join(join: PlayerJoin) -> bytes:
+        """Упаковка сообщения о подключении игрока"""
+        return LegacyProtocol._pack_player(MessageType.PLAYER_JOIN, join)
+
+    @staticmethod
+    def pack_player_update(player: PlayerJoin) -> bytes:
+        """Упаковка обновления позиции: в версии 1 с именем"""
+        return LegacyProtocol._pack_player(MessageType.PLAYER_UPDATE, player)
+
+    @staticmethod
+    def unpack_player_update(data: bytes) -> PlayerUpdate:
+        """Распаковка обновления позиции игрока, имя отбрасывается"""
+        _, player_id, _, x, y = struct.unpack(PLAYER_FORMAT, data)
+        return PlayerUpdate(player_id, x, y)
+
+    @staticmethod
+    def unpack_message(data: bytes) -> Any:
+        """Клиенты версии 1 шлют только обновления позиции"""
+        if not data:
+            return None
+        try:
+            if data[0] == MessageType.PLAYER_UPDATE:
+                return LegacyProtocol.unpack_player_update(data)
+        except Exception as e:
+            print(f'Ошибка распаковки сообщения версии 1: {e}')
+        return None
@@ -216,15 +216,14 @@ class WorldGenerator:
         }
 
 
-import json
-
-import matplotlib
+def _pyplot():
+    """matplotlib нужен только для визуализации: сервер импортирует модуль без него"""
+    import matplotlib
 
-matplotlib.use('Qt5Agg')  # Устанавливаем бэкенд Agg перед импортом pyplot
+    matplotlib.use('Qt5Agg')  # Бэкенд выбирается до импорта pyplot
+    import matplotlib.pyplot as plt
 
-import matplotlib.colors as mcolors
-import matplotlib.pyplot as plt
-import numpy as np
+    return plt
 
 
 def visualize_world_matplotlib(world_generator):
@@ -261,6 +260,7 @@ def visualize_world_matplotlib(world_generator):
                     color_map[y, x] = block_colors['none']
 
         # Create visualization :cite[5]:cite[7]
+        plt = _pyplot()
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
 
         # Main world view
@@ -316,6 +316,7 @@ def visualize_chunks_matplotlib(
             return
 
         # Create figure for chunks
+        plt = _pyplot()
         fig, axes = plt.subplots(len(chunks), 1, figsize=(12, 3 * len(chunks)))
         if len(chunks) == 1:
             axes = [axes]
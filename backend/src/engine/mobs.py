@@ -0,0 +1,172 @@
+import random
+from enum import IntEnum
+
+import numpy as np
+
+from src.engine.physics import Physics, physics
+from src.engine.regions import CHUNK_SIZE
+
+WANDER_SPEED = 2.0
+# Сколько секунд моб держит решение ИИ
+THINK_MIN = 1.0
+THINK_MAX = 4.0
+
+
+class MobState(IntEnum):
+    IDLE = 0
+    WANDER = 1
+
+
+_COLUMNS = {
+    'alive': bool,
+    'asleep': bool,
+    'x': np.float64,
+    'y': np.float64,
+    'vx': np.float64,
+    'vy': np.float64,
+    'on_ground': bool,
+    'health': np.int32,
+    'max_health': np.int32,
+    'state': np.uint8,
+    'think_timer': np.float64,
+}
+
+
+class MobStore:
+    """Мобы в колонках NumPy: строка i каждой колонки - моб с id i.
+
+    Тик обновляет всех мобов сразу векторными операциями, без объекта на моба.
+    Мобы в незагруженных чанках спят: не думают и не двигаются, пока чанк
+    не загрузят. Строки умерших мобов переиспользуются.
+    """
+
+    def __init__(
+        self, physics: Physics, capacity: int = 256, seed: int | None = None
+    ) -> None:
+        self.physics = physics
+        self.grid = physics.grid
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.free: list[int] = []
+        self.capacity = 0
+        self._grow(capacity)
+
+    def _grow(self, capacity: int) -> None:
+        for name, dtype in _COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if self.capacity:
+                column[: self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def spawn(self, x: float, y: float, health: int = 100) -> int:
+        if self.free:
+            mob_id = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self._grow(self.capacity * 2)
+            mob_id = self.count
+            self.count += 1
+        for name in _COLUMNS:
+            getattr(self, name)[mob_id] = 0
+        self.alive[mob_id] = True
+        self.x[mob_id] = x
+        self.y[mob_id] = y
+        self.health[mob_id] = health
+        self.max_health[mob_id] = health
+        return mob_id
+
+    def despawn(self, mob_ids) -> None:
+        for mob_id in np.atleast_1d(mob_ids).tolist():
+            if self.alive[mob_id]:
+                self.alive[mob_id] = False
+                self.free.append(mob_id)
+
+    def take_damage(self, mob_ids, damage: int) -> np.ndarray:
+        """Урон мобам; как Player.take_damage, здоровье не уходит ниже нуля.
+
+        Мобы с нулевым здоровьем убираются. Возвращает оставшееся здоровье.
+        """
+        health = np.maximum(0, self.health[mob_ids] - damage)
+        self.health[mob_ids] = health
+        self.despawn(np.asarray(mob_ids)[health == 0])
+        return health
+
+    def heal(self, mob_ids, amount: int) -> np.ndarray:
+        """Лечение; как Player.heal, не выше max_health. Возвращает здоровье"""
+        health = np.minimum(self.max_health[mob_ids], self.health[mob_ids] + amount)
+        self.health[mob_ids] = health
+        return health
+
+    def update(self, dt: float) -> None:
+        """Шаг тика для всех неспящих мобов"""
+        n = self.count
+        if not n:
+            return
+        alive = self.alive[:n]
+        tile_x = np.floor(self.x[:n]).astype(np.int64)
+        tile_y = np.floor(self.y[:n]).astype(np.int64)
+        _, loaded = self.grid.solid_many(tile_x, tile_y)
+        self.asleep[:n] = alive & ~loaded
+        active = np.flatnonzero(alive & loaded)
+        if not active.size:
+            return
+        self._think(active, dt)
+        self._move(active, dt)
+
+    def _think(self, active: np.ndarray, dt: float) -> None:
+        self.think_timer[active] -= dt
+        expired = active[self.think_timer[active] <= 0]
+        if not expired.size:
+            return
+        states = self.rng.integers(0, len(MobState), expired.size)
+        directions = self.rng.choice((-1.0, 1.0), expired.size)
+        self.state[expired] = states
+        self.vx[expired] = np.where(
+            states == MobState.WANDER, directions * WANDER_SPEED, 0.0
+        )
+        self.think_timer[expired] = self.rng.uniform(THINK_MIN, THINK_MAX, expired.size)
+
+    def _move(self, active: np.ndarray, dt: float) -> None:
+        x, y = self.x[active], self.y[active]
+        vx, vy = self.vx[active], self.vy[active]
+        wander_vx = vx.copy()
+        hit_wall, on_ground = self.physics.step(x, y, vx, vy, dt)
+        self.x[active] = x
+        self.y[active] = y
+        # Уперлись в стену - разворачиваемся
+        self.vx[active] = np.where(hit_wall, -wander_vx, vx)
+        self.vy[active] = vy
+        self.on_ground[active] = on_ground
+
+    def spawn_in_caves(
+        self, count: int, attempts: int = 100, health: int = 100
+    ) -> list[int]:
+        """Мобы в пустотах под землей: воздух с твердым блоком снизу и сверху"""
+        chunks = list(self.grid.chunks)
+        spawned: list[int] = []
+        if not chunks:
+            return spawned
+        for _ in range(count * attempts):
+            if len(spawned) == count:
+                break
+            chunk_x, chunk_y = random.choice(chunks)
+            x = chunk_x * CHUNK_SIZE + random.randrange(CHUNK_SIZE)
+            y = chunk_y * CHUNK_SIZE + random.randrange(CHUNK_SIZE)
+            if self.grid.is_solid(x, y) or not self.grid.is_solid(x, y + 1):
+                continue
+            if not any(self.grid.is_solid(x, above) for above in range(y - 1, -1, -1)):
+                continue  # на поверхности, а не в пещере
+            spawned.append(self.spawn(x + 0.5, y + 0.5, health))
+        return spawned
+
+    def snapshot(self) -> dict:
+        n = self.count
+        return {
+            'alive': int(self.alive[:n].sum()),
+            'asleep': int(self.asleep[:n].sum()),
+            'capacity': self.capacity,
+        }
+
+
+mobStore = MobStore(physics)
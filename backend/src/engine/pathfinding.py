@@ -0,0 +1,204 @@
+import heapq
+from collections import OrderedDict
+
+from src.engine.collision import FULL_ROW, ChunkKey, CollisionGrid, collisionGrid
+from src.engine.regions import CHUNK_SIZE
+
+Tile = tuple[int, int]
+Path = list[Tile]
+
+_NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_LAST = CHUNK_SIZE - 1
+
+
+def _manhattan(a: tuple[int, int], b: tuple[int, int]) -> int:
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+class PathFinder:
+    """Поиск пути по свободным тайлам загруженных чанков, 4 направления.
+
+    Сначала A* по графу чанков: соседние чанки связаны, если на общей границе
+    есть пара свободных тайлов друг напротив друга. Настоящий путь проходит
+    только по таким связям, поэтому без пути по чанкам нет и пути по тайлам.
+    Обратное неверно: чанк может быть разделен стеной внутри. Потом A* по
+    тайлам внутри найденного коридора чанков; если путь в нем не длиннее
+    манхэттенского расстояния, короче не бывает. Иначе (обход или коридор
+    без пути) - A* по всем загруженным чанкам, он дает кратчайший путь или
+    честное None.
+
+    Результаты (и отсутствие пути тоже) кэшируются по (start, goal) вместе
+    с версиями чанков коридора, а ответы поиска по всем чанкам - с поколением
+    всей сетки: после правки блока, выгрузки или загрузки чанка, от которого
+    зависит ответ, запись пересчитывается.
+    """
+
+    def __init__(
+        self,
+        grid: CollisionGrid,
+        cache_size: int = 4096,
+        max_nodes: int = 20000,
+    ) -> None:
+        self.grid = grid
+        self.cache_size = cache_size
+        self.max_nodes = max_nodes
+        # Версии чанков ответа или поколение всей сетки
+        self.cache: OrderedDict[
+            tuple[Tile, Tile], tuple[Path | None, dict[ChunkKey, int] | int]
+        ] = OrderedDict()
+        self.links: dict[ChunkKey, tuple[tuple[int, ...], list[ChunkKey]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def find_path(self, start: Tile, goal: Tile) -> Path | None:
+        """Путь от start до goal включительно или None"""
+        key = (start, goal)
+        cached = self.cache.get(key)
+        if cached is not None:
+            path, versions = cached
+            if isinstance(versions, int):
+                fresh = versions == self.grid.generation
+            else:
+                fresh = all(
+                    self.grid.version(chunk) == v for chunk, v in versions.items()
+                )
+            if fresh:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return path
+        self.misses += 1
+
+        path, corridor = self._search(start, goal)
+        if corridor is None:
+            # Ответ зависит от всех чанков, в том числе еще не загруженных
+            versions = self.grid.generation
+        else:
+            versions = {chunk: self.grid.version(chunk) for chunk in corridor}
+        self.cache[key] = (path, versions)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return path
+
+    def _search(
+        self, start: Tile, goal: Tile
+    ) -> tuple[Path | None, set[ChunkKey] | None]:
+        """Путь и чанки, от которых он зависит; None - от всей сетки"""
+        start_chunk = (start[0] // CHUNK_SIZE, start[1] // CHUNK_SIZE)
+        goal_chunk = (goal[0] // CHUNK_SIZE, goal[1] // CHUNK_SIZE)
+        endpoints = {start_chunk, goal_chunk}
+        if (
+            self.grid.rows(start_chunk) is None
+            or self.grid.rows(goal_chunk) is None
+            or self.grid.is_solid(*start)
+            or self.grid.is_solid(*goal)
+        ):
+            return None, endpoints
+
+        route = self._chunk_route(start_chunk, goal_chunk)
+        if route is None:
+            return None, None
+
+        corridor = set(route)
+        path = self._tile_route(start, goal, corridor)
+        if path is not None and len(path) - 1 == _manhattan(start, goal):
+            return path, corridor
+        shortest = self._tile_route(start, goal, set(self.grid.chunks))
+        if shortest is None:
+            # Поиск по всем чанкам мог упереться в max_nodes: путь коридора
+            # длиннее, но настоящий
+            shortest = path
+        return shortest, None
+
+    def _chunk_links(self, chunk: ChunkKey) -> list[ChunkKey]:
+        """Соседние загруженные чанки, в которые можно пройти из chunk"""
+        cx, cy = chunk
+        around = [(cx + dx, cy + dy) for dx, dy in _NEIGHBOURS]
+        versions = tuple(self.grid.version(key) for key in [chunk, *around])
+        cached = self.links.get(chunk)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+
+        rows = self.grid.rows(chunk)
+        links = []
+        for (dx, dy), neighbour in zip(_NEIGHBOURS, around):
+            other = self.grid.rows(neighbour)
+            if rows is None or other is None:
+                continue
+            if dy:
+                # Общая граница - нижняя строка одного чанка и верхняя другого
+                edge = rows[_LAST] if dy > 0 else rows[0]
+                other_edge = other[0] if dy > 0 else other[_LAST]
+                if ~(edge | other_edge) & FULL_ROW:
+                    links.append(neighbour)
+                continue
+            shift, other_shift = (_LAST, 0) if dx > 0 else (0, _LAST)
+            for row, other_row in zip(rows, other):
+                if not (row >> shift & 1 or other_row >> other_shift & 1):
+                    links.append(neighbour)
+                    break
+        self.links[chunk] = (versions, links)
+        return links
+
+    def _chunk_route(self, start: ChunkKey, goal: ChunkKey) -> list[ChunkKey] | None:
+        return self._astar(start, goal, self._chunk_links)
+
+    def _tile_route(
+        self, start: Tile, goal: Tile, corridor: set[ChunkKey]
+    ) -> Path | None:
+        grid = self.grid
+
+        def neighbours(tile: Tile) -> list[Tile]:
+            result = []
+            for dx, dy in _NEIGHBOURS:
+                x, y = tile[0] + dx, tile[1] + dy
+                chunk = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+                if chunk not in corridor:
+                    continue
+                rows = grid.chunks.get(chunk)
+                if rows is None or rows[y % CHUNK_SIZE] >> (x % CHUNK_SIZE) & 1:
+                    continue
+                result.append((x, y))
+            return result
+
+        return self._astar(start, goal, neighbours)
+
+    def _astar(self, start, goal, neighbours) -> list | None:
+        """A* с единичной ценой шага и манхэттенской эвристикой"""
+        came_from = {start: None}
+        cost = {start: 0}
+        frontier = [(_manhattan(start, goal), 0, start)]
+        expanded = 0
+        while frontier:
+            _, current_cost, current = heapq.heappop(frontier)
+            if current == goal:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = came_from[current]
+                path.reverse()
+                return path
+            if current_cost > cost[current]:
+                continue
+            expanded += 1
+            if expanded > self.max_nodes:
+                return None
+            for node in neighbours(current):
+                node_cost = current_cost + 1
+                if node_cost < cost.get(node, node_cost + 1):
+                    cost[node] = node_cost
+                    came_from[node] = current
+                    heapq.heappush(
+                        frontier, (node_cost + _manhattan(node, goal), node_cost, node)
+                    )
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            'cached_paths': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+pathFinder = PathFinder(collisionGrid)
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Iterable
+
+from src.config import settings
+from src.database import async_session_maker
+from src.engine.GameSessionManager import (GameSessionsManager, PlayerSession,
+                                           gameSessionsManager)
+from src.schemas.user import UserUpdate
+from src.utils.db_manager import DbManager
+
+
+class PositionPersister:
+    """Периодически сохраняет позиции игроков в базу.
+
+    Сессия берется из пула только на время записи, поэтому вебсокеты
+    не держат соединения с базой, пока игрок онлайн.
+    """
+
+    def __init__(
+        self,
+        sessions: GameSessionsManager,
+        interval: float = settings.PLAYER_PERSIST_INTERVAL,
+    ) -> None:
+        self.sessions = sessions
+        self.interval = interval
+
+    async def save(self, players: Iterable[PlayerSession]) -> None:
+        players = [player for player in players if player.dirty]
+        if not players:
+            return
+
+        async with DbManager(session_factory=async_session_maker) as db:
+            for player in players:
+                await db.users.edit(
+                    UserUpdate(x=player.position['x'], y=player.position['y']),
+                    exclude_unset=True,
+                    id=player.id,
+                )
+            await db.commit()
+
+        for player in players:
+            player.dirty = False
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save(list(self.sessions.players.values()))
+            except Exception as ex:
+                print(f'Не удалось сохранить позиции игроков: {ex}')
+
+
+positionPersister = PositionPersister(gameSessionsManager)
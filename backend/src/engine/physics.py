@@ -0,0 +1,112 @@
+import numpy as np
+
+from src.config import settings
+from src.engine.collision import CollisionGrid, collisionGrid
+
+# Ось y направлена вниз, как в WorldGenerator; единицы - тайлы и секунды
+GRAVITY = 30.0
+TERMINAL_VELOCITY = 20.0
+# Прыжок на v^2 / 2g ~ 2.4 тайла
+JUMP_SPEED = 12.0
+# Тело - квадрат чуть меньше тайла, координаты тела - его центр
+BODY_HALF_SIZE = 0.4
+# За подшаг тело сдвигается не больше чем на полтайла и не проскакивает стены
+MAX_STEP = 0.5
+_EPS = 1e-6
+
+
+class Physics:
+    """Шаг физики для пачки тел: гравитация и AABB против твердых тайлов.
+
+    Тела двигаются по осям отдельно, каждое - своим числом подшагов, чтобы
+    за подшаг пройти не больше MAX_STEP. Подшагов не больше max_substeps
+    на тело и substep_budget на весь вызов: под нагрузкой быстрые тела
+    замедляются, но шаг укладывается в бюджет и сквозь стены не проходит.
+    """
+
+    def __init__(
+        self,
+        grid: CollisionGrid,
+        max_substeps: int = settings.PHYSICS_MAX_SUBSTEPS,
+        substep_budget: int = settings.PHYSICS_SUBSTEP_BUDGET,
+    ) -> None:
+        self.grid = grid
+        self.max_substeps = max_substeps
+        self.substep_budget = substep_budget
+        # Сколько раз бюджет урезал подшаги
+        self.throttled_steps = 0
+
+    def step(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        vx: np.ndarray,
+        vy: np.ndarray,
+        dt: float,
+        half_size: float = BODY_HALF_SIZE,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Сдвигает тела на dt, массивы меняются на месте.
+
+        Возвращает (уперлись в стену по x, стоят на земле).
+        """
+        n = len(x)
+        hit_wall = np.zeros(n, dtype=bool)
+        on_ground = np.zeros(n, dtype=bool)
+        if not n:
+            return hit_wall, on_ground
+
+        vy += GRAVITY * dt
+        np.minimum(vy, TERMINAL_VELOCITY, out=vy)
+
+        limit = max(1, min(self.max_substeps, self.substep_budget // n))
+        if limit < self.max_substeps:
+            self.throttled_steps += 1
+        distance = np.maximum(np.abs(vx), np.abs(vy)) * dt
+        steps = np.clip(np.ceil(distance / MAX_STEP), 1, limit).astype(np.int64)
+        # Кому не хватило подшагов, летит медленнее, а не сквозь тайлы
+        cap = steps * MAX_STEP / dt
+        np.clip(vx, -cap, cap, out=vx)
+        np.clip(vy, -cap, cap, out=vy)
+        sub_dt = dt / steps
+
+        for substep in range(int(steps.max())):
+            bodies = np.flatnonzero(steps > substep)
+            hit_wall[bodies] |= self._move_x(x, y, vx, bodies, sub_dt, half_size)
+            on_ground[bodies] |= self._move_y(x, y, vy, bodies, sub_dt, half_size)
+        return hit_wall, on_ground
+
+    def _solid(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        solid, _ = self.grid.solid_many(
+            np.floor(xs).astype(np.int64), np.floor(ys).astype(np.int64)
+        )
+        return solid
+
+    def _move_x(self, x, y, vx, bodies, sub_dt, half) -> np.ndarray:
+        velocity = vx[bodies]
+        new_x = x[bodies] + velocity * sub_dt[bodies]
+        right = velocity > 0
+        # Передний край тела; тело меньше тайла, поэтому хватает двух углов
+        column = np.floor(np.where(right, new_x + half - _EPS, new_x - half))
+        top = y[bodies] - half
+        bottom = y[bodies] + half - _EPS
+        hit = (velocity != 0) & (self._solid(column, top) | self._solid(column, bottom))
+        x[bodies] = np.where(
+            hit, np.where(right, column - half, column + 1 + half), new_x
+        )
+        vx[bodies] = np.where(hit, 0.0, velocity)
+        return hit
+
+    def _move_y(self, x, y, vy, bodies, sub_dt, half) -> np.ndarray:
+        velocity = vy[bodies]
+        new_y = y[bodies] + velocity * sub_dt[bodies]
+        down = velocity > 0
+        row = np.floor(np.where(down, new_y + half - _EPS, new_y - half))
+        left = x[bodies] - half
+        right = x[bodies] + half - _EPS
+        hit = (velocity != 0) & (self._solid(left, row) | self._solid(right, row))
+        y[bodies] = np.where(hit, np.where(down, row - half, row + 1 + half), new_y)
+        vy[bodies] = np.where(hit, 0.0, velocity)
+        return hit & down
+
+
+physics = Physics(collisionGrid)
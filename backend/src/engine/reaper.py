@@ -0,0 +1,79 @@
+import asyncio
+import time
+from collections import Counter
+
+from src.config import settings
+from src.engine.GameSessionManager import (GameSessionsManager, PlayerSession,
+                                           gameSessionsManager)
+from src.engine.persistence import PositionPersister, positionPersister
+
+
+class SessionReaper:
+    """Периодически убирает сессии, которые не закрылись сами.
+
+    Обычно сессию убирает finally обработчика вебсокета. Reaper подбирает
+    остальное: сокет перестал принимать кадры, задача отправки умерла,
+    клиент молчит дольше idle_timeout. Сессия сразу убирается из менеджера
+    и сохраняется, сокет закрывается в фоне.
+    """
+
+    def __init__(
+        self,
+        sessions: GameSessionsManager,
+        persister: PositionPersister,
+        interval: float = settings.REAPER_INTERVAL,
+        idle_timeout: float = settings.SESSION_IDLE_TIMEOUT,
+    ) -> None:
+        self.sessions = sessions
+        self.persister = persister
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        # Сколько сессий убрано, по причинам
+        self.reaped: Counter[str] = Counter()
+        # Ссылки на фоновые kick, иначе задачу может собрать GC до завершения
+        self.kicks: set[asyncio.Task] = set()
+
+    def stale_reason(self, player: PlayerSession, now: float) -> str | None:
+        if player.send_failed:
+            return 'send_failed'
+        if player.writer_task is None or player.writer_task.done():
+            return 'writer_stopped'
+        if self.idle_timeout and now - player.last_seen > self.idle_timeout:
+            return 'idle'
+        return None
+
+    async def reap(self) -> int:
+        now = time.monotonic()
+        stale = [
+            (player, reason)
+            for player in list(self.sessions.players.values())
+            if (reason := self.stale_reason(player, now)) is not None
+        ]
+        for player, reason in stale:
+            if not await self.sessions.remove_player(player):
+                continue
+            self.reaped[reason] += 1
+            print(f'Сессия {player.name} убрана: {reason}')
+            task = asyncio.create_task(player.kick())
+            self.kicks.add(task)
+            task.add_done_callback(self.kicks.discard)
+            await self.persister.save([player])
+        return len(stale)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap()
+            except Exception as ex:
+                print(f'Ошибка reaper: {ex}')
+
+    def snapshot(self) -> dict:
+        return {
+            'players': len(self.sessions.players),
+            'remote_players': len(self.sessions.remote_players),
+            'reaped': dict(self.reaped),
+        }
+
+
+sessionReaper = SessionReaper(gameSessionsManager, positionPersister)
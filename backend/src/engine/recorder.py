@@ -0,0 +1,104 @@
+import itertools
+import os
+import struct
+import time
+from enum import IntEnum
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from src.config import settings
+
+# Заголовок записи: monotonic-время, id сессии, направление, длина кадра
+RECORD_HEADER = struct.Struct('!d I B I')
+FILE_PREFIX = 'traffic-'
+FILE_SUFFIX = '.bin'
+
+
+class Direction(IntEnum):
+    INBOUND = 0
+    OUTBOUND = 1
+
+
+class TrafficRecorder:
+    """Пишет кадры /game/ws в бинарный лог для последующего replay.
+
+    Файлы traffic-PID-NNNN.bin в directory: у каждого процесса (воркера
+    src/cluster.py) свои файлы, новый начинается, когда текущий дорастает
+    до max_bytes. Пустой directory - запись выключена.
+
+    Номер сессии в записи - номер соединения в процессе, а не user id:
+    переподключение того же игрока - отдельная сессия.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.file: BinaryIO | None = None
+        self.file_index = 0
+        self.file_bytes = 0
+        self.sessions = itertools.count(1)
+        # Заголовок пишется в один буфер, без нового объекта на запись
+        self.header = bytearray(RECORD_HEADER.size)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def new_session(self) -> int:
+        """Номер для нового соединения"""
+        return next(self.sessions)
+
+    def _open_next(self) -> None:
+        if self.file is not None:
+            self.file.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # pid берется при открытии: у воркеров cluster.py (процессы spawn) свои файлы
+        prefix = f'{FILE_PREFIX}{os.getpid()}-'
+        existing = sorted(self.directory.glob(f'{prefix}*{FILE_SUFFIX}'))
+        if existing:
+            last = existing[-1].stem.removeprefix(prefix)
+            self.file_index = max(self.file_index, int(last) + 1)
+        path = self.directory / f'{prefix}{self.file_index:04d}{FILE_SUFFIX}'
+        self.file = open(path, 'ab')
+        self.file_index += 1
+        self.file_bytes = 0
+
+    def record(self, session_id: int, direction: Direction, frame: bytes) -> None:
+        if self.directory is None:
+            return
+        if self.file is None or self.file_bytes >= self.max_bytes:
+            self._open_next()
+        RECORD_HEADER.pack_into(
+            self.header, 0, time.monotonic(), session_id, direction, len(frame)
+        )
+        self.file.write(self.header)
+        self.file.write(frame)
+        self.file_bytes += RECORD_HEADER.size + len(frame)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def record_source(path: Path) -> str:
+    """Процесс, записавший файл: номера сессий уникальны только внутри него"""
+    source, _, _ = path.stem.removeprefix(FILE_PREFIX).rpartition('-')
+    return source
+
+
+def read_records(paths: list[Path]) -> Iterator[tuple[float, int, Direction, bytes]]:
+    """Читает записи из файлов лога по порядку"""
+    for path in paths:
+        with open(path, 'rb') as file:
+            while header := file.read(RECORD_HEADER.size):
+                if len(header) < RECORD_HEADER.size:
+                    break  # Запись оборвалась при остановке сервера
+                timestamp, session_id, direction, length = RECORD_HEADER.unpack(header)
+                frame = file.read(length)
+                if len(frame) < length:
+                    break
+                yield timestamp, session_id, Direction(direction), frame
+
+
+trafficRecorder = TrafficRecorder(settings.RECORD_DIR, settings.RECORD_MAX_BYTES)
@@ -0,0 +1,23 @@
+from src.config import settings
+
+# Совпадает с WorldGenerator.CHUNK_SIZE
+CHUNK_SIZE = 16
+
+Region = tuple[int, int]
+
+
+def chunk_of(x: int, y: int) -> tuple[int, int]:
+    """Координаты чанка, в котором лежит тайл (x, y)"""
+    return x // CHUNK_SIZE, y // CHUNK_SIZE
+
+
+def region_of(x: int, y: int, region_chunks: int = settings.REGION_CHUNKS) -> Region:
+    """Регион - квадрат из region_chunks x region_chunks чанков"""
+    size = CHUNK_SIZE * region_chunks
+    return x // size, y // size
+
+
+def neighbour_regions(region: Region) -> list[Region]:
+    """Регион вместе с восемью соседями"""
+    rx, ry = region
+    return [(rx + dx, ry + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
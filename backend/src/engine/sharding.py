@@ -0,0 +1,52 @@
+from src.config import settings
+from src.engine.regions import Region, region_of
+
+
+class ShardMap:
+    """Раскладка регионов по воркерам.
+
+    Мир боковой и вытянут по X, поэтому воркерам достаются вертикальные полосы
+    шириной strip_regions регионов, по кругу. Соседние полосы принадлежат
+    разным воркерам, между ними идет передача игроков и ghost-сущности.
+    """
+
+    def __init__(
+        self,
+        worker_count: int = settings.WORKER_COUNT,
+        worker_index: int = settings.WORKER_INDEX,
+        strip_regions: int = settings.SHARD_STRIP_REGIONS,
+        ghost_margin: int = settings.GHOST_MARGIN,
+    ) -> None:
+        self.worker_count = max(1, worker_count)
+        self.worker_index = worker_index
+        self.strip_regions = max(1, strip_regions)
+        self.ghost_margin = ghost_margin
+
+    @property
+    def enabled(self) -> bool:
+        return self.worker_count > 1
+
+    def owner_of(self, region: Region) -> int:
+        return (region[0] // self.strip_regions) % self.worker_count
+
+    def is_local(self, region: Region) -> bool:
+        return self.owner_of(region) == self.worker_index
+
+    def worker_address(self, index: int) -> tuple[str, int]:
+        return settings.WORKER_PUBLIC_HOST, settings.WORKER_BASE_PORT + index
+
+    def foreign_regions_near(self, x: int, y: int) -> set[Region]:
+        """Чужие регионы в пределах ghost_margin тайлов от точки"""
+        if not self.enabled:
+            return set()
+        margin = self.ghost_margin
+        regions = set()
+        for dx in (-margin, 0, margin):
+            for dy in (-margin, 0, margin):
+                region = region_of(x + dx, y + dy)
+                if not self.is_local(region):
+                    regions.add(region)
+        return regions
+
+
+shardMap = ShardMap()
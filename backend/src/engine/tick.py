@@ -0,0 +1,221 @@
+import asyncio
+import time
+from typing import Callable
+
+import numpy as np
+
+from src.config import settings
+from src.engine.backplane import BackplaneEvent
+from src.engine.GameProtocol import GameProtocol, InputDirection, PlayerJoin
+from src.engine.GameSessionManager import (GameSessionsManager, PlayerSession,
+                                           gameSessionsManager)
+from src.engine.mobs import mobStore
+from src.engine.persistence import PositionPersister, positionPersister
+from src.engine.physics import JUMP_SPEED, Physics, physics
+from src.engine.regions import Region, chunk_of
+from src.engine.sharding import ShardMap, shardMap
+from src.utils.tick_profiler import TickProfiler, tickProfiler
+
+# Шаг симуляции: получает длительность тика в секундах
+System = Callable[[float], None]
+
+
+class TickLoop:
+    """Игровой тик с фиксированной частотой.
+
+    Обработчики вебсокетов только складывают ввод в сессии, а тик применяет его,
+    прогоняет симуляцию и рассылает изменения пачкой. Время каждой фазы
+    пишется в TickProfiler.
+    """
+
+    def __init__(
+        self,
+        sessions: GameSessionsManager,
+        persister: PositionPersister,
+        profiler: TickProfiler = tickProfiler,
+        rate: int = settings.TICK_RATE,
+        shards: ShardMap = shardMap,
+        physics: Physics = physics,
+    ) -> None:
+        self.sessions = sessions
+        self.persister = persister
+        self.profiler = profiler
+        self.dt = 1 / rate
+        self.shards = shards
+        self.physics = physics
+        self.systems: list[System] = []
+        # Ссылки на фоновые передачи игроков: задачу без ссылки может собрать GC
+        self.handoffs: set[asyncio.Task] = set()
+
+    def add_system(self, system: System) -> None:
+        self.systems.append(system)
+
+    async def tick(self) -> None:
+        profiler = self.profiler
+        profiler.begin_tick()
+
+        with profiler.phase('input'):
+            moved: list[tuple[PlayerSession, Region]] = []
+            # Игроки в загруженных чанках двигаются физикой, остальные - как раньше
+            bodies: list[PlayerSession] = []
+            # Чей ввод съеден в этом тике: клиент уже предсказал свой сдвиг
+            # по x, а y ему сообщает сервер
+            steered: list[PlayerSession] = []
+            for player in self.sessions.players.values():
+                if player.handing_off:
+                    continue
+                chunk = chunk_of(player.position['x'], player.position['y'])
+                if self.physics.grid.rows(chunk) is not None:
+                    self.apply_intent(player)
+                    bodies.append(player)
+                    if player.pending_position is not None:
+                        steered.append(player)
+                elif player.pending_position is not None:
+                    old_region = player.region
+                    player.update_position(*player.pending_position)
+                    moved.append((player, old_region))
+                    # Клиент версии 1 шлет готовую позицию, поправлять нечего
+                    if not player.is_legacy:
+                        steered.append(player)
+                player.pending_position = None
+                player.pending_directions = InputDirection(0)
+
+        with profiler.phase('simulation'):
+            moved.extend(self.step_bodies(bodies))
+            for system in self.systems:
+                system(self.dt)
+
+        with profiler.phase('interest'):
+            updates = []
+            # Позицию тел решает сервер, клиент узнает ее только из поправок
+            corrected = set(bodies)
+            corrected.update(steered)
+            for player, _ in moved:
+                join = PlayerJoin(
+                    player.id, player.name, player.position['x'], player.position['y']
+                )
+                recipients = self.sessions.interested(join)
+                if player in corrected:
+                    recipients.append(player)
+                updates.append((join, recipients))
+            # Физика могла не сменить тайл (стена, вниз по земле), а клиент
+            # уже сдвинулся: позиция сервера уходит ему всегда
+            moved_players = {player for player, _ in moved}
+            corrections = [
+                (
+                    PlayerJoin(
+                        player.id,
+                        player.name,
+                        player.position['x'],
+                        player.position['y'],
+                    ),
+                    [player],
+                )
+                for player in steered
+                if player not in moved_players
+            ]
+
+        with profiler.phase('packing'):
+            outgoing = [
+                self.sessions.prepare_update(join, recipients)
+                for join, recipients in updates
+            ]
+            outgoing.extend(
+                self.sessions.prepare_update(join, recipients)
+                for join, recipients in corrections
+            )
+
+        with profiler.phase('enqueue'):
+            for messages in outgoing:
+                for message in messages:
+                    self.sessions.deliver(message)
+
+        with profiler.phase('backplane'):
+            if any(player.region != old_region for player, old_region in moved):
+                await self.sessions.sync_regions()
+            for (player, _), (join, _) in zip(moved, updates):
+                # Другим нодам позиция уходит вместе с именем
+                await self.sessions.publish(
+                    player,
+                    BackplaneEvent.WORLD_STATE,
+                    GameProtocol.pack_player_join(join),
+                )
+                if not self.shards.is_local(player.region):
+                    player.handing_off = True
+                    task = asyncio.create_task(self.handoff(player))
+                    self.handoffs.add(task)
+                    task.add_done_callback(self.handoffs.discard)
+
+        profiler.end_tick()
+
+    def apply_intent(self, player: PlayerSession) -> None:
+        """Ввод игрока как скорость: шаг по x и прыжок с земли.
+
+        Пакет ввода - ровно тайл по x, как его предсказывает клиент
+        (PlayerInput.delta): за тик тело проходит столько тайлов, сколько
+        насчитал ввод, если не упрется в стену. По y решают гравитация и прыжок.
+        """
+        walk = 0
+        if player.pending_position is not None:
+            walk = player.pending_position[0] - player.position['x']
+        vy = player.velocity[1]
+        if player.pending_directions & InputDirection.UP and player.on_ground:
+            vy = -JUMP_SPEED
+        player.velocity = (walk / self.dt, vy)
+
+    def step_bodies(
+        self, players: list[PlayerSession]
+    ) -> list[tuple[PlayerSession, Region]]:
+        """Шаг физики для всех игроков разом; возвращает сменивших тайл"""
+        if not players:
+            return []
+        x = np.array([player.center[0] for player in players])
+        y = np.array([player.center[1] for player in players])
+        vx = np.array([player.velocity[0] for player in players])
+        vy = np.array([player.velocity[1] for player in players])
+        _, on_ground = self.physics.step(x, y, vx, vy, self.dt)
+
+        moved = []
+        for i, player in enumerate(players):
+            old_region = player.region
+            player.velocity = (float(vx[i]), float(vy[i]))
+            player.on_ground = bool(on_ground[i])
+            if player.move_body(float(x[i]), float(y[i])):
+                moved.append((player, old_region))
+        return moved
+
+    async def handoff(self, player: PlayerSession) -> None:
+        """Передает игрока воркеру, которому принадлежит его новый регион"""
+        try:
+            # Позиция должна попасть в базу до того, как клиент подключится
+            # к новому воркеру: тот загрузит игрока именно оттуда.
+            await self.persister.save([player])
+            host, port = self.shards.worker_address(
+                self.shards.owner_of(player.region)
+            )
+            await player.handoff(host, port)
+        except Exception as ex:
+            print(f'Не удалось передать игрока {player.name}: {ex}')
+
+    async def run(self) -> None:
+        self.profiler.start()
+        next_tick = time.monotonic()
+        try:
+            while True:
+                try:
+                    await self.tick()
+                except Exception as ex:
+                    print(f'Ошибка тика: {ex}')
+                next_tick += self.dt
+                delay = next_tick - time.monotonic()
+                if delay < -self.dt:
+                    # Сильно отстали: не пытаемся догнать пачкой тиков подряд
+                    next_tick = time.monotonic()
+                    delay = 0
+                await asyncio.sleep(max(delay, 0))
+        finally:
+            self.profiler.stop()
+
+
+tickLoop = TickLoop(gameSessionsManager, positionPersister)
+tickLoop.add_system(mobStore.update)
@@ -1,4 +1,7 @@
+import asyncio
+import json
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
@@ -10,12 +13,39 @@ from fastapi.middleware.cors import CORSMiddleware
 from src.api.rest.auth_v2 import router as ws_router
 from src.api.rest.status import router as status_router
 from src.api.ws import router as auth_router
+from src.config import settings
+from src.engine.collision import collisionGrid
+from src.engine.GameSessionManager import gameSessionsManager
+from src.engine.mobs import mobStore
+from src.engine.persistence import positionPersister
+from src.engine.reaper import sessionReaper
+from src.engine.recorder import trafficRecorder
+from src.engine.tick import tickLoop
 
 origins = [
     'http://localhost',
 ]
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.WORLD_PATH:
+        collisionGrid.load_world(json.loads(Path(settings.WORLD_PATH).read_text()))
+        mobStore.spawn_in_caves(settings.MOB_SPAWN_COUNT)
+    await gameSessionsManager.backplane.start()
+    persist_task = asyncio.create_task(positionPersister.run())
+    tick_task = asyncio.create_task(tickLoop.run())
+    reaper_task = asyncio.create_task(sessionReaper.run())
+    yield
+    reaper_task.cancel()
+    tick_task.cancel()
+    persist_task.cancel()
+    await positionPersister.save(list(positionPersister.sessions.players.values()))
+    await gameSessionsManager.backplane.close()
+    trafficRecorder.close()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -14,7 +14,10 @@ class DbManager:
         return self
 
     async def __aexit__(self, *args):  # *args для обработки ошибок
-        await self.session.rollback()
+        # close() сам откатывает незакоммиченное и возвращает соединение в пул.
+        # Транзакцию SQLAlchemy открывает на первом же SELECT, так что сессия
+        # только с чтением тоже заканчивается одним ROLLBACK; отдельный
+        # rollback() перед close() был бы тем же запросом, а не лишним.
         await self.session.close()
 
     async def commit(self):
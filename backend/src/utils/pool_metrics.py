@@ -0,0 +1,56 @@
+import time
+from collections import deque
+
+
+class PoolMetrics:
+    """Метрики пула соединений: время ожидания checkout и загрузка пула."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.wait_times: deque[float] = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.max_checked_out = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait_times.append(seconds)
+        self.checkouts += 1
+
+    def observe_timeout(self) -> None:
+        self.timeouts += 1
+
+    def observe_checked_out(self, checked_out: int) -> None:
+        if checked_out > self.max_checked_out:
+            self.max_checked_out = checked_out
+
+    def percentile(self, q: float) -> float:
+        if not self.wait_times:
+            return 0.0
+        ordered = sorted(self.wait_times)
+        index = min(len(ordered) - 1, int(len(ordered) * q))
+        return ordered[index]
+
+    def snapshot(self, pool) -> dict:
+        """Снимок метрик вместе с текущим состоянием пула"""
+        size = pool.size()
+        checked_out = pool.checkedout()
+        capacity = size + max(pool._max_overflow, 0)
+        return {
+            'size': size,
+            'max_overflow': pool._max_overflow,
+            'checked_out': checked_out,
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'utilization': checked_out / capacity if capacity else 0.0,
+            'max_checked_out': self.max_checked_out,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_ms': {
+                'p50': self.percentile(0.5) * 1000,
+                'p99': self.percentile(0.99) * 1000,
+                'max': max(self.wait_times, default=0.0) * 1000,
+            },
+            'timestamp': time.time(),
+        }
+
+
+pool_metrics = PoolMetrics()
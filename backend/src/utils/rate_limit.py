@@ -0,0 +1,22 @@
+import time
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше burst про запас."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.rejected = 0
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < tokens:
+            self.rejected += 1
+            return False
+        self.tokens -= tokens
+        return True
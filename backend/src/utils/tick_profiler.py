@@ -0,0 +1,151 @@
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.config import settings
+
+
+def collapse_stack(frame) -> str:
+    """Стек в формате collapsed (flamegraph.pl, speedscope): корень;...;вершина"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f'{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+class TickProfiler:
+    """Время фаз тика в кольцевом буфере и профиль медленных тиков.
+
+    Пока идет тик, фоновый поток раз в sample_interval снимает стек потока
+    event loop. Если тик не уложился в budget, накопленные стеки сохраняются
+    как снимок профиля; иначе просто выбрасываются.
+    """
+
+    def __init__(
+        self,
+        budget: float,
+        history: int = 600,
+        sample_interval: float = 0.005,
+        dump_dir: str = '',
+    ) -> None:
+        self.budget = budget
+        self.ticks: deque[dict[str, float]] = deque(maxlen=history)
+        self.total_ticks = 0
+        self.slow_ticks = 0
+        self.dumps: deque[dict] = deque(maxlen=5)
+        self.sample_interval = sample_interval
+        self.dump_dir = Path(dump_dir) if dump_dir else None
+        self._phases: dict[str, float] = {}
+        self._tick_started = 0.0
+        self._samples: Counter[str] = Counter()
+        self._sampling = False
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._target_thread_id: int | None = None
+
+    def start(self) -> None:
+        """Запускает сэмплер для текущего потока (потока event loop)"""
+        if self.sample_interval <= 0 or self._thread is not None:
+            return
+        self._target_thread_id = threading.get_ident()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._sample_loop, name='tick-sampler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        self._thread = None
+
+    def _sample_loop(self) -> None:
+        while self._running:
+            time.sleep(self.sample_interval)
+            if not self._sampling:
+                continue
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is not None:
+                self._samples[collapse_stack(frame)] += 1
+
+    def begin_tick(self) -> None:
+        self._phases = {}
+        self._samples = Counter()
+        self._tick_started = time.perf_counter()
+        self._sampling = True
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases[name] = (
+                self._phases.get(name, 0.0) + time.perf_counter() - started
+            )
+
+    def end_tick(self) -> float:
+        self._sampling = False
+        total = time.perf_counter() - self._tick_started
+        self._phases['total'] = total
+        self.ticks.append(self._phases)
+        self.total_ticks += 1
+        if total > self.budget:
+            self.slow_ticks += 1
+            self._dump(total)
+        return total
+
+    def _dump(self, total: float) -> None:
+        dump = {
+            'at': time.time(),
+            'total_ms': total * 1000,
+            'phases_ms': {name: value * 1000 for name, value in self._phases.items()},
+            'samples': [
+                {'stack': stack, 'count': count}
+                for stack, count in self._samples.most_common(20)
+            ],
+        }
+        self.dumps.append(dump)
+        if self.dump_dir is not None:
+            self.dump_dir.mkdir(parents=True, exist_ok=True)
+            path = self.dump_dir / f'slow-tick-{int(dump["at"] * 1000)}.collapsed'
+            path.write_text(
+                ''.join(f'{stack} {count}\n' for stack, count in self._samples.items())
+            )
+
+    @staticmethod
+    def _percentile(values: list[float], q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def snapshot(self) -> dict:
+        names = {name for tick in self.ticks for name in tick}
+        phases = {}
+        for name in sorted(names):
+            values = [tick.get(name, 0.0) for tick in self.ticks]
+            phases[name] = {
+                'avg_ms': sum(values) / len(values) * 1000,
+                'p99_ms': self._percentile(values, 0.99) * 1000,
+                'max_ms': max(values) * 1000,
+            }
+        return {
+            'budget_ms': self.budget * 1000,
+            'ticks': self.total_ticks,
+            'slow_ticks': self.slow_ticks,
+            'phases': phases,
+            'last_slow_tick': self.dumps[-1] if self.dumps else None,
+        }
+
+
+tickProfiler = TickProfiler(
+    1 / settings.TICK_RATE,
+    settings.TICK_HISTORY,
+    settings.TICK_SAMPLE_INTERVAL,
+    settings.TICK_PROFILE_DIR,
+)
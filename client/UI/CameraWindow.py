@@ -2,6 +2,8 @@ import curses
 from time import sleep
 from typing import Any, Dict, List, Tuple
 
+from UI.FrameBuffer import FrameBuffer
+
 
 class CameraWindow:
     def __init__(self, parent_win, x: int, y: int, width: int, height: int):
@@ -23,6 +25,7 @@ class CameraWindow:
         # Создаем подокно для камеры
         self.win = parent_win.subwin(height, width, y, x)
         self.win.keypad(True)
+        self.buffer = FrameBuffer(self.win)
 
         # Позиция камеры в мировых координатах
         self.world_x = 0
@@ -33,12 +36,21 @@ class CameraWindow:
         self.viewport_height = 15
 
     def clear(self):
-        """Очищает окно камеры."""
-        self.win.clear()
+        """Начинает новый кадр камеры.
+
+        Терминал не очищается: в refresh() уйдут только изменившиеся клетки.
+        """
+        self.buffer.begin_frame()
+
+    def refresh(self) -> int:
+        """Выводит изменения кадра в виртуальный экран curses.
+
+        Сам вывод в терминал делает curses.doupdate() один раз за кадр.
 
-    def refresh(self):
-        """Обновляет окно камеры."""
-        self.win.refresh()
+        Returns:
+            int: Сколько клеток было перерисовано
+        """
+        return self.buffer.present()
 
     def world_to_screen(self, world_x: int, world_y: int) -> Tuple[int, int]:
         """Преобразует мировые координаты в экранные координаты камеры."""
@@ -57,14 +69,36 @@ class CameraWindow:
         """Рисует символ в мировых координатах."""
         if self.is_visible(world_x, world_y):
             screen_x, screen_y = self.world_to_screen(world_x, world_y)
-            try:
-                self.win.addch(screen_y, screen_x, char, attr)
-            except curses.error:
-                pass  # Игнорируем ошибки отрисовки на границах
+            self.buffer.put(screen_y, screen_x, char, attr)
+
+    def draw_text(
+        self, text: str, screen_x: int, screen_y: int, attr: int = curses.A_NORMAL
+    ):
+        """Рисует строку в экранных координатах камеры, обрезая по краям окна."""
+        if not 0 <= screen_y < self.height:
+            return
+        for offset, char in enumerate(text):
+            if 0 <= screen_x + offset < self.width:
+                self.buffer.put(screen_y, screen_x + offset, char, attr)
 
     def draw_border(self):
-        """Рисует границу вокруг окна камеры."""
-        self.win.border()
+        """Рисует границу вокруг окна камеры.
+
+        Рамка статична, поэтому кладется в фон буфера один раз.
+        """
+        if self.buffer.background:
+            return
+        right, bottom = self.width - 1, self.height - 1
+        for x in range(1, right):
+            self.buffer.set_background(0, x, curses.ACS_HLINE)
+            self.buffer.set_background(bottom, x, curses.ACS_HLINE)
+        for y in range(1, bottom):
+            self.buffer.set_background(y, 0, curses.ACS_VLINE)
+            self.buffer.set_background(y, right, curses.ACS_VLINE)
+        self.buffer.set_background(0, 0, curses.ACS_ULCORNER)
+        self.buffer.set_background(0, right, curses.ACS_URCORNER)
+        self.buffer.set_background(bottom, 0, curses.ACS_LLCORNER)
+        self.buffer.set_background(bottom, right, curses.ACS_LRCORNER)
 
     def center_on(self, world_x: int, world_y: int):
         """Центрирует камеру на указанных мировых координатах."""
@@ -0,0 +1,72 @@
+import curses
+from typing import Dict, Optional, Tuple
+
+Cell = Tuple[int, int]
+Glyph = Tuple[str | int, int]
+
+
+class FrameBuffer:
+    def __init__(self, win) -> None:
+        """Задний буфер окна curses.
+
+        Хранит клетки, нарисованные в прошлом кадре, и клетки текущего кадра.
+        В терминал уходят только изменившиеся клетки, поэтому окно не нужно
+        очищать каждый кадр (win.clear() заставляет терминал перерисовать всё).
+
+        Args:
+            win: Окно curses, в которое идет отрисовка
+        """
+        self.win = win
+        self.background: Dict[Cell, Glyph] = {}
+        self.drawn: Dict[Cell, Glyph] = {}
+        self.pending: Dict[Cell, Glyph] = {}
+        self.cells_emitted = 0
+
+    def set_background(self, y: int, x: int, char: str | int, attr: int = 0):
+        """Статичная клетка (рамка и т.п.), которая видна, когда поверх ничего нет."""
+        self.background[(y, x)] = (char, attr)
+
+    def begin_frame(self):
+        """Начинает новый кадр. Терминал при этом не трогается."""
+        self.pending = {}
+
+    def put(self, y: int, x: int, char: str | int, attr: int = curses.A_NORMAL):
+        self.pending[(y, x)] = (char, attr)
+
+    def put_str(self, y: int, x: int, text: str, attr: int = curses.A_NORMAL):
+        for offset, char in enumerate(text):
+            self.pending[(y, x + offset)] = (char, attr)
+
+    def invalidate(self):
+        """Забывает, что было на экране: следующий present перерисует все клетки."""
+        self.drawn = {}
+        self.win.erase()
+
+    def _emit(self, cell: Cell, glyph: Optional[Glyph]):
+        y, x = cell
+        char, attr = glyph if glyph is not None else (' ', curses.A_NORMAL)
+        try:
+            self.win.addch(y, x, char, attr)
+        except curses.error:
+            pass  # Правый нижний угол окна curses считает ошибкой
+        self.cells_emitted += 1
+
+    def present(self) -> int:
+        """Выводит разницу между прошлым и текущим кадром.
+
+        Returns:
+            int: Сколько клеток пришлось перерисовать
+        """
+        emitted_before = self.cells_emitted
+        target = {**self.background, **self.pending}
+
+        for cell, glyph in target.items():
+            if self.drawn.get(cell) != glyph:
+                self._emit(cell, glyph)
+
+        for cell in self.drawn.keys() - target.keys():
+            self._emit(cell, None)
+
+        self.drawn = target
+        self.win.noutrefresh()
+        return self.cells_emitted - emitted_before
@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Deque, List, Tuple
+
+
+def wrap_message(message: str, width: int) -> List[str]:
+    """Разбивает сообщение на строки не длиннее width, по пробелам где можно."""
+    if len(message) <= width:
+        return [message]
+
+    lines = []
+    start = 0
+    while start < len(message):
+        end = start + width
+        if end < len(message):
+            # Пытаемся найти пробел для разрыва слова
+            break_pos = message.rfind(' ', start, end)
+            if break_pos != -1 and break_pos > start:
+                end = break_pos + 1
+
+        lines.append(message[start:end].strip())
+        start = end
+    return lines
+
+
+class ChatLog:
+    def __init__(self, max_messages: int = 10, width: int = 28) -> None:
+        """История чата с уже разбитыми на строки сообщениями.
+
+        Сообщение переносится один раз при добавлении, а не каждый кадр.
+        Заново все переносится только при смене ширины окна чата.
+
+        Args:
+            max_messages (int): Сколько последних сообщений хранить
+            width (int): Ширина строки чата
+        """
+        self.width = width
+        self.messages: Deque[Tuple[str, List[str]]] = deque(maxlen=max_messages)
+
+    def append(self, message: str) -> None:
+        # deque с maxlen сам выбрасывает самое старое сообщение
+        self.messages.append((message, wrap_message(message, self.width)))
+
+    def set_width(self, width: int) -> None:
+        if width == self.width:
+            return
+        self.width = width
+        self.messages = deque(
+            ((message, wrap_message(message, width)) for message, _ in self.messages),
+            maxlen=self.messages.maxlen,
+        )
+
+    def tail(self, height: int) -> List[str]:
+        """Последние height строк, от старых к новым.
+
+        Обходит сообщения с конца и останавливается, как только строк хватает,
+        поэтому стоимость зависит от высоты окна, а не от истории.
+        """
+        lines: List[str] = []
+        for _, wrapped in reversed(self.messages):
+            lines[:0] = wrapped
+            if len(lines) >= height:
+                break
+        return lines[-height:] if height > 0 else []
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self):
+        return (message for message, _ in self.messages)
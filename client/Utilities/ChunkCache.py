@@ -0,0 +1,182 @@
+import os
+import struct
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ChunkKey = Tuple[int, int]
+
+CHUNK_SIZE = 16
+_CHUNK_BYTES = CHUNK_SIZE * CHUNK_SIZE
+# Заголовок файла чанка на диске: версия чанка
+_HEADER = struct.Struct('!I')
+
+
+class Chunk:
+    def __init__(self, version: int, data: bytes) -> None:
+        """Чанк мира: CHUNK_SIZE x CHUNK_SIZE id блоков построчно.
+
+        Args:
+            version (int): Версия чанка на сервере
+            data (bytes): Блоки, по байту на тайл
+        """
+        self.version = version
+        self.data = data
+
+    def block(self, local_x: int, local_y: int) -> int:
+        return self.data[local_y * CHUNK_SIZE + local_x]
+
+
+class ChunkCache:
+    def __init__(
+        self,
+        max_chunks: int = 256,
+        evict_radius: int = 8,
+        cache_dir: Optional[str | Path] = None,
+    ) -> None:
+        """Ограниченный кэш чанков вокруг камеры.
+
+        В памяти держится не больше max_chunks чанков; чанки дальше
+        evict_radius чанков от камеры выбрасываются, остальные - по LRU.
+        Если задан cache_dir, чанки сохраняются на диск, и после переподключения
+        с сервера нужно скачать только те, у которых сменилась версия.
+
+        Args:
+            max_chunks (int): Максимум чанков в памяти
+            evict_radius (int): Радиус в чанках, который не выбрасывается
+            cache_dir: Папка для чанков на диске или None
+        """
+        self.max_chunks = max_chunks
+        self.evict_radius = evict_radius
+        self.chunks: OrderedDict[ChunkKey, Chunk] = OrderedDict()
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        # Версии чанков, которые лежат на диске: читаются без загрузки данных
+        self.disk_versions: Dict[ChunkKey, int] = {}
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+
+    def _path(self, key: ChunkKey) -> Path:
+        return self.cache_dir / f'{key[0]}_{key[1]}.chunk'
+
+    def _scan_disk(self) -> None:
+        # Временные файлы остаются, только если запись прервали
+        for path in self.cache_dir.glob('*.tmp'):
+            self._discard(path)
+        for path in self.cache_dir.glob('*.chunk'):
+            try:
+                chunk_x, chunk_y = (int(part) for part in path.stem.split('_'))
+                with open(path, 'rb') as file:
+                    (version,) = _HEADER.unpack(file.read(_HEADER.size))
+            except (ValueError, struct.error):
+                self._discard(path)
+                continue
+            except OSError:
+                continue
+            self.disk_versions[(chunk_x, chunk_y)] = version
+
+    def _discard(self, path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _load_from_disk(self, key: ChunkKey) -> Optional[Chunk]:
+        if key not in self.disk_versions:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                raw = file.read()
+            (version,) = _HEADER.unpack_from(raw)
+            if len(raw) != _HEADER.size + _CHUNK_BYTES:
+                raise ValueError(f'chunk file {path.name}: {len(raw)} bytes')
+        except OSError:
+            self.disk_versions.pop(key, None)
+            return None
+        except (struct.error, ValueError):
+            # Файл обрезан или испорчен: удаляем, чанк скачается заново
+            self.disk_versions.pop(key, None)
+            self._discard(path)
+            return None
+        return Chunk(version, raw[_HEADER.size :])
+
+    def _save_to_disk(self, key: ChunkKey, chunk: Chunk) -> None:
+        path = self._path(key)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as file:
+            file.write(_HEADER.pack(chunk.version))
+            file.write(chunk.data)
+        # Атомарная замена: прерванная запись не оставит битый чанк. Файл,
+        # обрезанный сбоем питания, отбросит _load_from_disk
+        os.replace(tmp_path, path)
+        self.disk_versions[key] = chunk.version
+
+    def get(self, chunk_x: int, chunk_y: int) -> Optional[Chunk]:
+        """Возвращает чанк из памяти или с диска."""
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self._load_from_disk(key)
+            if chunk is None:
+                return None
+            self.chunks[key] = chunk
+            self._evict_lru()
+        self.chunks.move_to_end(key)
+        return chunk
+
+    def put(self, chunk_x: int, chunk_y: int, version: int, data: bytes) -> None:
+        """Кладет чанк, пришедший с сервера."""
+        key = (chunk_x, chunk_y)
+        chunk = Chunk(version, bytes(data))
+        self.chunks[key] = chunk
+        self.chunks.move_to_end(key)
+        if self.cache_dir is not None:
+            self._save_to_disk(key, chunk)
+        self._evict_lru()
+
+    def known_version(self, chunk_x: int, chunk_y: int) -> Optional[int]:
+        """Версия чанка, которая у нас уже есть (в памяти или на диске)."""
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            return chunk.version
+        return self.disk_versions.get(key)
+
+    def missing(self, server_versions: Dict[ChunkKey, int]) -> List[ChunkKey]:
+        """Чанки, которые нужно скачать: новых у нас нет или версия устарела."""
+        return [
+            key
+            for key, version in server_versions.items()
+            if self.known_version(*key) != version
+        ]
+
+    def tile(self, world_x: int, world_y: int) -> Optional[int]:
+        """Блок в мировых координатах или None, если чанк не загружен."""
+        chunk = self.get(world_x // CHUNK_SIZE, world_y // CHUNK_SIZE)
+        if chunk is None:
+            return None
+        return chunk.block(world_x % CHUNK_SIZE, world_y % CHUNK_SIZE)
+
+    def evict_far(self, center_chunk_x: int, center_chunk_y: int) -> int:
+        """Выбрасывает из памяти чанки дальше evict_radius от камеры.
+
+        Returns:
+            int: Сколько чанков выброшено
+        """
+        far = [
+            key
+            for key in self.chunks
+            if max(abs(key[0] - center_chunk_x), abs(key[1] - center_chunk_y))
+            > self.evict_radius
+        ]
+        for key in far:
+            del self.chunks[key]
+        return len(far)
+
+    def _evict_lru(self) -> None:
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
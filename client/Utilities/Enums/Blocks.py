@@ -0,0 +1,20 @@
+from enum import IntEnum
+
+
+class Blocks(IntEnum):
+    """Идентификаторы блоков в чанках мира (совпадают с сервером)"""
+
+    NONE = 0
+    GRASS = 1
+    DIRT = 2
+    STONE = 3
+    BEDROCK = 4
+
+
+BLOCK_CHARS = {
+    Blocks.NONE: ' ',
+    Blocks.GRASS: '█',
+    Blocks.DIRT: '▒',
+    Blocks.STONE: '░',
+    Blocks.BEDROCK: '▓',
+}
@@ -0,0 +1,49 @@
+from typing import Optional
+
+
+class TerminalStats:
+    def __init__(self) -> None:
+        """Считает байты, записанные процессом, через /proc/self/io (Linux).
+
+        В цикле отрисовки почти все записи процесса идут в терминал, поэтому
+        разница wchar до и после curses.doupdate() - это байты кадра.
+        На системах без /proc счетчик просто недоступен.
+        """
+        self.available = self._read_wchar() is not None
+        self.last_frame_bytes = 0
+        self.total_bytes = 0
+        self.frames = 0
+        self._started: Optional[int] = None
+
+    @staticmethod
+    def _read_wchar() -> Optional[int]:
+        try:
+            with open('/proc/self/io', 'r') as file:
+                for line in file:
+                    if line.startswith('wchar:'):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+
+    def begin(self) -> None:
+        if self.available:
+            self._started = self._read_wchar()
+
+    def end(self) -> None:
+        if not self.available or self._started is None:
+            return
+        written = self._read_wchar() - self._started
+        # Само чтение /proc ничего не пишет, так что это байты кадра
+        self.last_frame_bytes = written
+        self.total_bytes += written
+        self.frames += 1
+
+    @property
+    def average_frame_bytes(self) -> float:
+        """Среднее число байт на кадр.
+
+        Returns:
+            float: Среднее с момента запуска
+        """
+        return self.total_bytes / self.frames if self.frames else 0.0
@@ -1,23 +1,42 @@
+import asyncio
 import curses
-from time import sleep
-from typing import Dict
+import sys
+import time
+from typing import Dict, Optional
 
 from objects.Player import Player
 from UI.CameraWindow import CameraWindow
+from Utilities.ChatLog import ChatLog
+from Utilities.ChunkCache import CHUNK_SIZE, ChunkCache
+from Utilities.Enums.Blocks import BLOCK_CHARS, Blocks
+from Utilities.TerminalStats import TerminalStats
+
+# Потолок частоты кадров: рендер только при изменениях и не чаще этого
+MAX_FPS = 30
+# Шаг отладочной симуляции (раньше это был sleep в цикле отрисовки)
+DEMO_TICK = 0.03
 
 
 class TestGameClient:
-    def __init__(self) -> None:
+    def __init__(self, chunk_cache_dir: Optional[str] = None) -> None:
         self.height, self.width = 0, 0
         self.game_state = {
             'player': {'id': 0, 'name': None, 'x': 0, 'y': 0},
             'objects': {'players': []},
-            'chat': [],
+            'chat': ChatLog(max_messages=10),
             'last_message': None,
-            'map': None,
+            # Карта хранится по чанкам и ограничена по памяти, а не целиком
+            'map': ChunkCache(cache_dir=chunk_cache_dir),
         }
         self.camera = None
+        self.chat_win = None
+        self.chat_lines_drawn = []
         self.player = None
+        self.terminal_stats = TerminalStats()
+        self.cells_last_frame = 0
+        self.running = True
+        # Выставляется, когда состояние изменилось и кадр нужно перерисовать
+        self.render_event: Optional[asyncio.Event] = None
 
         # WARNING: Игроки для отладки. Потом нужно получать его из Websocket.
         self.player = Player(
@@ -43,14 +62,11 @@ class TestGameClient:
 
             # Отрисовываем имя игрока под ним, если есть место
             if self.camera.is_visible(player.x, player.y + 1):
-                try:
-                    name_x, name_y = self.camera.world_to_screen(player.x, player.y + 1)
-                    name_display = player.name[:5]  # Ограничиваем длину имени
-                    self.camera.win.addstr(
-                        name_y, name_x - len(name_display) // 2, name_display
-                    )
-                except curses.error:
-                    pass
+                name_x, name_y = self.camera.world_to_screen(player.x, player.y + 1)
+                name_display = player.name[:5]  # Ограничиваем длину имени
+                self.camera.draw_text(
+                    name_display, name_x - len(name_display) // 2, name_y
+                )
 
     def renderChat(self) -> None:
         chat_width = 30
@@ -61,46 +77,64 @@ class TestGameClient:
         chat_x = self.width - chat_width - 1
         chat_y = 1
 
-        # Рисуем рамку чата
-        chat_win = curses.newwin(chat_height, chat_width, chat_y, chat_x)
-        chat_win.box()
-        chat_win.addstr(0, 2, ' Чат ')
+        # Окно чата создается один раз и пересоздается только при смене размера
+        if self.chat_win is None:
+            self.chat_win = curses.newwin(chat_height, chat_width, chat_y, chat_x)
+            self.chat_win.box()
+            self.chat_win.addstr(0, 2, ' Чат ')
+            self.chat_lines_drawn = []
+        chat_win = self.chat_win
 
         # Доступная высота для сообщений (исключая рамку)
         available_height = chat_height - 2
         max_line_width = chat_width - 2  # Ширина с учетом отступов от рамки
 
-        # Собираем все строки для отображения
-        display_lines = []
-
-        # Обрабатываем сообщения в прямом порядке (от старых к новым)
-        for msg in self.game_state['chat']:
-            # Разбиваем длинные сообщения на несколько строк
-            if len(msg) <= max_line_width:
-                display_lines.append(msg)
-            else:
-                # Разбиваем сообщение на строки нужной длины
-                start = 0
-                while start < len(msg):
-                    end = start + max_line_width
-                    if end < len(msg):
-                        # Пытаемся найти пробел для разрыва слова
-                        break_pos = msg.rfind(' ', start, end)
-                        if break_pos != -1 and break_pos > start:
-                            end = break_pos + 1
-
-                    display_lines.append(msg[start:end].strip())
-                    start = end
-
-        # Берем только последние N строк, которые помещаются в чат
-        visible_lines = display_lines[-available_height:]
-
-        # Отображаем строки (первые строки вверху, последние внизу)
+        # Сообщения переносятся при добавлении; здесь берется только хвост
+        chat = self.game_state['chat']
+        chat.set_width(max_line_width)
+        visible_lines = chat.tail(available_height)
+
+        # Отображаем строки (первые строки вверху, последние внизу).
+        # Строки, которые не изменились с прошлого кадра, не трогаем.
         for i, line in enumerate(visible_lines):
             if i < available_height:
-                chat_win.addstr(i + 1, 1, line.ljust(max_line_width)[:max_line_width])
+                line = line.ljust(max_line_width)[:max_line_width]
+                if i < len(self.chat_lines_drawn) and self.chat_lines_drawn[i] == line:
+                    continue
+                chat_win.addstr(i + 1, 1, line)
+        self.chat_lines_drawn = [
+            line.ljust(max_line_width)[:max_line_width] for line in visible_lines
+        ]
+
+        chat_win.noutrefresh()
+
+    def renderMap(self) -> None:
+        """Отрисовывает загруженные чанки, попадающие в камеру."""
+        chunk_cache: ChunkCache = self.game_state['map']
+        chunk_cache.evict_far(self.player.x // CHUNK_SIZE, self.player.y // CHUNK_SIZE)
 
-        chat_win.refresh()
+        left = self.camera.world_x - self.camera.width // 2
+        top = self.camera.world_y - self.camera.height // 2
+        right = left + self.camera.width
+        bottom = top + self.camera.height
+
+        # Идем по чанкам, а не по тайлам: один поиск в кэше на чанк
+        for chunk_y in range(top // CHUNK_SIZE, (bottom - 1) // CHUNK_SIZE + 1):
+            for chunk_x in range(left // CHUNK_SIZE, (right - 1) // CHUNK_SIZE + 1):
+                chunk = chunk_cache.get(chunk_x, chunk_y)
+                if chunk is None:
+                    continue
+                origin_x = chunk_x * CHUNK_SIZE
+                origin_y = chunk_y * CHUNK_SIZE
+                rows = range(max(top, origin_y), min(bottom, origin_y + CHUNK_SIZE))
+                columns = range(max(left, origin_x), min(right, origin_x + CHUNK_SIZE))
+                for world_y in rows:
+                    for world_x in columns:
+                        block = chunk.block(world_x - origin_x, world_y - origin_y)
+                        if block != Blocks.NONE:
+                            self.camera.draw_char(
+                                BLOCK_CHARS.get(block, '?'), world_x, world_y
+                            )
 
     def renderCamera(self, stdscr: curses.window) -> None:
         """Отрисовывает окно камеры с игровым миром, игроком, и со всеми объектами."""
@@ -111,32 +145,69 @@ class TestGameClient:
 
         self.camera.clear()
         self.camera.draw_border()
+        self.camera.center_on(self.player.x, self.player.y)
+        self.renderMap()
         self.RenderPlayer(self.player)
         for player in self.game_state['objects']['players']:
             self.RenderPlayer(player)
 
-        self.camera.refresh()
+        self.cells_last_frame = self.camera.refresh()
 
     def renderUI(self, stdscr) -> None:
         self.renderChat()
         self.renderCamera(stdscr)
 
+    def renderStats(self, stdscr: curses.window) -> None:
+        """Строка отладки: сколько клеток и байт ушло в терминал за прошлый кадр"""
+        stats = self.terminal_stats
+        if stats.available:
+            text = (
+                f'cells: {self.cells_last_frame:4} '
+                f'bytes: {stats.last_frame_bytes:6} '
+                f'avg: {stats.average_frame_bytes:8.1f}'
+            )
+        else:
+            text = f'cells: {self.cells_last_frame:4}'
+        try:
+            stdscr.addstr(0, 1, text[: max(self.width - 2, 0)])
+        except curses.error:
+            pass
+        stdscr.noutrefresh()
+
+    def resize(self, stdscr: curses.window) -> None:
+        """Пересоздает окна под новый размер терминала"""
+        self.camera = None
+        self.chat_win = None
+        stdscr.erase()
+
     def renderFrame(self, stdscr: curses.window) -> None:
-        self.height, self.width = stdscr.getmaxyx()
+        size = stdscr.getmaxyx()
+        if size != (self.height, self.width):
+            self.height, self.width = size
+            self.resize(stdscr)
 
+        self.terminal_stats.begin()
+        self.renderStats(stdscr)
         self.renderUI(stdscr)
-
-        stdscr.refresh()
+        # Один вывод в терминал на кадр вместо refresh() каждого окна
+        curses.doupdate()
+        self.terminal_stats.end()
 
     def add_chat_message(self, message: str):
         """Добавляет сообщение в чат и ограничивает количество сообщений"""
         self.game_state['chat'].append(str(message))
-        if len(self.game_state['chat']) > 10:
-            self.game_state['chat'].pop(0)
+
+    def mark_dirty(self) -> None:
+        if self.render_event is not None:
+            self.render_event.set()
+
+    def stop(self) -> None:
+        self.running = False
+        self.mark_dirty()
 
     def handle_input(self, key: str):
         if key == ord('q'):
-            exit()
+            self.stop()
         elif key == ord('w'):
             self.player.move(0, -1)
         elif key == ord('s'):
@@ -146,25 +217,65 @@ class TestGameClient:
         elif key == ord('d'):
             self.player.move(1, 0)
 
-    def main(self, stdscr: curses.window) -> None:
-        curses.start_color()
-        curses.use_default_colors()
-        curses.curs_set(0)
-        stdscr.nodelay(1)
-        frame = 0
+    def on_stdin_ready(self, stdscr: curses.window) -> None:
+        """Stdin стал читаемым: забираем все накопившиеся клавиши.
 
+        Ввод обрабатывается сразу, а кадр рисуется позже в renderLoop,
+        так что порядок "ввод, затем рендер" сохраняется.
+        """
         while True:
-            sleep(0.03)
-            frame += 1
-            self.add_chat_message(f'frame: {frame}')
-            if frame % 6 == 0:
+            key = stdscr.getch()
+            if key == -1:
+                break
+            self.handle_input(key)
+        self.mark_dirty()
+
+    async def demoLoop(self) -> None:
+        """Отладочная симуляция, пока нет сервера."""
+        tick = 0
+        while self.running:
+            await asyncio.sleep(DEMO_TICK)
+            tick += 1
+            self.add_chat_message(f'tick: {tick}')
+            if tick % 6 == 0:
                 self.game_state['objects']['players'][1].move(1, 0)
+            self.mark_dirty()
 
-            key = stdscr.getch()
-            # NOTE: Тут может быть прикол с рассинхроном. В этом случае обработка вывода происходит до рендера кадра. Это можно пересмотреть.
-            if key != -1:
-                self.handle_input(key)
+    async def renderLoop(self, stdscr: curses.window) -> None:
+        """Рисует кадр, только когда что-то изменилось, и не чаще MAX_FPS."""
+        min_interval = 1 / MAX_FPS
+        last_render = 0.0
+        while self.running:
+            await self.render_event.wait()
+            delay = last_render + min_interval - time.monotonic()
+            if delay > 0:
+                # Изменения за это время попадут в один кадр
+                await asyncio.sleep(delay)
+            self.render_event.clear()
+            if not self.running:
+                break
             self.renderFrame(stdscr)
+            last_render = time.monotonic()
+
+    async def run(self, stdscr: curses.window) -> None:
+        """Один event loop на ввод, симуляцию и рендер."""
+        loop = asyncio.get_running_loop()
+        self.render_event = asyncio.Event()
+        loop.add_reader(sys.stdin.fileno(), self.on_stdin_ready, stdscr)
+        demo_task = asyncio.create_task(self.demoLoop())
+        self.mark_dirty()
+        try:
+            await self.renderLoop(stdscr)
+        finally:
+            loop.remove_reader(sys.stdin.fileno())
+            demo_task.cancel()
+
+    def main(self, stdscr: curses.window) -> None:
+        curses.start_color()
+        curses.use_default_colors()
+        curses.curs_set(0)
+        stdscr.nodelay(1)
+        asyncio.run(self.run(stdscr))
 
 
 if __name__ == '__main__':
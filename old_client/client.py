@@ -1,18 +1,27 @@
 import argparse
 import asyncio
 import curses
-import threading
+import sys
+import time
+from collections import deque
 from curses import newwin, textpad
-from queue import Queue
-from random import random
 
 import requests
 import websockets
 
-from engine.GameProtocol import (GameProtocol, MessageType, PlayerInit,
-                                 PlayerJoin, PlayerUpdate)
+from engine import TileMap
+from engine.GameProtocol import (PROTOCOL_VERSION, Capability, ChatMessage,
+                                 GameProtocol, Hello, InputDirection,
+                                 MessageType, PlayerInit, PlayerInput,
+                                 PlayerJoin)
 
 SERVER_IP: str
+# Потолок частоты кадров: рендер идет только при изменениях и не чаще этого
+MAX_FPS = 30
+# Частота пакетов ввода: все нажатия за интервал уходят одним пакетом
+INPUT_RATE = 20
+# Что клиент умеет; сервер ответит пересечением со своими возможностями
+CLIENT_CAPABILITIES = Capability.BATCHED_SNAPSHOTS | Capability.COMPRESSION
 
 
 class LoginForm:
@@ -109,9 +118,12 @@ class LoginForm:
 
 
 class GameClient:
-    def __init__(self, server_url: str, token: str) -> None:
+    def __init__(
+        self, server_url: str, token: str, compression_dict: bytes | None = None
+    ) -> None:
         self.player_id: int = None
         self.player_name: int = None
+        self.token = token
         self.server_url = f'ws://{server_url}:8000/game/ws?token={token}'
         self.game_state = {
             'player': {'id': 0, 'name': None, 'x': 0, 'y': 0},
@@ -120,91 +132,102 @@ class GameClient:
             'last_message': None,
             'map': None,
         }
-        self.message_queue = Queue()
-        self.outgoing_queue = Queue()
+        self.outgoing_queue: asyncio.Queue[bytes] = asyncio.Queue()
         self.websocket = None
+        self.running = True
+        # Выставляется, когда состояние изменилось и кадр нужно перерисовать
+        self.render_event = asyncio.Event()
+        self.frame = 0
+        # Направления, накопленные с последней отправки пакета ввода
+        self.pending_input = InputDirection(0)
+        self.capabilities = Capability(0)
+        # Словарь zlib сервера (COMPRESSION_DICT_PATH), если он там задан
+        self.compression_dict = compression_dict
+        self.input_seq = 0
+        # x после каждого пакета ввода, который сервер еще не подтвердил
+        self.predicted_x: deque[int] = deque()
 
         # FIX: For testing
         self.game_state['map'] = self.create_large_map(80, 40)
 
     # Генерация большой карты для тестирования скроллинга
     def create_large_map(self, width=100, height=50):
-        map_data = []
-
-        # Верхняя граница
-        map_data.append(list('#' * width))
-
-        # Средние строки
-        for y in range(1, height - 1):
-            row = ['#']  # Левая граница
-            for x in range(1, width - 1):
-                # Случайные препятствия (10% chance)
-                if random() < 0.1:
-                    row.append('#')
-                else:
-                    row.append('.')
-            row.append('#')  # Правая граница
-            map_data.append(row)
-
-        # Нижняя граница
-        map_data.append(list('#' * width))
-
-        return map_data
+        return TileMap.generate_map(width, height)
 
     async def websocket_listener(self):
         """Прослушивание сообщений от сервера и отправка исходящих"""
         try:
-            async with websockets.connect(self.server_url) as ws:
-                self.websocket = ws
-
-                send_task = asyncio.create_task(self.outgoing_sender())
+            while True:
+                handoff = await self.websocket_session()
+                if handoff is None:
+                    break
+                # Сервер передал нас воркеру, который владеет новым регионом
+                self.server_url = (
+                    f'ws://{handoff.host}:{handoff.port}/game/ws?token={self.token}'
+                )
+                # Новый воркер пришлет своих игроков заново, а об уходе игроков
+                # старого шарда не сообщит никто
+                self.game_state['objects']['players'].clear()
+                self.predicted_x.clear()
+        except Exception as e:
+            print(f'WebSocket error: {e}')
+            self.stop()
+
+    async def websocket_session(self):
+        """Одно подключение к серверу.
+
+        Возвращает PlayerHandoff, если сервер передал нас другому воркеру.
+        """
+        async with websockets.connect(self.server_url) as ws:
+            self.websocket = ws
+            # Без HELLO сервер считает клиент версией 1 и шлет старый формат
+            await ws.send(
+                GameProtocol.pack_hello(Hello(PROTOCOL_VERSION, CLIENT_CAPABILITIES))
+            )
 
-                message = await ws.recv()
-                self.message_queue.put(message)
+            send_task = asyncio.create_task(self.outgoing_sender())
 
+            try:
+                while True:
+                    message = GameProtocol.decompress_frame(
+                        await ws.recv(), self.compression_dict
+                    )
+                    if message and message[0] == MessageType.PLAYER_HANDOFF:
+                        return GameProtocol.unpack_player_handoff(message)
+                    # self.add_chat_message(GameProtocol.unpack_message(message))
+                    self.handle_server_message(message)
+                    self.render_event.set()
+            except websockets.ConnectionClosed:
+                return None
+            finally:
+                self.websocket = None
+                send_task.cancel()
                 try:
-                    while True:
-                        message = await ws.recv()
-                        # self.add_chat_message(GameProtocol.unpack_message(message))
-                        self.message_queue.put(message)
-                finally:
-                    send_task.cancel()
                     await send_task
-        except Exception as e:
-            print(f'WebSocket error: {e}')
-            self.running = False
+                except asyncio.CancelledError:
+                    pass
 
     async def outgoing_sender(self):
         """Отправка исходящих сообщений из очереди"""
         while True:
+            # Ждем сообщение прямо в event loop: без потоков и без опроса по таймауту
+            message = await self.outgoing_queue.get()
             try:
-                # Ждем сообщение для отправки
-                message = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    self.outgoing_queue.get,
-                    True,
-                    0.1,  # timeout 0.1s
-                )
                 if self.websocket:
                     await self.websocket.send(message)
-            except asyncio.TimeoutError:
-                continue
             except Exception as e:
                 pass
 
-    def process_server_messages(self):
-        """Обработка сообщений от сервера (вызывается в основном потоке)"""
-        while not self.message_queue.empty():
-            message = self.message_queue.get()
-            self.handle_server_message(message)
-
     def handle_server_message(self, message: bytes):
         """Разбор сообщений от сервера"""
         msg_type, data = GameProtocol.unpack_message(message)
 
         try:
             match msg_type:
+                case MessageType.HELLO:
+                    self.capabilities = data.capabilities
                 case MessageType.PLAYER_INIT:
+                    self.predicted_x.clear()
                     self.player_id = data.player_id
                     self.player_name = data.name
                     self.game_state['player'] = {
@@ -221,16 +244,31 @@ class GameClient:
                         'x': data.x,
                         'y': data.y,
                     }
+                case MessageType.WORLD_STATE:
+                    for player in data:
+                        self.game_state['objects']['players'][player.player_id] = {
+                            'name': player.name,
+                            'x': player.x,
+                            'y': player.y,
+                        }
+                case MessageType.PLAYER_UPDATE if data.player_id == self.player_id:
+                    self.apply_correction(data.x, data.y)
                 case MessageType.PLAYER_UPDATE:
-                    self.game_state['objects']['players'][data.player_id] = {
-                        'name': data.name,
-                        'x': data.x,
-                        'y': data.y,
-                    }
+                    # Имя приходит один раз в join, дальше игрок известен по id
+                    player = self.game_state['objects']['players'].setdefault(
+                        data.player_id, {'name': str(data.player_id)}
+                    )
+                    player['x'] = data.x
+                    player['y'] = data.y
                 case MessageType.PLAYER_LEAVE:
                     player = self.game_state['objects']['players'][data]
                     self.add_chat_message(f'player leave: {player["name"]}')
                     self.game_state['objects']['players'].pop(data, None)
+                case MessageType.CHAT_MESSAGE:
+                    self.add_chat_message(self.format_chat(data))
+                case MessageType.CHAT_HISTORY:
+                    for chat in data:
+                        self.add_chat_message(self.format_chat(chat))
         except Exception as e:
             raise e
 
@@ -247,26 +285,63 @@ class GameClient:
         # except Exception as e:
         #     print(f"Error processing message '{message}': {e}")
 
-    def send_chat_message(self, message: str):
-        self.add_chat_message(message)
-
-    def send_move(self, dx: int, dy: int):
-        """Отправка движения на сервер"""
-        try:
-            new_x: int = self.game_state['player']['x'] + dx
-            new_y: int = self.game_state['player']['y'] + dy
-
-            # Обновляем локально для немедленного отклика
-            self.game_state['player']['x'] = new_x
-            self.game_state['player']['y'] = new_y
+    def apply_correction(self, x: int, y: int):
+        """Позиция от сервера на момент одного из уже отправленных пакетов.
 
-            message = GameProtocol.pack_player_update(
-                PlayerUpdate(self.player_id, self.player_name, new_x, new_y)
-            )
-            self.outgoing_queue.put(message)
+        Если x совпал с предсказанным для этого пакета, предсказание верно и
+        более поздние пакеты еще в пути: x не трогаем. Иначе сервер не пустил
+        (стена) - берем его x и предсказываем заново.
+        """
+        self.game_state['player']['y'] = y
+        if x in self.predicted_x:
+            while self.predicted_x.popleft() != x:
+                pass
+        else:
+            self.game_state['player']['x'] = x
+            self.predicted_x.clear()
+
+    def format_chat(self, chat: ChatMessage) -> str:
+        if chat.player_id == self.game_state['player']['id']:
+            name = self.game_state['player']['name']
+        else:
+            player = self.game_state['objects']['players'].get(chat.player_id)
+            name = player['name'] if player else chat.player_id
+        return f'{name}: {chat.message}'
 
-        except Exception as ex:
-            raise ex
+    def send_chat_message(self, message: str):
+        """Чат уходит на сервер; свое сообщение вернется в общей рассылке"""
+        message = message.strip()
+        if message:
+            chat = ChatMessage(self.player_id or 0, message)
+            self.outgoing_queue.put_nowait(GameProtocol.pack_chat_message(chat))
+
+    def send_move(self, direction: InputDirection):
+        """Запоминает направление до следующего пакета ввода"""
+        self.pending_input |= direction
+
+    def flush_input(self):
+        """Отправляет накопленный ввод одним пакетом"""
+        if not self.pending_input:
+            return
+        self.input_seq = (self.input_seq + 1) & 0xFFFF
+        packet = PlayerInput(self.input_seq, self.pending_input)
+        self.pending_input = InputDirection(0)
+
+        # Пакет - ровно тайл по x на сервере, его и предсказываем.
+        # y решает сервер (гравитация, прыжок) и присылает в поправке
+        dx, _ = packet.delta()
+        if dx:
+            self.game_state['player']['x'] += dx
+            self.predicted_x.append(self.game_state['player']['x'])
+            self.render_event.set()
+
+        self.outgoing_queue.put_nowait(GameProtocol.pack_player_input(packet))
+
+    async def input_sender(self):
+        """Шлет пакеты ввода с фиксированной частотой, как бы часто ни жали клавиши"""
+        while self.running:
+            await asyncio.sleep(1 / INPUT_RATE)
+            self.flush_input()
 
     def add_chat_message(self, message: str):
         """Добавляет сообщение в чат и ограничивает количество сообщений"""
@@ -349,59 +424,31 @@ class GameClient:
         camera_y = player['y'] - height // 2
 
         # Получаем карту из game_state
-        if 'map' not in self.game_state:
-            return
-
-        game_map = self.game_state['map']
-        if not game_map:
+        game_map = self.game_state.get('map')
+        if game_map is None or game_map.size == 0:
             return
 
-        map_height = len(game_map)
-        map_width = len(game_map[0]) if map_height > 0 else 0
+        map_height, map_width = game_map.shape
 
-        # Вычисляем центр карты в абсолютных координатах
         # Предполагаем, что центр карты находится в (0,0)
         # Тогда левый верхний угол карты будет в (-map_width//2, -map_height//2)
-        map_center_x = 0
-        map_center_y = 0
-        map_start_x = map_center_x - map_width // 2
-        map_start_y = map_center_y - map_height // 2
-        map_end_x = map_start_x + map_width
-        map_end_y = map_start_y + map_height
-
-        # Рендерим видимую часть карты
+        map_start_x = -(map_width // 2)
+        map_start_y = -(map_height // 2)
+
+        # Видимая часть карты вырезается одним срезом, дальше - одна строка
+        # (и по одному addstr на цветовой отрезок) вместо addch на каждую клетку
+        glyphs, pairs = TileMap.viewport(
+            game_map, map_start_x, map_start_y, camera_x, camera_y, width, height
+        )
         for screen_y in range(height):
-            for screen_x in range(width):
-                # Вычисляем абсолютные координаты мира
-                world_x = camera_x + screen_x
-                world_y = camera_y + screen_y
-
-                # Преобразуем мировые координаты в координаты карты
-                map_x = world_x - map_start_x
-                map_y = world_y - map_start_y
-
-                # Проверяем, находится ли точка в пределах карты
-                if 0 <= map_y < map_height and 0 <= map_x < map_width:
-                    char = game_map[map_y][map_x]
-
-                    # Проверяем, что символ можно отобразить
-                    if char and 32 <= ord(char) <= 126:
-                        try:
-                            curses.init_pair(2, curses.COLOR_CYAN, -1)
-                            color_pair = curses.color_pair(2)
-                        except Exception:
-                            color_pair = 0
-                        try:
-                            stdscr.addch(screen_y, screen_x, char, color_pair)
-                        except curses.error:
-                            pass
-
-                else:
-                    # Если за пределами карты - рисуем пустоту
-                    try:
-                        stdscr.addch(screen_y, screen_x, ' ')
-                    except curses.error:
-                        pass
+            line = glyphs[screen_y].tobytes().decode('ascii')
+            for start, end, pair in TileMap.color_runs(pairs[screen_y]):
+                try:
+                    stdscr.addstr(
+                        screen_y, start, line[start:end], curses.color_pair(pair)
+                    )
+                except curses.error:
+                    pass  # Последняя клетка экрана всегда дает ошибку
 
     def render(self, stdscr: curses.window, frame):
         # stdscr.clear()
@@ -444,11 +491,7 @@ class GameClient:
                     # Определяем символ для другого игрока
                     char = '@'
 
-                    try:
-                        curses.init_pair(1, curses.COLOR_GREEN, -1)
-                        color_pair = curses.color_pair(1)
-                    except Exception:
-                        color_pair = 0
+                    color_pair = curses.color_pair(TileMap.PAIR_PLAYER)
 
                     try:
                         stdscr.addch(other_screen_y, other_screen_x, char, color_pair)
@@ -468,58 +511,79 @@ class GameClient:
 
         stdscr.refresh()
 
-    def start_websocket_thread(self):
-        """Запуск WebSocket в отдельном потоке"""
-
-        def run_ws():
-            asyncio.new_event_loop().run_until_complete(self.websocket_listener())
+    def on_stdin_ready(self, stdscr: curses.window):
+        """Stdin стал читаемым: забираем все накопившиеся клавиши"""
+        while True:
+            key = stdscr.getch()
+            if key == -1:
+                break
+            self.handle_input(key)
+        self.render_event.set()
+
+    async def render_loop(self, stdscr: curses.window):
+        """Рендер только при изменениях состояния и не чаще MAX_FPS"""
+        min_interval = 1 / MAX_FPS
+        last_render = 0.0
+        while self.running:
+            await self.render_event.wait()
+            delay = last_render + min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.render_event.clear()
+            if not self.running:
+                break
 
-        ws_thread = threading.Thread(target=run_ws, daemon=True)
-        ws_thread.start()
+            self.frame += 1
+            self.render(stdscr, self.frame)
+            self.render_chat(stdscr)
+            last_render = time.monotonic()
+
+    async def main_async(self, stdscr: curses.window):
+        """Один event loop на ввод, сеть и рендер"""
+        loop = asyncio.get_running_loop()
+        loop.add_reader(sys.stdin.fileno(), self.on_stdin_ready, stdscr)
+        ws_task = asyncio.create_task(self.websocket_listener())
+        input_task = asyncio.create_task(self.input_sender())
+        self.render_event.set()
+        try:
+            await self.render_loop(stdscr)
+        finally:
+            loop.remove_reader(sys.stdin.fileno())
+            ws_task.cancel()
+            input_task.cancel()
 
     def run(self):
         """Запуск клиента"""
-        self.start_websocket_thread()
 
         def main(stdscr):
             curses.curs_set(0)
             stdscr.nodelay(1)
-            stdscr.timeout(150)  # Таймаут для getch (мс)
             curses.start_color()
             curses.use_default_colors()
+            TileMap.init_colors(curses)
 
-            frame = 0
-
-            while True:
-                # Обрабатываем сообщения от сервера
-                self.process_server_messages()
-                frame += 1
-
-                # Обработка ввода
-                key = stdscr.getch()
-                if key != -1:
-                    self.handle_input(key)
-
-                # Рендеринг
-                self.render(stdscr, frame)
-                self.render_chat(stdscr)
+            asyncio.run(self.main_async(stdscr))
 
         curses.wrapper(main)
 
+    def stop(self):
+        self.running = False
+        self.render_event.set()
+
     def handle_input(self, key):
         """Обработка пользовательского ввода"""
         if key in [ord('q'), ord('Q')]:
-            exit()
+            self.stop()
         elif key in [ord('w'), ord('W'), curses.KEY_UP]:
-            self.send_move(0, -1)
+            self.send_move(InputDirection.UP)
         elif key in [ord('s'), ord('S'), curses.KEY_DOWN]:
-            self.send_move(0, 1)
+            self.send_move(InputDirection.DOWN)
         elif key in [ord('a'), ord('A'), curses.KEY_LEFT]:
-            self.send_move(-1, 0)
+            self.send_move(InputDirection.LEFT)
         elif key in [ord('d'), ord('D'), curses.KEY_RIGHT]:
-            self.send_move(1, 0)
+            self.send_move(InputDirection.RIGHT)
         elif key in [ord('\n'), ord('\r'), curses.KEY_ENTER]:
-            self.chat_field.edit()
+            self.send_chat_message(self.chat_field.edit())
 
 
 if __name__ == '__main__':
@@ -1,7 +1,8 @@
 import struct
 import time
+import zlib
 from dataclasses import dataclass
-from enum import IntEnum
+from enum import IntEnum, IntFlag
 from typing import Any
 
 
@@ -12,6 +13,10 @@ class MessageType(IntEnum):
     CHAT_MESSAGE = 4
     WORLD_STATE = 5
     PLAYER_INIT = 6
+    PLAYER_HANDOFF = 7
+    PLAYER_INPUT = 8
+    CHAT_HISTORY = 9
+    HELLO = 10
 
 
 @dataclass
@@ -33,105 +38,216 @@ class PlayerJoin:
 @dataclass
 class PlayerUpdate:
     player_id: int
-    name: str
     x: int
     y: int
 
 
+# Старший бит байта типа: тело кадра после него сжато zlib
+COMPRESSED_FLAG = 0x80
+
+# Версия 1 - кадры с именем 20s в каждом сообщении, без рукопожатия
+LEGACY_PROTOCOL_VERSION = 1
+PROTOCOL_VERSION = 2
+
+
+class Capability(IntFlag):
+    DELTA_UPDATES = 1
+    COMPRESSION = 2
+    BATCHED_SNAPSHOTS = 4
+    CHUNK_STREAMING = 8
+
+
+@dataclass
+class Hello:
+    """Рукопожатие: клиент предлагает версию и возможности, сервер отвечает
+    выбранной версией и пересечением возможностей"""
+
+    version: int
+    capabilities: Capability
+
+
+class InputDirection(IntFlag):
+    UP = 1
+    DOWN = 2
+    LEFT = 4
+    RIGHT = 8
+
+
+@dataclass
+class PlayerInput:
+    """Ввод игрока за интервал отправки: номер пакета и зажатые направления"""
+
+    seq: int
+    directions: InputDirection
+
+    def delta(self) -> tuple[int, int]:
+        """Сдвиг не больше чем на клетку по каждой оси"""
+        dx = bool(self.directions & InputDirection.RIGHT) - bool(
+            self.directions & InputDirection.LEFT
+        )
+        dy = bool(self.directions & InputDirection.DOWN) - bool(
+            self.directions & InputDirection.UP
+        )
+        return dx, dy
+
+
+@dataclass
+class PlayerHandoff:
+    host: str
+    port: int
+
+
 @dataclass
 class ChatMessage:
     player_id: int
     message: str
-    timestamp: float = None
+    # Миллисекунды с эпохи: float32 не хватает точности на секунды эпохи
+    timestamp: int = None
 
     def __post_init__(self):
         if self.timestamp is None:
-            self.timestamp = time.time()
+            self.timestamp = time.time_ns() // 1_000_000
 
 
 class GameProtocol:
+    @staticmethod
+    def _pack_name(name: str) -> bytes:
+        """Имя с префиксом длины (uint8), обрезанное по границе символа UTF-8"""
+        name_bytes = name.encode('utf-8')
+        if len(name_bytes) > 255:
+            name_bytes = name_bytes[:255].decode('utf-8', 'ignore').encode('utf-8')
+        return struct.pack('!B', len(name_bytes)) + name_bytes
+
+    @staticmethod
+    def _pack_player_entry(player_id: int, name: str, x: int, y: int) -> bytes:
+        """Игрок без байта типа: id, позиция, имя с префиксом длины"""
+        return struct.pack('!I i i', player_id, x, y) + GameProtocol._pack_name(name)
+
+    @staticmethod
+    def _unpack_player_entry(
+        data: bytes, offset: int
+    ) -> tuple[int, str, int, int, int]:
+        """Читает игрока, возвращает (id, имя, x, y, новое смещение)"""
+        player_id, x, y, name_length = struct.unpack_from('!I i i B', data, offset)
+        offset += 13
+        name = data[offset : offset + name_length].decode('utf-8')
+        return player_id, name, x, y, offset + name_length
+
     @staticmethod
     def pack_player_init(init: PlayerInit):
         """Упаковка инициализации игрока"""
-        data = struct.pack(
-            '!BI20sii',
-            MessageType.PLAYER_INIT,
-            init.player_id,
-            init.name.encode('utf-8'),
-            init.x,
-            init.y,
+        entry = GameProtocol._pack_player_entry(
+            init.player_id, init.name, init.x, init.y
         )
-        return data
+        return struct.pack('!B', MessageType.PLAYER_INIT) + entry
 
     @staticmethod
     def unpack_player_init(data: bytes):
-        msg_type, player_id, name, x, y = struct.unpack('!BI20sii', data)
-        return PlayerInit(player_id, name.decode('utf-8').replace('\0', ''), x, y)
+        player_id, name, x, y, _ = GameProtocol._unpack_player_entry(data, 1)
+        return PlayerInit(player_id, name, x, y)
 
     @staticmethod
     def pack_player_update(update: PlayerUpdate) -> bytes:
-        """Упаковка обновления позиции игрока"""
-        # Упаковка основных данных
-        data = struct.pack(
-            '!B I 20s i i',
+        """Упаковка обновления позиции игрока: имя клиент знает по id из join"""
+        return struct.pack(
+            '!B I i i',
             MessageType.PLAYER_UPDATE,
             update.player_id,
-            update.name.encode('utf-8'),
             update.x,
             update.y,
         )
-        return data
 
     @staticmethod
     def unpack_player_update(data: bytes) -> PlayerUpdate:
         """Распаковка обновления позиции игрока"""
-        msg_type, player_id, name, x, y = struct.unpack('!BI20sii', data)
-        return PlayerUpdate(player_id, name.decode('utf-8').replace('\0', ''), x, y)
+        _, player_id, x, y = struct.unpack('!B I i i', data)
+        return PlayerUpdate(player_id, x, y)
 
     @staticmethod
     def pack_chat_message(chat: ChatMessage) -> bytes:
         """Упаковка чат-сообщения"""
         message_bytes = chat.message.encode('utf-8')
-        # Байт типа + player_id + длина сообщения + сообщение + timestamp
-        data = struct.pack(
-            f'!B I I {len(message_bytes)}s f',
+        # Байт типа + player_id + длина сообщения + сообщение + timestamp в мс
+        return struct.pack(
+            f'!B I H {len(message_bytes)}s q',
             MessageType.CHAT_MESSAGE,
             chat.player_id,
             len(message_bytes),
             message_bytes,
             chat.timestamp,
         )
-        return data
+
+    @staticmethod
+    def _unpack_chat_entry(data: bytes, offset: int) -> tuple[ChatMessage, int]:
+        """Читает одно сообщение без байта типа, возвращает его и новое смещение"""
+        player_id, msg_length = struct.unpack_from('!I H', data, offset)
+        offset += 6
+        message_bytes = data[offset : offset + msg_length]
+        (timestamp,) = struct.unpack_from('!q', data, offset + msg_length)
+        chat = ChatMessage(player_id, message_bytes.decode('utf-8'), timestamp)
+        return chat, offset + msg_length + 8
 
     @staticmethod
     def unpack_chat_message(data: bytes) -> ChatMessage:
         """Распаковка чат-сообщения"""
-        # Сначала читаем заголовок чтобы узнать длину сообщения
-        msg_type, player_id, msg_length = struct.unpack('!B I I', data[:9])
-        # Затем читаем полное сообщение
-        full_format = f'!B I I {msg_length}s f'
-        _, player_id, msg_length, message_bytes, timestamp = struct.unpack(
-            full_format, data
+        chat, _ = GameProtocol._unpack_chat_entry(data, 1)
+        return chat
+
+    @staticmethod
+    def pack_chat_history(messages: list[ChatMessage]) -> bytes:
+        """Упаковка истории чата одним кадром: количество + сообщения без типа"""
+        entries = [GameProtocol.pack_chat_message(chat)[1:] for chat in messages]
+        return struct.pack('!B H', MessageType.CHAT_HISTORY, len(entries)) + b''.join(
+            entries
         )
-        return ChatMessage(player_id, message_bytes.decode('utf-8'), timestamp)
 
     @staticmethod
-    def pack_player_join(data: PlayerJoin) -> bytes:
+    def unpack_chat_history(data: bytes) -> list[ChatMessage]:
+        """Распаковка истории чата"""
+        _, count = struct.unpack_from('!B H', data)
+        offset = 3
+        messages = []
+        for _ in range(count):
+            chat, offset = GameProtocol._unpack_chat_entry(data, offset)
+            messages.append(chat)
+        return messages
+
+    @staticmethod
+    def pack_player_join(join_data: PlayerJoin) -> bytes:
         """Упаковка сообщения о подключении игрока"""
-        return struct.pack(
-            '!B I 20s i i',
-            MessageType.PLAYER_JOIN,
-            data.player_id,
-            data.name.encode('utf-8'),
-            data.x,
-            data.y,
+        entry = GameProtocol._pack_player_entry(
+            join_data.player_id, join_data.name, join_data.x, join_data.y
         )
+        return struct.pack('!B', MessageType.PLAYER_JOIN) + entry
 
     @staticmethod
-    def unpack_player_join(data: bytes) -> int:
+    def unpack_player_join(data: bytes) -> PlayerJoin:
         """Распаковка сообщения о подключении игрока"""
-        msg_type, player_id, name, x, y = struct.unpack('!B I 20s i i', data)
-        return PlayerJoin(player_id, name.decode('utf-8').replace('\0', ''), x, y)
+        player_id, name, x, y, _ = GameProtocol._unpack_player_entry(data, 1)
+        return PlayerJoin(player_id, name, x, y)
+
+    @staticmethod
+    def pack_world_state(players: list[PlayerJoin]) -> bytes:
+        """Упаковка снимка мира: все видимые игроки одним кадром"""
+        return struct.pack('!B H', MessageType.WORLD_STATE, len(players)) + b''.join(
+            GameProtocol._pack_player_entry(
+                player.player_id, player.name, player.x, player.y
+            )
+            for player in players
+        )
+
+    @staticmethod
+    def unpack_world_state(data: bytes) -> list[PlayerJoin]:
+        """Распаковка снимка мира"""
+        _, count = struct.unpack_from('!B H', data)
+        offset = 3
+        players = []
+        for _ in range(count):
+            player_id, name, x, y, offset = GameProtocol._unpack_player_entry(
+                data, offset
+            )
+            players.append(PlayerJoin(player_id, name, x, y))
+        return players
 
     @staticmethod
     def pack_player_leave(player_id: int) -> bytes:
@@ -144,6 +260,45 @@ class GameProtocol:
         msg_type, player_id = struct.unpack('!B I', data)
         return player_id
 
+    @staticmethod
+    def unpack_player_handoff(data: bytes) -> PlayerHandoff:
+        """Распаковка передачи игрока другому воркеру"""
+        _, port, host_length = struct.unpack('!B H B', data[:4])
+        host_bytes = data[4 : 4 + host_length]
+        return PlayerHandoff(host_bytes.decode('utf-8'), port)
+
+    @staticmethod
+    def pack_player_input(data: PlayerInput) -> bytes:
+        """Упаковка ввода игрока"""
+        return struct.pack(
+            '!B H B', MessageType.PLAYER_INPUT, data.seq & 0xFFFF, data.directions
+        )
+
+    @staticmethod
+    def pack_hello(hello: Hello) -> bytes:
+        """Упаковка рукопожатия"""
+        return struct.pack(
+            '!B H I', MessageType.HELLO, hello.version, hello.capabilities
+        )
+
+    @staticmethod
+    def unpack_hello(data: bytes) -> Hello:
+        """Распаковка рукопожатия, неизвестные биты возможностей отбрасываются"""
+        _, version, capabilities = struct.unpack('!B H I', data)
+        return Hello(version, Capability(capabilities & sum(Capability)))
+
+    @staticmethod
+    def decompress_frame(data: bytes, zdict: bytes | None = None) -> bytes:
+        """Разжимает кадр с флагом COMPRESSED_FLAG, остальные возвращает как есть"""
+        if not data or not data[0] & COMPRESSED_FLAG:
+            return data
+        if zdict:
+            decompressor = zlib.decompressobj(zdict=zdict)
+        else:
+            decompressor = zlib.decompressobj()
+        body = decompressor.decompress(data[1:]) + decompressor.flush()
+        return bytes([data[0] & 0x7F]) + body
+
     @staticmethod
     def unpack_message(data: bytes) -> Any:
         """Универсальная распаковка по типу сообщения"""
@@ -163,6 +318,14 @@ class GameProtocol:
                 return msg_type, GameProtocol.unpack_player_leave(data)
             elif msg_type == MessageType.PLAYER_INIT:
                 return msg_type, GameProtocol.unpack_player_init(data)
+            elif msg_type == MessageType.PLAYER_HANDOFF:
+                return msg_type, GameProtocol.unpack_player_handoff(data)
+            elif msg_type == MessageType.CHAT_HISTORY:
+                return msg_type, GameProtocol.unpack_chat_history(data)
+            elif msg_type == MessageType.WORLD_STATE:
+                return msg_type, GameProtocol.unpack_world_state(data)
+            elif msg_type == MessageType.HELLO:
+                return msg_type, GameProtocol.unpack_hello(data)
         except Exception as e:
             print(f'Ошибка распаковки сообщения типа {msg_type}: {e}')
             exit(f'{msg_type}: {e}')
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Номера цветовых пар curses (инициализируются один раз в init_colors)
+PAIR_DEFAULT = 0
+PAIR_PLAYER = 1
+PAIR_MAP = 2
+PAIR_ERROR = 4
+
+# Идентификаторы тайлов в карте (np.uint8)
+TILE_FLOOR = 0
+TILE_WALL = 1
+
+VOID_GLYPH = ord(' ')
+
+# Таблицы: id тайла -> символ и id тайла -> цветовая пара
+GLYPHS = np.full(256, ord('?'), dtype=np.uint8)
+GLYPHS[TILE_FLOOR] = ord('.')
+GLYPHS[TILE_WALL] = ord('#')
+
+TILE_PAIRS = np.full(256, PAIR_MAP, dtype=np.uint8)
+
+
+def init_colors(curses) -> None:
+    """Инициализирует цветовые пары. Вызывается один раз после start_color()"""
+    curses.init_pair(PAIR_PLAYER, curses.COLOR_GREEN, -1)
+    curses.init_pair(PAIR_MAP, curses.COLOR_CYAN, -1)
+    curses.init_pair(PAIR_ERROR, curses.COLOR_RED, -1)
+
+
+def generate_map(width: int, height: int, wall_chance: float = 0.1) -> np.ndarray:
+    """Тестовая карта: стены по краям и случайные препятствия внутри"""
+    tiles = np.where(
+        np.random.random((height, width)) < wall_chance, TILE_WALL, TILE_FLOOR
+    ).astype(np.uint8)
+    tiles[0, :] = TILE_WALL
+    tiles[-1, :] = TILE_WALL
+    tiles[:, 0] = TILE_WALL
+    tiles[:, -1] = TILE_WALL
+    return tiles
+
+
+def viewport(
+    tiles: np.ndarray,
+    origin_x: int,
+    origin_y: int,
+    camera_x: int,
+    camera_y: int,
+    width: int,
+    height: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Вырезает видимую часть карты одним срезом.
+
+    Args:
+        tiles: Карта тайлов (height, width) uint8
+        origin_x, origin_y: Мировые координаты тайла tiles[0, 0]
+        camera_x, camera_y: Мировые координаты левого верхнего угла экрана
+        width, height: Размер экрана
+
+    Returns:
+        Массивы символов и цветовых пар размера (height, width)
+    """
+    glyphs = np.full((height, width), VOID_GLYPH, dtype=np.uint8)
+    pairs = np.full((height, width), PAIR_DEFAULT, dtype=np.uint8)
+
+    map_height, map_width = tiles.shape
+    # Пересечение экрана и карты в координатах карты
+    left = max(camera_x - origin_x, 0)
+    top = max(camera_y - origin_y, 0)
+    right = min(camera_x - origin_x + width, map_width)
+    bottom = min(camera_y - origin_y + height, map_height)
+    if left >= right or top >= bottom:
+        return glyphs, pairs
+
+    visible = tiles[top:bottom, left:right]
+    screen_x = left + origin_x - camera_x
+    screen_y = top + origin_y - camera_y
+    region = (
+        slice(screen_y, screen_y + visible.shape[0]),
+        slice(screen_x, screen_x + visible.shape[1]),
+    )
+    glyphs[region] = GLYPHS[visible]
+    pairs[region] = TILE_PAIRS[visible]
+    return glyphs, pairs
+
+
+def color_runs(pairs_row: np.ndarray) -> list[tuple[int, int, int]]:
+    """Разбивает строку на отрезки одного цвета: [(начало, конец, пара)]"""
+    if pairs_row.size == 0:
+        return []
+    starts = np.flatnonzero(np.diff(pairs_row)) + 1
+    bounds = [0, *starts.tolist(), pairs_row.size]
+    return [
+        (start, end, int(pairs_row[start]))
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]